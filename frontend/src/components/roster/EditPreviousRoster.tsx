@@ -141,7 +141,7 @@ const EditPreviousRoster: React.FC<EditPreviousRosterProps> = ({
         axios.get('/api/areas/'),
       ]);
 
-      setAssignments(rosterRes.data.assignments || []);
+      setAssignments(rosterRes.data.roster_data?.assignments || []);
       setOfficers(officersRes.data);
       setAreas(areasRes.data);
     } catch (error) {
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import Layout from '../components/layout/Layout';
-import { getPolicemen, getActiveRosters, getPendingRosters, getPreviousRosters } from '../services/api';
+import { getPolicemen, getRosterStats } from '../services/api';
 
 
 const Dashboard = () => {
@@ -41,21 +41,16 @@ const Dashboard = () => {
         });
 
         // Fetch roster data
-        const activeRosters = await getActiveRosters();
-        const pendingRosters = await getPendingRosters();
-        const previousRosters = await getPreviousRosters();
-
-        // Calculate assigned officers from active rosters
-        const totalOfficersAssigned = activeRosters.reduce((total: number, roster: any) => {
-          return total + (roster.assignments?.length || 0);
-        }, 0);
-
-        setRosterSummary({
-          activeRosters: Array.isArray(activeRosters) ? activeRosters.length : 0,
-          pendingRosters: Array.isArray(pendingRosters) ? pendingRosters.length : 0,
-          previousRosters: Array.isArray(previousRosters) ? previousRosters.length : 0,
-          totalOfficersAssigned
-        });
+        // Counters only; the roster listings are paginated and never loaded in full here
+        const stats = await getRosterStats();
+        if (stats) {
+          setRosterSummary({
+            activeRosters: stats.active,
+            pendingRosters: stats.pending,
+            previousRosters: stats.previous,
+            totalOfficersAssigned: stats.active_assignments
+          });
+        }
       } catch (error) {
         console.error('Error fetching data:', error);
       } finally {
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import {
   
@@ -7,7 +7,6 @@ import {
   ArrowLeftIcon,
 } from '@heroicons/react/24/outline';
 import toast from 'react-hot-toast';
-import * as XLSX from 'xlsx';
 import { jsPDF } from 'jspdf';
 import 'jspdf-autotable';
 import LoadingSpinner from '../components/LoadingSpinner';
@@ -17,6 +16,18 @@ import 'react-datepicker/dist/react-datepicker.css';
 import axios from 'axios';
 
 import { CorrigendumChanges } from '../components/roster/CorrigendumChanges';
+import { getPreviousRosters, streamRosterGeneration, downloadRosterExport, newIdempotencyKey } from '../services/api';
+import { GenerationProgress } from '../types';
+
+const GENERATION_PHASE_LABELS: Record<GenerationProgress['phase'], string> = {
+  load: 'Loading deployments',
+  si: 'Assigning SIs',
+  senior: 'Assigning senior officers',
+  drivers: 'Matching drivers',
+  ranks: 'Filling rank requirements',
+  hg: 'Topping up Home Guards',
+  write: 'Saving roster',
+};
 
 interface RosterAssignment {
   id: number;
@@ -79,6 +90,7 @@ interface Roster {
   is_active: boolean;
   repetition_count: number;
   same_area_repetition_count: number;
+  assignment_count?: number;
   assignments: RosterAssignment[];
   shortcomings?: {
     zones?: Record<string, Record<string, number>>;
@@ -95,6 +107,7 @@ interface PreviousRoster {
   is_active: boolean;
   repetition_count: number;
   same_area_repetition_count: number;
+  assignment_count?: number;
   assignments: RosterAssignment[];
   shortcomings?: {
     zones?: Record<string, Record<string, number>>;
@@ -173,7 +186,10 @@ const RosterGenerator: React.FC = () => {
   const [pendingRoster, setPendingRoster] = useState<Roster | null>(null);
   const [activeRosters, setActiveRosters] = useState<Roster[]>([]);
   const [previousRosters, setPreviousRosters] = useState<PreviousRoster[]>([]);
+  const [previousRostersNext, setPreviousRostersNext] = useState<string | null>(null);
+  const [loadingMorePrevious, setLoadingMorePrevious] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
+  const [generationProgress, setGenerationProgress] = useState<GenerationProgress | null>(null);
   const [loadingRosters, setLoadingRosters] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
   const [showConfirmSave, setShowConfirmSave] = useState<boolean>(false);
@@ -186,6 +202,8 @@ const RosterGenerator: React.FC = () => {
   const [fixedDutyPolicemen, setFixedDutyPolicemen] = useState<FixedDutyPoliceman[]>([]);
   const [areas, setAreas] = useState<Area[]>([]);
   const [zones, setZones] = useState<Zone[]>([]);
+  // Idempotency-Key of the generate/save/discard in progress, reused when the same action is retried
+  const actionKeyRef = useRef<{ action: string; key: string } | null>(null);
 
   // Add helper functions for getting area and zone names
   const getAreaName = (areaId: number | null): string => {
@@ -202,96 +220,69 @@ const RosterGenerator: React.FC = () => {
     return zone ? zone.name : '';
   };
 
+  // Load a roster with its assignments; the active and pending listings only return summaries
+  const fetchRosterDetail = async (rosterId: number): Promise<Roster> => {
+    const response = await axios.get(`http://localhost:8000/api/rosters/${rosterId}/`, {
+      headers: { 'Content-Type': 'application/json' },
+      timeout: 60000,
+    });
+    const assignments = (response.data.assignments || []).map((assignment: any) => ({
+      ...assignment,
+      // Check for policeman_rank first, then display_rank, then rank, then fallback
+      rank: assignment.policeman_rank || assignment.display_rank || assignment.rank || 'Unknown'
+    }));
+    return { ...response.data, assignments };
+  };
+
+  // Export an active roster once its assignments are loaded
+  const exportActiveRoster = async (rosterId: number, exporter: (roster: Roster) => void) => {
+    try {
+      exporter(await fetchRosterDetail(rosterId));
+    } catch (err) {
+      console.error('Error fetching roster:', err);
+      toast.error('Failed to load roster');
+    }
+  };
+
   // Fetch active and previous rosters
   const fetchRosters = async () => {
     setLoadingRosters(true);
     try {
-      // Fetch active rosters
+      // Fetch active roster summaries; assignments are loaded per roster on demand
       console.log('Fetching active rosters');
       const activeResponse = await axios.get('http://localhost:8000/api/rosters/active/', {
         headers: { 'Content-Type': 'application/json' },
         timeout: 10000,
       });
       console.log('Active rosters data:', activeResponse.data);
-      
-      // Process the data to ensure assignments have the rank field
-      const processedActiveRosters = Array.isArray(activeResponse.data) 
-        ? activeResponse.data.map(roster => {
-            if (roster && Array.isArray(roster.assignments)) {
-              // Make sure each assignment has a valid rank
-              const processedAssignments = roster.assignments.map((assignment: any) => {
-                return {
-                  ...assignment,
-                  // Check for policeman_rank first, then display_rank, then rank, then fallback
-                  rank: assignment.policeman_rank || assignment.display_rank || assignment.rank || 'Unknown'
-                };
-              });
-              return { ...roster, assignments: processedAssignments };
-            }
-            return roster;
-          }) 
-        : [];
-      
-      setActiveRosters(processedActiveRosters);
+      setActiveRosters(Array.isArray(activeResponse.data)
+        ? activeResponse.data.map((roster: Roster) => ({ ...roster, assignments: [] }))
+        : []);
 
-      // Fetch pending rosters
+      // Fetch pending roster summaries, then the assignments of the latest one
       console.log('Fetching pending rosters');
       const pendingResponse = await axios.get('http://localhost:8000/api/rosters/pending/', {
         headers: { 'Content-Type': 'application/json' },
         timeout: 10000,
       });
       if (pendingResponse.data && Array.isArray(pendingResponse.data) && pendingResponse.data.length > 0) {
-        const pendingRosterData = pendingResponse.data[0];
-        
-        // Process assignments to ensure rank is properly set
-        if (pendingRosterData && Array.isArray(pendingRosterData.assignments)) {
-          const processedAssignments = pendingRosterData.assignments.map((assignment: any) => {
-            return {
-              ...assignment,
-              // Check for policeman_rank first, then display_rank, then rank, then fallback
-              rank: assignment.policeman_rank || assignment.display_rank || assignment.rank || 'Unknown'
-            };
-          });
-          setPendingRoster({...pendingRosterData, assignments: processedAssignments});
-        } else {
-          setPendingRoster(pendingRosterData);
-        }
+        setPendingRoster(await fetchRosterDetail(pendingResponse.data[0].id));
       } else {
         setPendingRoster(null);
       }
 
-      // Fetch previous rosters
+      // Fetch the first page of previous roster summaries; later pages and assignments load on demand
       console.log('Fetching previous rosters');
-      const previousResponse = await axios.get('http://localhost:8000/api/previous-rosters/', {
-        headers: { 'Content-Type': 'application/json' },
-        timeout: 10000,
-      });
-      
-      // Process the previous rosters data to ensure assignments have the rank field
-      const processedPreviousRosters = Array.isArray(previousResponse.data) 
-        ? previousResponse.data.map(roster => {
-            if (roster && Array.isArray(roster.assignments)) {
-              // Make sure each assignment has a valid rank
-              const processedAssignments = roster.assignments.map((assignment: any) => {
-                return {
-                  ...assignment,
-                  // Check for policeman_rank first, then display_rank, then rank, then fallback
-                  rank: assignment.policeman_rank || assignment.display_rank || assignment.rank || 'Unknown'
-                };
-              });
-              return { ...roster, assignments: processedAssignments };
-            }
-            return roster;
-          }) 
-        : [];
-      
-      setPreviousRosters(processedPreviousRosters);
+      const previousPage = await getPreviousRosters();
+      setPreviousRosters(previousPage.results.map((roster: PreviousRoster) => ({ ...roster, assignments: [] })));
+      setPreviousRostersNext(previousPage.next);
     } catch (err) {
       console.error('Error fetching rosters:', err);
       toast.error(`Failed to load rosters: ${err instanceof Error ? err.message : 'Unknown error'}`);
       // Set default empty arrays on error
       setActiveRosters([]);
       setPreviousRosters([]);
+      setPreviousRostersNext(null);
     } finally {
       setLoadingRosters(false);
     }
@@ -301,6 +292,16 @@ const RosterGenerator: React.FC = () => {
     fetchRosters();
   }, []);
 
+  // One Idempotency-Key per user action: a retry of the same action sends the same key
+  const actionKey = (action: string, data: object) => {
+    const fingerprint = `${action}:${JSON.stringify(data)}`;
+    let current = actionKeyRef.current;
+    if (!current || current.action !== fingerprint) {
+      current = actionKeyRef.current = { action: fingerprint, key: newIdempotencyKey() };
+    }
+    return current.key;
+  };
+
   // Generate a new roster
   const generateRoster = async () => {
     if (pendingRoster) {
@@ -310,6 +311,7 @@ const RosterGenerator: React.FC = () => {
 
     setLoading(true);
     setError(null);
+    setGenerationProgress(null);
 
     try {
       // Prepare request data
@@ -325,24 +327,19 @@ const RosterGenerator: React.FC = () => {
       // Call generate roster API with the full URL
       console.log('Sending roster generation request:', requestData);
       
-      // Inform the user that this might take some time
-      toast.loading('Generating roster... This may take a minute.', { duration: 30000 });
-      
-      const response = await axios.post('http://localhost:8000/api/generate-roster/', requestData, {
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        timeout: 60000, // Extended timeout to 60 seconds for roster generation
-      });
+      // Generation streams its progress phase by phase, shown on the generate button
+      const rosterId = await streamRosterGeneration(requestData, setGenerationProgress, actionKey('generate', requestData));
+      const response = await axios.get(`http://localhost:8000/api/rosters/${rosterId}/`, { timeout: 60000 });
+      actionKeyRef.current = null;
       
       // Dismiss any loading toasts
       toast.dismiss();
       
-      console.log('Roster generation response:', response.data);
+      console.log('Generated roster:', response.data);
       
-      if (response.data.roster) {
+      if (response.data) {
         // Process the roster assignments to ensure rank information is properly set
-        const processedRoster = { ...response.data.roster };
+        const processedRoster = { ...response.data };
         if (processedRoster.assignments && Array.isArray(processedRoster.assignments)) {
           processedRoster.assignments = processedRoster.assignments.map((assignment: any) => {
             return {
@@ -382,6 +379,7 @@ const RosterGenerator: React.FC = () => {
       }
     } finally {
       setLoading(false);
+      setGenerationProgress(null);
     }
   };
 
@@ -406,10 +404,12 @@ const RosterGenerator: React.FC = () => {
         {
           headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': actionKey(`confirm-${pendingRoster.id}`, saveData),
           },
           timeout: 10000,
         }
       );
+      actionKeyRef.current = null;
       
       toast.success('Roster saved and activated successfully');
       
@@ -437,15 +437,18 @@ const RosterGenerator: React.FC = () => {
     setLoading(true);
     try {
       console.log(`Discarding roster with ID: ${pendingRoster.id}`);
+      const discardData = { action: 'discard' };
       await axios.post(`http://localhost:8000/api/confirm-roster/${pendingRoster.id}/`, 
-        { action: 'discard' },
+        discardData,
         {
           headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': actionKey(`confirm-${pendingRoster.id}`, discardData),
           },
           timeout: 10000,
         }
       );
+      actionKeyRef.current = null;
       
       toast.success('Roster discarded successfully');
       setPendingRoster(null);
@@ -458,158 +461,6 @@ const RosterGenerator: React.FC = () => {
     }
   };
 
-  // Export roster to Excel
-  const exportToExcel = (roster: Roster | PreviousRoster) => {
-    try {
-      // Get assignments from either roster.assignments or roster.roster_data.assignments
-      let assignments: RosterAssignment[] = [];
-      if (roster.assignments && Array.isArray(roster.assignments)) {
-        assignments = roster.assignments;
-      } else if ('roster_data' in roster && 
-                  roster.roster_data && 
-                  roster.roster_data.assignments && 
-                  Array.isArray(roster.roster_data.assignments)) {
-        assignments = roster.roster_data.assignments;
-      }
-      
-      if (!assignments || assignments.length === 0) {
-        toast.error('No data to export.');
-        return;
-      }
-
-      const workbook = XLSX.utils.book_new();
-      const groupedAssignments = groupAssignmentsByZoneAndArea(assignments);
-      
-      // Create worksheet with all assignments
-      const allAssignmentsData = [
-        ['Zone', 'Area', 'Name', 'Belt No.', 'Rank', 'Status', 'Fixed Area']
-      ];
-      
-      // Add all assignments with zone and area grouping
-      Object.keys(groupedAssignments).forEach(zoneName => {
-        Object.keys(groupedAssignments[zoneName]).forEach(areaName => {
-          groupedAssignments[zoneName][areaName].forEach(assignment => {
-            const row = [
-              // If it's a fixed duty officer, use their fixed zone, otherwise use current assignment zone
-              (assignment.is_fixed_duty ? assignment.fixed_zone : zoneName) || '',
-              // If it's a fixed duty officer, use their fixed area, otherwise use current assignment area
-              (assignment.is_fixed_duty ? assignment.fixed_area : areaName) || '',
-              assignment.policeman_name || '',
-              assignment.belt_no || '',
-              assignment.rank || '',
-              assignment.is_fixed_duty ? 'Fixed Duty' : 'Regular',
-              // Include call sign with fixed area for fixed duty officers
-              assignment.is_fixed_duty ? 
-                `${assignment.fixed_area || ''}${assignment.call_sign ? ` (${assignment.call_sign})` : ''}` : 
-                '-'
-            ];
-            allAssignmentsData.push(row);
-          });
-        });
-      });
-      
-      const allAssignmentsWorksheet = XLSX.utils.aoa_to_sheet(allAssignmentsData);
-      XLSX.utils.book_append_sheet(workbook, allAssignmentsWorksheet, 'All Assignments');
-      
-      // Create separate worksheets for each zone
-      Object.keys(groupedAssignments).forEach(zoneName => {
-        const zoneData = [
-          ['Area', 'Name', 'Belt No.', 'Rank', 'Status', 'Fixed Area']
-        ];
-        
-        Object.keys(groupedAssignments[zoneName]).forEach(areaName => {
-          // Add area header row
-          zoneData.push([areaName, '', '', '', '', '']);
-          
-          // Add assignments for this area
-          groupedAssignments[zoneName][areaName].forEach(assignment => {
-            zoneData.push([
-              // If it's a fixed duty officer, use their fixed area
-              (assignment.is_fixed_duty ? assignment.fixed_area : '') || '',
-              assignment.policeman_name || '',
-              assignment.belt_no || '',
-              assignment.rank || '',
-              assignment.is_fixed_duty ? 'Fixed Duty' : 'Regular',
-              // Include call sign with fixed area for fixed duty officers
-              assignment.is_fixed_duty ? 
-                `${assignment.fixed_area || ''}${assignment.call_sign ? ` (${assignment.call_sign})` : ''}` : 
-                '-'
-            ]);
-          });
-          
-          // Add empty row after each area
-          zoneData.push(['', '', '', '', '', '']);
-        });
-        
-        const zoneWorksheet = XLSX.utils.aoa_to_sheet(zoneData);
-        XLSX.utils.book_append_sheet(workbook, zoneWorksheet, zoneName);
-      });
-      
-      // Add shortcomings sheet if there are unfulfilled requirements
-      if (roster.shortcomings && Object.keys(roster.shortcomings).length > 0) {
-        const shortcomingsData = [
-          ['Type', 'Requirement', 'Details']
-        ];
-        
-        Object.entries(roster.shortcomings).forEach(([key, value]) => {
-          if (typeof value === 'object' && value !== null) {
-            Object.entries(value).forEach(([subKey, subValue]) => {
-              shortcomingsData.push([
-                key,
-                subKey,
-                String(subValue)
-              ]);
-            });
-          } else {
-            shortcomingsData.push([
-              key,
-              '',
-              String(value)
-            ]);
-          }
-        });
-        
-        const shortcomingsWorksheet = XLSX.utils.aoa_to_sheet(shortcomingsData);
-        XLSX.utils.book_append_sheet(workbook, shortcomingsWorksheet, 'Unfulfilled Requirements');
-      }
-      
-      // Add roster summary sheet
-      const summaryData = [
-        ['Roster Information'],
-        ['Date', new Date(roster.created_at || new Date()).toLocaleDateString()],
-        ['Total Officers', String(assignments.length)],
-        [''],
-        ['Rank Distribution'],
-      ];
-      
-      // Count officers by rank
-      const rankCounts: Record<string, number> = {};
-      assignments.forEach(assignment => {
-        rankCounts[assignment.rank] = (rankCounts[assignment.rank] || 0) + 1;
-      });
-      
-      Object.entries(rankCounts).forEach(([rank, count]) => {
-        summaryData.push([rank, String(count)]);
-      });
-      
-      const summaryWorksheet = XLSX.utils.aoa_to_sheet(summaryData);
-      XLSX.utils.book_append_sheet(workbook, summaryWorksheet, 'Summary');
-      
-      // Generate filename based on date
-      const date = roster.created_at 
-        ? new Date(roster.created_at).toISOString().split('T')[0] 
-        : new Date().toISOString().split('T')[0];
-      const filename = `Roster_${date}.xlsx`;
-      
-      // Save the workbook
-      XLSX.writeFile(workbook, filename);
-      toast.success('Excel file exported successfully!');
-    } catch (error) {
-      console.error('Error exporting to Excel:', error);
-      toast.error('Failed to export Excel file. Please try again.');
-    }
-  };
-
   // Export roster to PDF
   const exportToPDF = (roster: Roster | PreviousRoster, isPrevious = false) => {
     try {
@@ -954,10 +805,10 @@ const RosterGenerator: React.FC = () => {
       return null;
     }
     
-    // Safely access assignments length with fallback
-    let totalAssignments = 0;
+    // Safely access assignments length with fallback (summaries only carry assignment_count)
+    let totalAssignments = roster.assignment_count || 0;
     
-    if (roster.assignments && Array.isArray(roster.assignments)) {
+    if (roster.assignments && Array.isArray(roster.assignments) && roster.assignments.length > 0) {
       totalAssignments = roster.assignments.length;
     } else if ('roster_data' in roster && 
                roster.roster_data && 
@@ -1305,7 +1156,7 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
         
         <div className="mt-4 flex space-x-2">
           <button
-            onClick={() => exportToExcel(pendingRoster)}
+            onClick={() => downloadRosterExport(pendingRoster.id)}
             className="inline-flex items-center px-4 py-2 border border-transparent text-sm font-medium rounded-md shadow-sm text-white bg-green-600 hover:bg-green-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-green-500"
           >
             Export to Excel
@@ -1391,13 +1242,13 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
               <h4 className="text-md font-semibold">Roster for {new Date(roster.created_at).toLocaleDateString()}</h4>
               <div className="flex space-x-2">
                 <button
-                  onClick={() => exportToExcel(roster)}
+                  onClick={() => downloadRosterExport(roster.id)}
                   className="inline-flex items-center px-3 py-1 border border-transparent text-xs font-medium rounded shadow-sm text-white bg-green-600 hover:bg-green-700 focus:outline-none focus:ring-1"
                 >
                   Export to Excel
                 </button>
                 <button
-                  onClick={() => exportToPDF(roster)}
+                  onClick={() => exportActiveRoster(roster.id, exportToPDF)}
                   className="inline-flex items-center px-3 py-1 border border-transparent text-xs font-medium rounded shadow-sm text-white bg-purple-600 hover:bg-purple-700 focus:outline-none focus:ring-1"
                 >
                   Export to PDF
@@ -1432,9 +1283,53 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
     );
   };
 
+  // Load the next page of previous roster summaries
+  const loadMorePreviousRosters = async () => {
+    if (!previousRostersNext || loadingMorePrevious) {
+      return;
+    }
+    setLoadingMorePrevious(true);
+    try {
+      const page = await getPreviousRosters(previousRostersNext);
+      setPreviousRosters(prev => [...prev, ...page.results.map((roster: PreviousRoster) => ({ ...roster, assignments: [] }))]);
+      setPreviousRostersNext(page.next);
+    } finally {
+      setLoadingMorePrevious(false);
+    }
+  };
+
+  // Load the full archived roster (roster_data) for a previous roster summary
+  const loadPreviousRosterDetail = async (rosterId: number): Promise<PreviousRoster | null> => {
+    const existing = previousRosters.find(r => r.id === rosterId);
+    if (existing && existing.roster_data) {
+      return existing;
+    }
+    try {
+      const response = await axios.get(`http://localhost:8000/api/previous-rosters/${rosterId}/`, {
+        headers: { 'Content-Type': 'application/json' },
+        timeout: 10000,
+      });
+      const assignments = (response.data.roster_data?.assignments || []).map((assignment: any) => ({
+        ...assignment,
+        // Check for policeman_rank first, then display_rank, then rank, then fallback
+        rank: assignment.policeman_rank || assignment.display_rank || assignment.rank || 'Unknown'
+      }));
+      const detail: PreviousRoster = { ...response.data, assignments };
+      setPreviousRosters(prev => prev.map(r => (r.id === rosterId ? detail : r)));
+      return detail;
+    } catch (err) {
+      console.error('Error fetching previous roster:', err);
+      toast.error('Failed to load previous roster');
+      return null;
+    }
+  };
+
   // Render previous rosters with expandable details
   const renderPreviousRosters = () => {
     const toggleRoster = (rosterId: number) => {
+      if (!expandedRosters[rosterId]) {
+        loadPreviousRosterDetail(rosterId);
+      }
       setExpandedRosters(prev => ({
         ...prev,
         [rosterId]: !prev[rosterId]
@@ -1487,13 +1382,16 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
                     Manage Changes
                   </button>
                   <button
-                    onClick={() => exportToExcel(roster)}
+                    onClick={() => downloadRosterExport(roster.id, 'xls', true)}
                     className="px-3 py-1 bg-green-600 text-white rounded hover:bg-green-700"
                   >
                     Export Excel
                   </button>
                   <button
-                    onClick={() => exportToPDF(roster, true)}
+                    onClick={async () => {
+                      const detail = await loadPreviousRosterDetail(roster.id);
+                      if (detail) exportToPDF(detail, true);
+                    }}
                     className="px-3 py-1 bg-red-600 text-white rounded hover:bg-red-700"
                   >
                     Export PDF
@@ -1552,6 +1450,18 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
           );
         })}
 
+        {previousRostersNext && (
+          <div className="flex justify-center">
+            <button
+              onClick={loadMorePreviousRosters}
+              disabled={loadingMorePrevious}
+              className="px-4 py-2 bg-gray-100 text-gray-700 rounded hover:bg-gray-200 disabled:opacity-50"
+            >
+              {loadingMorePrevious ? 'Loading...' : 'Load older rosters'}
+            </button>
+          </div>
+        )}
+
         {/* Corrigendum Changes Modal */}
         {isCorrigendumModalOpen && editingRosterId && (
           <div className="fixed inset-0 z-50 overflow-y-auto bg-gray-500 bg-opacity-75">
@@ -1693,7 +1603,10 @@ Total unfulfilled requirements: ${Object.entries(totalShortcomings).map(([rank,
         >
           {loading ? (
             <span className="flex items-center justify-center">
-              <LoadingSpinner size="small" /> Generating...
+              <LoadingSpinner size="small" />{' '}
+              {generationProgress
+                ? `${GENERATION_PHASE_LABELS[generationProgress.phase]} (${generationProgress.step}/${generationProgress.steps}, ${generationProgress.assigned} assigned)...`
+                : 'Generating...'}
             </span>
           ) : (
             'Generate Roster'
@@ -1,5 +1,8 @@
 import axios, { AxiosResponse } from 'axios';
-import { Policeman, Zone, Area, Deployment, Roster, PolicemanFilters } from '../types';
+import {
+  Policeman, Zone, Area, Deployment, Roster, RosterSummary, RosterStats, CursorPage, PolicemanFilters, PolicemanMatch,
+  GenerationProgress
+} from '../types';
 
 // Create an axios instance
 const api = axios.create({
@@ -102,6 +105,57 @@ export const getPolicemen = async (filters?: PolicemanFilters): Promise<Policema
   }
 };
 
+export const searchPolicemen = async (q: string, limit = 10): Promise<PolicemanMatch[]> => {
+  try {
+    const params = new URLSearchParams({ q, limit: String(limit) });
+    const response: AxiosResponse<PolicemanMatch[]> = await api.get(`/policemen/typeahead/?${params.toString()}`);
+    return response.data;
+  } catch (error) {
+    console.error('Error searching policemen:', error);
+    throw error;
+  }
+};
+
+// Idempotency-Key for one user action; randomUUID is missing outside secure contexts (plain http hosts)
+export const newIdempotencyKey = (): string => {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === 'x' ? r : (r & 0x3) | 0x8).toString(16);
+  });
+};
+
+// Generate a roster over server-sent events, reporting each phase; resolves with the roster id
+// (EventSource cannot send headers, so the Idempotency-Key goes in the query)
+export const streamRosterGeneration = (
+  params: { name?: string; seed?: number },
+  onProgress: (progress: GenerationProgress) => void,
+  idempotencyKey?: string
+): Promise<number> =>
+  new Promise((resolve, reject) => {
+    const query = new URLSearchParams();
+    if (params.name) query.set('name', params.name);
+    if (params.seed !== undefined) query.set('seed', String(params.seed));
+    if (idempotencyKey) query.set('idempotency_key', idempotencyKey);
+    const source = new EventSource(`${api.defaults.baseURL}/generate-roster/stream/?${query.toString()}`);
+
+    source.addEventListener('progress', (event) => {
+      onProgress(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('done', (event) => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data).roster);
+    });
+    source.addEventListener('error', (event) => {
+      // Close first: EventSource would otherwise reconnect and start another generation
+      source.close();
+      const data = (event as MessageEvent).data;
+      reject(new Error(data ? JSON.parse(data).error : 'Lost connection to the roster generation stream'));
+    });
+  });
+
 export const getPolicemanById = async (id: number): Promise<Policeman> => {
   try {
     const response: AxiosResponse<any> = await api.get(`/policemen/${id}/`);
@@ -467,18 +521,59 @@ export const getPendingRosters = async () => {
   }
 };
 
-// Function to get previous rosters
-export const getPreviousRosters = async () => {
+// Fetch one page of a cursor-paginated listing; pass page.next back in to load the following page
+export const fetchPage = async <T,>(url: string): Promise<CursorPage<T>> => {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch ${url}: ${response.status}`);
+  }
+  return await response.json();
+};
+
+const emptyPage = <T,>(): CursorPage<T> => ({ next: null, previous: null, results: [] });
+
+// Function to get a page of roster summaries (no assignments)
+export const getRosterSummaries = async (
+  status?: 'active' | 'pending',
+  cursor?: string | null
+): Promise<CursorPage<RosterSummary>> => {
+  try {
+    return await fetchPage<RosterSummary>(cursor || `http://localhost:8000/api/rosters/${status ? `?status=${status}` : ''}`);
+  } catch (error) {
+    console.error('Error fetching roster summaries:', error);
+    return emptyPage<RosterSummary>();
+  }
+};
+
+// Function to get a page of previous roster summaries (roster_data is only returned by the detail endpoint)
+export const getPreviousRosters = async (cursor?: string | null): Promise<CursorPage<any>> => {
   try {
     console.log('Fetching previous rosters');
-    const response = await fetch('http://localhost:8000/api/previous-rosters/');
-    if (!response.ok) {
-      throw new Error(`Failed to fetch previous rosters: ${response.status}`);
-    }
-    return await response.json();
+    return await fetchPage<any>(cursor || 'http://localhost:8000/api/previous-rosters/');
   } catch (error) {
     console.error('Error fetching previous rosters:', error);
-    return [];
+    return emptyPage<any>();
+  }
+};
+
+// Download a roster as a spreadsheet (xls) or CSV; the server streams the file from the database
+export const downloadRosterExport = (rosterId: number, format: 'xls' | 'csv' = 'xls', previous = false): void => {
+  const link = document.createElement('a');
+  link.href = `http://localhost:8000/api/${previous ? 'previous-rosters' : 'rosters'}/${rosterId}/export/${format}/`;
+  link.download = '';
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+};
+
+// Function to get the roster counters shown on the dashboard
+export const getRosterStats = async (): Promise<RosterStats | null> => {
+  try {
+    const response = await api.get('/rosters/stats/');
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching roster stats:', error);
+    return null;
   }
 };
 
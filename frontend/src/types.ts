@@ -56,6 +56,40 @@ export interface Roster {
   assignments: RosterAssignment[];
 }
 
+export interface RosterSummary {
+  id: number;
+  name: string;
+  created_at: string;
+  is_active: boolean;
+  is_pending: boolean;
+  repetition_count: number;
+  same_area_repetition_count: number;
+  assignment_count: number;
+}
+
+export interface RosterStats {
+  active: number;
+  pending: number;
+  previous: number;
+  active_assignments: number;
+}
+
+export interface CursorPage<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+export interface GenerationProgress {
+  phase: 'load' | 'si' | 'senior' | 'drivers' | 'ranks' | 'hg' | 'write';
+  step: number;
+  steps: number;
+  roster: number | null;
+  assigned: number;
+  shortages: Record<string, number>;
+  elapsed: number;
+}
+
 export interface RosterAssignment {
   id: number;
   policeman: number;
@@ -87,4 +121,11 @@ export interface PolicemanFilters {
   gender?: string;
   has_fixed_duty?: boolean;
   search?: string;
-} 
\ No newline at end of file
+} 
+
+export interface PolicemanMatch {
+  id: number;
+  name: string;
+  belt_no: string;
+  rank: string;
+}
\ No newline at end of file
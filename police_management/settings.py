@@ -1,5 +1,8 @@
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -7,14 +10,23 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 
-SECRET_KEY = "django-insecure-e@jo_6&fvcno@*w-wya79u-zv#(_5zuh32s!msph)+8*=srqk*"
+# Runtime profile: "development" (default) or "production", selected with ROSTER_PROFILE
+ROSTER_PROFILE = os.environ.get("ROSTER_PROFILE", "development")
+PRODUCTION = ROSTER_PROFILE == "production"
+
+SECRET_KEY = os.environ.get(
+    "DJANGO_SECRET_KEY", "django-insecure-e@jo_6&fvcno@*w-wya79u-zv#(_5zuh32s!msph)+8*=srqk*"
+)
 
 
-DEBUG = True
+# DEBUG also records every SQL query in memory, so it is off in production
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = ['*']
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['ETag', 'Idempotent-Replayed']
 
 
 INSTALLED_APPS = [
@@ -47,6 +59,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "police_roster.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -57,6 +70,9 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Clients allowed to scrape /api/_metrics
+METRICS_ALLOWED_IPS = os.environ.get("ROSTER_METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
 ROOT_URLCONF = "police_management.urls"
 
 TEMPLATES = [
@@ -87,6 +103,54 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL lets readers run while roster generation writes,
+# connections persist between requests, and write transactions take the lock up front
+# instead of failing with "database is locked" when a read upgrades to a write.
+# The pragmas are applied by police_roster.sqlite.configure_sqlite on every new connection.
+if PRODUCTION:
+    DATABASES["default"].update({
+        "CONN_MAX_AGE": int(os.environ.get("ROSTER_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+    })
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # durable across application crashes; WAL keeps the file consistent
+        "busy_timeout": 5000,  # ms to wait for a lock before raising
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # negative values are KiB: 64 MiB page cache
+        "temp_store": "MEMORY",
+    }
+else:
+    SQLITE_PRAGMAS = {}
+
+# Response cache for reference data (see police_roster/caching.py). Local memory is
+# per process; set ROSTER_CACHE_DIR to share the cache between several worker processes.
+if os.environ.get("ROSTER_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["ROSTER_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "police-roster",
+        }
+    }
+
+# Archived rosters (PreviousRoster) are stored in a compact encoding; set
+# ROSTER_ARCHIVE_COMPRESSION=0 to keep it uncompressed (see police_roster/archive_format.py)
+ROSTER_ARCHIVE_COMPRESSION = os.environ.get("ROSTER_ARCHIVE_COMPRESSION", "1") != "0"
+
+# Off-peak pre-generation of the next day's roster (manage.py pregenerate_roster): local
+# time of the daily run, and the file keeping its run history (a .lock file sits beside it).
+# The command requires ROSTER_CACHE_DIR, since it warms the cache the web workers read.
+ROSTER_PREGENERATE_AT = os.environ.get("ROSTER_PREGENERATE_AT", "02:00")
+ROSTER_PREGENERATE_STATE = os.environ.get("ROSTER_PREGENERATE_STATE", str(BASE_DIR / "pregenerate.json"))
+
 
 
 
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster, CorrigendumChange
+from .models import (
+    Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster,
+    CorrigendumChange, AssignmentConstraint, ForcedAssignment, ArchivedAssignment
+)
 
 
 @admin.register(Zone)
@@ -126,6 +129,14 @@ class PreviousRosterAdmin(admin.ModelAdmin):
         return obj.unfulfilled_requirements is not None and obj.unfulfilled_requirements != {}
 
 
+@admin.register(ArchivedAssignment)
+class ArchivedAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('policeman_name', 'belt_no', 'rank', 'area_name', 'zone_name', 'call_sign', 'previous_roster')
+    list_filter = ('previous_roster', 'zone', 'rank')
+    search_fields = ('policeman_name', 'belt_no', 'area_name', 'call_sign')
+    raw_id_fields = ('previous_roster', 'policeman', 'area', 'zone')
+
+
 @admin.register(CorrigendumChange)
 class CorrigendumChangeAdmin(admin.ModelAdmin):
     list_display = (
@@ -157,3 +168,24 @@ class CorrigendumChangeAdmin(admin.ModelAdmin):
         return bool(obj.notes)
 
 
+@admin.register(AssignmentConstraint)
+class AssignmentConstraintAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'is_active', 'updated_at')
+    list_filter = ('kind', 'is_active')
+    list_editable = ('is_active',)
+    search_fields = ('name', 'description')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ForcedAssignment)
+class ForcedAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('policeman', 'area', 'get_zone', 'is_active', 'updated_at')
+    list_filter = ('is_active', 'area__zone')
+    list_editable = ('is_active',)
+    search_fields = ('policeman__name', 'policeman__belt_no', 'area__name', 'area__call_sign')
+    raw_id_fields = ('policeman', 'area')
+    readonly_fields = ('created_at', 'updated_at')
+
+    @admin.display(description='Zone')
+    def get_zone(self, obj):
+        return obj.area.zone.name if obj.area and obj.area.zone else '-'
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 
 class PoliceRosterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'police_roster'
\ No newline at end of file
+    name = 'police_roster'
+
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
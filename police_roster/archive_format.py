@@ -0,0 +1,114 @@
+# archive_format.py
+
+import base64
+import json
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.db.models.expressions import BaseExpression
+
+# Marks a stored value as compact; plain JSON values (older archives) are read unchanged
+MARKER = '__compact__'
+TABLE = '__table__'
+
+
+def _pack(value):
+    if isinstance(value, dict):
+        return {key: _pack(item) for key, item in value.items()}
+    if not isinstance(value, list):
+        return value
+    keys = list(value[0]) if value and isinstance(value[0], dict) else None
+    if len(value) < 2 or keys is None or any(not isinstance(row, dict) or list(row) != keys for row in value):
+        return [_pack(item) for item in value]
+
+    # A list of same-shaped objects becomes one row of values per object, and string
+    # columns with repeated values (names, rank displays) index a per-column dictionary
+    columns = []
+    rows = [[] for _ in value]
+    for key in keys:
+        cells = [row[key] for row in value]
+        if all(isinstance(cell, str) for cell in cells) and len(set(cells)) < len(cells):
+            words = list(dict.fromkeys(cells))
+            index = {word: i for i, word in enumerate(words)}
+            columns.append([key, words])
+            cells = [index[cell] for cell in cells]
+        else:
+            columns.append(key)
+            cells = [_pack(cell) for cell in cells]
+        for row, cell in zip(rows, cells):
+            row.append(cell)
+    return {TABLE: columns, 'rows': rows}
+
+
+def _unpack(value):
+    if isinstance(value, list):
+        return [_unpack(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if TABLE not in value:
+        return {key: _unpack(item) for key, item in value.items()}
+    rows = [{} for _ in value['rows']]
+    for position, column in enumerate(value[TABLE]):
+        if isinstance(column, list):
+            key, words = column
+            for row, cells in zip(rows, value['rows']):
+                row[key] = words[cells[position]]
+        else:
+            for row, cells in zip(rows, value['rows']):
+                row[column] = _unpack(cells[position])
+    return rows
+
+
+def _size(value):
+    return len(json.dumps(value, separators=(',', ':')))
+
+
+def encode(value, compress=None):
+    """Compact form of a JSON value, or the value itself when that is not smaller.
+
+    Objects in lists are stored as columns, with a dictionary for repeated strings, and
+    with compression the result is zlib-compressed and base64-encoded.
+    """
+    if compress is None:
+        compress = getattr(settings, 'ROSTER_ARCHIVE_COMPRESSION', True)
+    if value is None:
+        return value
+    packed = _pack(value)
+    if compress:
+        data = zlib.compress(json.dumps(packed, separators=(',', ':')).encode(), 9)
+        encoded = {MARKER: 1, 'zlib': base64.b64encode(data).decode()}
+    else:
+        encoded = {MARKER: 1, 'data': packed}
+    if _size(encoded) >= _size(value) or decode(encoded) != value:
+        return value
+    return encoded
+
+
+def decode(value):
+    """The JSON value stored by encode(); plain values are returned unchanged"""
+    if not isinstance(value, dict) or MARKER not in value:
+        return value
+    if 'zlib' in value:
+        return _unpack(json.loads(zlib.decompress(base64.b64decode(value['zlib']))))
+    return _unpack(value['data'])
+
+
+def is_compact(value):
+    return isinstance(value, dict) and MARKER in value
+
+
+class CompactJSONField(models.JSONField):
+    """JSONField stored in the compact archive encoding and decoded transparently on load.
+
+    Values are encoded on save only, so key lookups in queries do not see inside
+    compacted values; archives are read whole.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        return decode(super().from_db_value(value, expression, connection))
+
+    def get_db_prep_save(self, value, connection):
+        if not isinstance(value, BaseExpression):
+            value = encode(value)
+        return super().get_db_prep_save(value, connection)
@@ -0,0 +1,182 @@
+# caching.py
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+# Version scopes: reference data (zones, areas, officers, deployments), rosters, and
+# everything roster generation reads (reference data, rules and the latest archive)
+REFERENCE = 'reference'
+ROSTERS = 'rosters'
+GENERATION_INPUTS = 'generation-inputs'
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(scope):
+    return f'police_roster:data_version:{scope}'
+
+
+def get_data_version(scope=REFERENCE):
+    """Return the current version of a data scope, starting a new one if the cache lost it"""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a restarted or evicted cache never reuses an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def shared_cache():
+    """True when the cache, and so the data versions, are shared between processes (see ROSTER_CACHE_DIR)"""
+    return not settings.CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+
+def _scope_models(scope):
+    # signals.py declares the models of each scope (and imports this module)
+    from .signals import REFERENCE_MODELS, ROSTER_MODELS, GENERATION_INPUT_MODELS
+    return {REFERENCE: REFERENCE_MODELS, ROSTERS: ROSTER_MODELS, GENERATION_INPUTS: GENERATION_INPUT_MODELS}[scope]
+
+
+def table_states(models):
+    """Row count, max id and max updated_at of each model's table, read in one query"""
+    columns = []
+    for model in models:
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        updated_at = connection.ops.quote_name(model._meta.get_field('updated_at').column)
+        columns += [f'(SELECT COUNT(*) FROM {table})', f'(SELECT MAX({pk}) FROM {table})',
+                    f'(SELECT MAX({updated_at}) FROM {table})']
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(columns)}')
+        return cursor.fetchone()
+
+
+def data_state(*scopes):
+    """Identify the current data of the scopes, for ETags and response cache keys.
+
+    With a shared cache the data versions are enough. The per-process cache never sees the
+    bumps of other processes (other web workers, management commands), so the table states
+    of the scopes' models are added; saves touch updated_at and deletes lower the counts.
+    """
+    versions = '-'.join(str(get_data_version(scope)) for scope in scopes)
+    if shared_cache():
+        return versions
+    models = list(dict.fromkeys(model for scope in scopes for model in _scope_models(scope)))
+    return f'{versions}-{hashlib.md5(repr(table_states(models)).encode()).hexdigest()}'
+
+
+def request_data_state(request, *scopes):
+    """data_state(*scopes), read once per request however many mixins need it"""
+    states = request.__dict__.setdefault('data_states', {})
+    if scopes not in states:
+        states[scopes] = data_state(*scopes)
+    return states[scopes]
+
+
+def response_cache_key(state, basename, action, path):
+    """Key of a cached GET response, for the reference data state it was built from"""
+    return f'police_roster:response:{state}:{basename}:{action}:{hashlib.md5(path.encode()).hexdigest()}'
+
+
+def cache_response_data(basename, action, path, data):
+    """Store data as the cached response of a GET of path, as VersionedCacheMixin would"""
+    cache.set(response_cache_key(data_state(REFERENCE), basename, action, path), data, RESPONSE_CACHE_TIMEOUT)
+
+
+def bump_data_version(scope=REFERENCE):
+    """Invalidate everything derived from a data scope"""
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.set(_version_key(scope), time.time_ns(), timeout=None)
+
+
+def bump_reference_version(**kwargs):
+    """Signal receiver for reference data models"""
+    bump_data_version(REFERENCE)
+
+
+def bump_roster_version(**kwargs):
+    """Signal receiver for roster models"""
+    bump_data_version(ROSTERS)
+
+
+def bump_generation_inputs_version(**kwargs):
+    """Signal receiver for the models roster generation reads.
+
+    Bumps again once the transaction commits, so state rebuilt by another thread from
+    the pre-commit data in between is not kept under the new version.
+    """
+    bump_data_version(GENERATION_INPUTS)
+    transaction.on_commit(lambda: bump_data_version(GENERATION_INPUTS))
+
+
+class VersionedCacheMixin:
+    """Serve GET responses of the listed actions from the cache until the reference data changes.
+
+    Keys include the data state (see data_state), so a change makes every older entry
+    unreachable and it simply expires. With a shared cache hits are answered from the
+    cache alone; with the per-process cache they cost the table state query.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        # self.action is only set once DRF initializes the request, so read the action map
+        if request.method == 'GET' and self.action_map.get('get') in self.cached_actions:
+            self.get = self._cached_handler(self.get)
+        return super().dispatch(request, *args, **kwargs)
+
+    def _response_cache_key(self, request):
+        return response_cache_key(request_data_state(request, REFERENCE), self.basename, self.action,
+                                  request.get_full_path())
+
+    def _cached_handler(self, handler):
+        def cached(request, *args, **kwargs):
+            key = self._response_cache_key(request)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+            return response
+        return cached
+
+
+class ConditionalGetMixin:
+    """Strong ETags for GET responses, derived from the data state of etag_scopes.
+
+    The tag combines the data state (see data_state) with the request path and Accept
+    header, so it is known before the view runs. A matching If-None-Match is answered with
+    304 without running the view or serializing anything.
+    """
+    etag_scopes = (REFERENCE,)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == 'GET':
+            self.get = self._conditional_handler(self.get)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_etag(self, request):
+        versions = request_data_state(request, *self.etag_scopes)
+        representation = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+        return f'"{versions}-{hashlib.md5(representation.encode()).hexdigest()}"'
+
+    def _conditional_handler(self, handler):
+        def conditional(request, *args, **kwargs):
+            etag = self.get_etag(request)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+            if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+            return response
+        return conditional
@@ -0,0 +1,123 @@
+# constraints.py
+
+from django.db.models import Q
+
+from .models import AssignmentConstraint
+
+
+class ConstraintSet:
+    """Active AssignmentConstraint rules compiled into bitmasks for generation runs.
+
+    Every AREA_EXCLUSION rule owns one bit. An officer's mask has the bits of the rules
+    that match the officer, an area's mask has the bits of the rules that match the area,
+    and an officer may serve in an area when the two masks share no bit. Masks are built
+    once per generation snapshot so allocation passes never re-evaluate rule data in
+    their inner loops.
+    """
+
+    def __init__(self, rules):
+        self.exclusion_rules = []
+        self.pool_filters = {}
+        self.duty_overrides = {}
+
+        for rule in rules:
+            params = rule.parameters or {}
+            if rule.kind == 'AREA_EXCLUSION':
+                self.exclusion_rules.append((rule, params.get('officer', {}), params.get('area', {})))
+            elif rule.kind == 'POOL_REQUIREMENT':
+                self.pool_filters.setdefault(params.get('pool'), {}).update(params.get('filters', {}))
+            elif rule.kind == 'DUTY_OVERRIDE':
+                for rank in params.get('ranks', []):
+                    self.duty_overrides[rank] = params.get('duty')
+
+        self.officer_masks = {}
+        self.area_masks = {}
+
+    @classmethod
+    def load(cls):
+        """Load all active rules from the database"""
+        return cls(AssignmentConstraint.objects.filter(is_active=True))
+
+    def compile(self, officers, areas):
+        """Precompute the exclusion masks for the given officers and areas"""
+        for officer in officers:
+            self.officer_masks[officer.id] = self._match_officer(officer)
+        for area in areas:
+            self.area_masks[area.id] = self._match_area(area)
+        return self
+
+    def _match_officer(self, officer):
+        mask = 0
+        for bit, (rule, officer_match, area_match) in enumerate(self.exclusion_rules):
+            genders = officer_match.get('genders')
+            ranks = officer_match.get('ranks')
+            markers = officer_match.get('name_markers', [])
+            if ranks and officer.rank not in ranks:
+                continue
+            matched = not genders and not markers
+            if genders and officer.gender in genders:
+                matched = True
+            if not matched and markers and officer.name:
+                matched = any(marker in officer.name for marker in markers)
+            if matched:
+                mask |= 1 << bit
+        return mask
+
+    def _match_area(self, area):
+        mask = 0
+        call_sign = area.call_sign.strip() if area.call_sign else ""
+        for bit, (rule, officer_match, area_match) in enumerate(self.exclusion_rules):
+            call_signs = area_match.get('call_signs', [])
+            if call_sign in call_signs:
+                mask |= 1 << bit
+            elif call_sign and area_match.get('match_prefix'):
+                # Match on the first word of each call sign, e.g. "Eagle-05" for "Eagle-05 M/C"
+                if call_sign.startswith(tuple(c.split(' ')[0] for c in call_signs if c)):
+                    mask |= 1 << bit
+        return mask
+
+    def officer_mask(self, officer):
+        mask = self.officer_masks.get(officer.id)
+        if mask is None:
+            mask = self.officer_masks[officer.id] = self._match_officer(officer)
+        return mask
+
+    def area_mask(self, area):
+        mask = self.area_masks.get(area.id)
+        if mask is None:
+            mask = self.area_masks[area.id] = self._match_area(area)
+        return mask
+
+    def is_restricted(self, area):
+        """Return True if any exclusion rule applies to this area"""
+        return self.area_mask(area) != 0
+
+    def allows(self, officer, area):
+        """Return True if no exclusion rule forbids this officer in this area"""
+        return not (self.officer_mask(officer) & self.area_mask(area))
+
+    def filter_pool(self, officers, area):
+        """Return the officers from the pool allowed in this area"""
+        area_mask = self.area_mask(area)
+        if not area_mask:
+            return officers
+        return [o for o in officers if not (self.officer_mask(o) & area_mask)]
+
+    def pool_q(self, pool, prefix=''):
+        """Return a Q object selecting the officers of an allocation pool
+
+        Pass a prefix such as 'policeman__' to apply the pool to a related model.
+        """
+        return Q(**{f'{prefix}{field}': value for field, value in self.pool_filters.get(pool, {}).items()})
+
+    def in_pool(self, officer, pool):
+        """Return True if the officer satisfies every requirement of the pool"""
+        return all(getattr(officer, field) == value for field, value in self.pool_filters.get(pool, {}).items())
+
+    def effective_duty(self, officer):
+        """Return the duty type displayed for the officer, after any DUTY_OVERRIDE rule for their rank.
+
+        Pools match the stored preferred_duty, so an override never moves officers into
+        or out of a pool (static Home Guards stay off the roster).
+        """
+        return self.duty_overrides.get(officer.rank) or officer.preferred_duty
@@ -0,0 +1,88 @@
+# diff.py
+
+from .models import Area, Policeman, Roster, RosterAssignment, PreviousRoster, ArchivedAssignment
+
+SOURCES = {
+    'roster': (Roster, RosterAssignment, 'roster_id'),
+    'previous': (PreviousRoster, ArchivedAssignment, 'previous_roster_id'),
+}
+
+
+def parse_source(value):
+    """Parse 'roster:<id>', 'previous:<id>' or a bare roster id into (kind, id)"""
+    kind, _, raw_id = (value or '').rpartition(':')
+    kind = kind or 'roster'
+    if kind not in SOURCES or not raw_id.isdigit():
+        raise ValueError(f"Invalid roster reference '{value}'; use roster:<id> or previous:<id>")
+    return kind, int(raw_id)
+
+
+def load_source(kind, source_id):
+    """Return (header, {policeman_id: (area_id, zone_id)}) for a roster or archived roster"""
+    model, assignment_model, roster_field = SOURCES[kind]
+    header = model.objects.only('id', 'name', 'repetition_count', 'same_area_repetition_count').get(id=source_id)
+    assignments = {
+        policeman_id: (area_id, zone_id)
+        for policeman_id, area_id, zone_id in assignment_model.objects.filter(
+            **{roster_field: source_id}, policeman__isnull=False
+        ).values_list('policeman_id', 'area_id', 'area__zone_id')
+    }
+    return header, assignments
+
+
+def diff_rosters(a, b):
+    """Compute the officers added, removed and moved between two (kind, id) sources.
+
+    Only the delta is returned; names are loaded for the officers and areas it mentions.
+    """
+    header_a, assignments_a = load_source(*a)
+    header_b, assignments_b = load_source(*b)
+
+    officers_a, officers_b = assignments_a.keys(), assignments_b.keys()
+    added = officers_b - officers_a
+    removed = officers_a - officers_b
+    moved = {pid for pid in officers_a & officers_b if assignments_a[pid][0] != assignments_b[pid][0]}
+
+    policemen = Policeman.objects.only('id', 'name', 'belt_no', 'rank').in_bulk(added | removed | moved)
+    area_ids = {assignments_a[pid][0] for pid in removed | moved} | {assignments_b[pid][0] for pid in added | moved}
+    areas = Area.objects.only('id', 'name').in_bulk(area_ids - {None})
+
+    def officer(pid):
+        policeman = policemen.get(pid)
+        return {
+            'policeman': pid,
+            'policeman_name': policeman.name if policeman else None,
+            'belt_no': policeman.belt_no if policeman else None,
+            'rank': policeman.rank if policeman else None,
+        }
+
+    def area(area_id):
+        return {'id': area_id, 'name': areas[area_id].name if area_id in areas else None}
+
+    def header(kind, roster, assignments):
+        return {
+            'source': f'{kind}:{roster.id}',
+            'name': roster.name,
+            'assignment_count': len(assignments),
+            'repetition_count': roster.repetition_count,
+            'same_area_repetition_count': roster.same_area_repetition_count,
+        }
+
+    return {
+        'a': header(a[0], header_a, assignments_a),
+        'b': header(b[0], header_b, assignments_b),
+        'added': [dict(officer(pid), area=area(assignments_b[pid][0])) for pid in sorted(added)],
+        'removed': [dict(officer(pid), area=area(assignments_a[pid][0])) for pid in sorted(removed)],
+        'moved': [
+            dict(officer(pid),
+                 from_area=area(assignments_a[pid][0]),
+                 to_area=area(assignments_b[pid][0]),
+                 zone_changed=assignments_a[pid][1] != assignments_b[pid][1])
+            for pid in sorted(moved)
+        ],
+        'unchanged_count': len(officers_a & officers_b) - len(moved),
+        'repetition_change': {
+            'zone': header_b.repetition_count - header_a.repetition_count,
+            'area': header_b.same_area_repetition_count - header_a.same_area_repetition_count,
+        },
+    }
@@ -0,0 +1,106 @@
+# exports.py
+
+import csv
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+from .models import RANK_DISPLAY, RosterAssignment
+
+EXPORT_COLUMNS = ['Zone', 'Area', 'Call Sign', 'Name', 'Belt No.', 'Rank', 'Same Zone', 'Same Area']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    # SpreadsheetML 2003: plain XML that Excel and LibreOffice open as a workbook
+    'xls': 'application/vnd.ms-excel',
+}
+
+
+def roster_rows(roster):
+    """Yield export rows for a Roster straight from the database, ordered by zone, area and call sign"""
+    assignments = RosterAssignment.objects.filter(roster=roster).order_by(
+        'area__zone__name', 'area__name', 'area__call_sign', 'policeman__name'
+    ).values_list(
+        'area__zone__name', 'area__name', 'area__call_sign',
+        'policeman__name', 'policeman__belt_no', 'policeman__rank',
+        'was_previous_zone', 'was_previous_area'
+    )
+    for zone, area, call_sign, name, belt_no, rank, same_zone, same_area in assignments.iterator(chunk_size=500):
+        yield [zone, area, call_sign, name, belt_no, RANK_DISPLAY.get(rank, rank),
+               'Yes' if same_zone else 'No', 'Yes' if same_area else 'No']
+
+
+def previous_roster_rows(previous_roster):
+    """Yield export rows for a PreviousRoster from its archived assignments, in the same order"""
+    assignments = previous_roster.archived_assignments.order_by(
+        'zone_name', 'area_name', 'call_sign', 'policeman_name'
+    ).values_list(
+        'zone_name', 'area_name', 'call_sign', 'policeman_name', 'belt_no', 'rank',
+        'was_previous_zone', 'was_previous_area'
+    )
+    for zone, area, call_sign, name, belt_no, rank, same_zone, same_area in assignments.iterator(chunk_size=500):
+        yield [zone, area, call_sign, name, belt_no, RANK_DISPLAY.get(rank, rank),
+               'Yes' if same_zone else 'No', 'Yes' if same_area else 'No']
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
+
+def _stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM so Excel detects UTF-8
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _sheet_name(zone, used):
+    """Worksheet name for zone, at most 31 characters and unique within the workbook.
+
+    Excel compares sheet names case-insensitively, so zones whose names only differ after
+    the 31st character get a numeric suffix. used holds the names taken so far.
+    """
+    name = ''.join('_' if c in '[]:*?/\\' else c for c in (zone or 'No Zone'))[:31]
+    unique, number = name, 1
+    while unique.lower() in used:
+        number += 1
+        suffix = f' ({number})'
+        unique = name[:31 - len(suffix)] + suffix
+    used.add(unique.lower())
+    return escape(unique, {'"': '&quot;'})
+
+
+def _xml_row(values):
+    cells = ''.join(f'<Cell><Data ss:Type="String">{escape("" if v is None else str(v))}</Data></Cell>' for v in values)
+    return f'<Row>{cells}</Row>\n'
+
+
+def _stream_spreadsheet(rows):
+    """Stream a SpreadsheetML workbook with one worksheet per zone (rows arrive grouped by zone)"""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<?mso-application progid="Excel.Sheet"?>\n'
+           '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" '
+           'xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">\n')
+    sheet_names = set()
+    for zone, zone_rows in groupby(rows, key=lambda row: row[0]):
+        yield f'<Worksheet ss:Name="{_sheet_name(zone, sheet_names)}"><Table>\n'
+        yield _xml_row(EXPORT_COLUMNS[1:])
+        for row in zone_rows:
+            yield _xml_row(row[1:])
+        yield '</Table></Worksheet>\n'
+    if not sheet_names:
+        yield f'<Worksheet ss:Name="Roster"><Table>\n{_xml_row(EXPORT_COLUMNS)}</Table></Worksheet>\n'
+    yield '</Workbook>\n'
+
+
+def export_response(rows, file_format, filename):
+    """Build a StreamingHttpResponse writing rows as CSV or as a spreadsheet"""
+    stream = _stream_csv(rows) if file_format == 'csv' else _stream_spreadsheet(rows)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[file_format])
+    safe_name = ''.join(c if c.isalnum() or c in ' -_.' else '_' for c in filename).strip() or 'roster'
+    response['Content-Disposition'] = f'attachment; filename="{safe_name}.{file_format}"'
+    return response
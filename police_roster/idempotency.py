@@ -0,0 +1,132 @@
+# idempotency.py
+
+import hashlib
+import json
+import threading
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key wait for it and share its result"""
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def join(self, key):
+        """Return (call, leader); the leader must pass its outcome to finish() and the others wait on call.done"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = self.Call()
+            else:
+                call.waiters += 1
+        return call, leader
+
+    def finish(self, key, call, result=None, error=None):
+        call.result = result
+        call.error = error
+        with self.lock:
+            del self.calls[key]
+        call.done.set()
+
+    def do(self, key, fn):
+        """Return (result, shared): shared is True when another caller did the work"""
+        call, leader = self.join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self.finish(key, call, error=e)
+            else:
+                self.finish(key, call, result)
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+
+single_flight = SingleFlight()
+
+
+def idempotency_cache_key(scope, key):
+    return f'police_roster:idempotency:{scope}:{hashlib.md5(key.encode()).hexdigest()}'
+
+
+def request_fingerprint(path, data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.md5(f'{path}|{body}'.encode()).hexdigest()
+
+
+class IdempotentPostMixin:
+    """Idempotency-Key support and single-flight coalescing for POST handlers.
+
+    A POST carrying an Idempotency-Key stores its outcome (except server errors) in the
+    cache for IDEMPOTENCY_TIMEOUT; a replay with the same key and body gets the stored
+    response back, and the same key with a different body is rejected with 422.
+    Concurrent identical POSTs (same key, or same path and body when there is no key)
+    share one in-flight execution. Coalescing is per process; stored results are shared
+    by every process using the same cache (see ROSTER_CACHE_DIR).
+    """
+    idempotency_scope = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            self.post = self._idempotent_handler(self.post)
+        return super().dispatch(request, *args, **kwargs)
+
+    def _idempotent_handler(self, handler):
+        def idempotent(request, *args, **kwargs):
+            fingerprint = request_fingerprint(request.get_full_path(), request.data)
+            key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+            scope = self.idempotency_scope or type(self).__name__
+
+            if key:
+                cache_key = idempotency_cache_key(scope, key)
+                stored = cache.get(cache_key)
+                if stored is not None:
+                    return self._stored_response(stored, fingerprint)
+                flight_key = cache_key
+            else:
+                cache_key = None
+                flight_key = f'{scope}:{fingerprint}'
+
+            def run():
+                # A retry may have finished between the cache check and taking the flight
+                stored = cache.get(cache_key) if cache_key else None
+                if stored is not None:
+                    return stored, None
+                response = handler(request, *args, **kwargs)
+                outcome = {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data}
+                if cache_key and response.status_code < 500:
+                    cache.set(cache_key, outcome, IDEMPOTENCY_TIMEOUT)
+                return outcome, response
+
+            (outcome, response), shared = single_flight.do(flight_key, run)
+            if shared or response is None:
+                return self._stored_response(outcome, fingerprint)
+            return response
+        return idempotent
+
+    def _stored_response(self, outcome, fingerprint):
+        if outcome['fingerprint'] != fingerprint:
+            return Response(
+                {'error': 'Idempotency-Key was already used for a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(outcome['data'], status=outcome['status'], headers={REPLAY_HEADER: 'true'})
@@ -26,10 +26,10 @@ class Command(BaseCommand):
         try:
             # Get the rosters to archive
             if active_only:
-                rosters = Roster.objects.filter(is_active=True)
+                rosters = RosterSerializer.setup_eager_loading(Roster.objects.filter(is_active=True))
                 self.stdout.write(f'Found {rosters.count()} active rosters to archive')
             else:
-                rosters = Roster.objects.all()
+                rosters = RosterSerializer.setup_eager_loading(Roster.objects.all())
                 self.stdout.write(f'Found {rosters.count()} total rosters to archive')
             
             if not rosters.exists():
@@ -42,18 +42,9 @@ class Command(BaseCommand):
             for roster in rosters:
                 # Create a serialized version of all roster data
                 serializer = RosterSerializer(roster)
-                # Convert to Python dict to ensure we're not passing any unexpected types
-                roster_data = dict(serializer.data)
                 
-                # Create a PreviousRoster entry
-                previous_roster = PreviousRoster.objects.create(
-                    name=roster.name,
-                    created_at=roster.created_at,
-                    repetition_count=roster.repetition_count,
-                    same_area_repetition_count=roster.same_area_repetition_count,
-                    unfulfilled_requirements=roster.unfulfilled_requirements,
-                    roster_data=roster_data
-                )
+                # Create a PreviousRoster entry with its archived assignments
+                previous_roster = PreviousRoster.archive(roster, serializer.data)
                 
                 # Deactivate the roster if requested
                 if deactivate:
@@ -26,24 +26,15 @@ class Command(BaseCommand):
         try:
             # Find the roster
             try:
-                roster = Roster.objects.get(id=roster_id)
+                roster = RosterSerializer.setup_eager_loading(Roster.objects).get(id=roster_id)
             except Roster.DoesNotExist:
                 raise CommandError(f'Roster with ID {roster_id} does not exist')
             
             # Create a serialized version of all roster data
             serializer = RosterSerializer(roster)
-            # Convert to Python dict to ensure we're not passing any unexpected types
-            roster_data = dict(serializer.data)
             
-            # Create a PreviousRoster entry
-            previous_roster = PreviousRoster.objects.create(
-                name=roster.name,
-                created_at=roster.created_at,
-                repetition_count=roster.repetition_count,
-                same_area_repetition_count=roster.same_area_repetition_count,
-                unfulfilled_requirements=roster.unfulfilled_requirements,
-                roster_data=roster_data
-            )
+            # Create a PreviousRoster entry with its archived assignments
+            previous_roster = PreviousRoster.archive(roster, serializer.data)
             
             # Deactivate the roster if requested
             if deactivate:
@@ -0,0 +1,100 @@
+import contextlib
+import io
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from police_roster.models import Area, Policeman, Roster, RosterAssignment
+from police_roster.management.commands.generate_roster import RosterGenerator
+
+# Wait after a failed read (e.g. "database is locked"), doubling up to the maximum while reads
+# keep failing, so locked-out readers do not spin and flood the error count
+BACKOFF_INITIAL = 0.01
+BACKOFF_MAX = 0.2
+
+class Command(BaseCommand):
+    help = 'Measures read throughput and latency while a roster generation is writing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Number of concurrent reader threads'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the generated roster instead of deleting it afterwards'
+        )
+
+    def read_once(self):
+        """One typical dashboard read: latest roster with its assignments, areas and officers"""
+        roster = Roster.objects.order_by('-created_at').first()
+        if roster:
+            list(RosterAssignment.objects.filter(roster=roster).select_related('policeman', 'area__zone'))
+        list(Area.objects.select_related('zone'))
+        list(Policeman.objects.filter(preferred_duty='FIELD', has_fixed_duty=False))
+
+    def reader(self, stop, latencies, errors):
+        backoff = BACKOFF_INITIAL
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    self.read_once()
+                except OperationalError as e:
+                    errors.append(str(e))
+                    stop.wait(backoff)
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                backoff = BACKOFF_INITIAL
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(f'Profile: {settings.ROSTER_PROFILE} (journal_mode={journal_mode}, DEBUG={settings.DEBUG})')
+
+        stop = threading.Event()
+        latencies, errors = [], []
+        readers = [
+            threading.Thread(target=self.reader, args=(stop, latencies, errors))
+            for _ in range(options['readers'])
+        ]
+        for thread in readers:
+            thread.start()
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the generator prints its progress
+            roster = RosterGenerator().generate_roster(name='Benchmark roster', pending=True)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        for thread in readers:
+            thread.join()
+        if not options['keep']:
+            roster.delete()
+
+        self.stdout.write(f'Generation: {elapsed:.2f}s with {options["readers"]} concurrent readers')
+        attempts = len(latencies) + len(errors)
+        error_rate = f'{len(errors) / attempts:.1%}' if attempts else 'n/a'
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f'Reads: {len(latencies)} ({len(latencies) / elapsed:.1f}/s) | '
+                f'p50 {statistics.median(latencies) * 1000:.1f}ms | '
+                f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms | '
+                f'max {latencies[-1] * 1000:.1f}ms | '
+                f'errors {len(errors)} of {attempts} ({error_rate})'
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(
+                f'Failed reads: {len(errors)} of {attempts} ({error_rate}), first: {errors[0]}'
+            ))
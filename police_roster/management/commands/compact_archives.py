@@ -0,0 +1,87 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Value
+from police_roster.caching import bump_data_version, ROSTERS, GENERATION_INPUTS
+from police_roster.models import PreviousRoster
+from police_roster.archive_format import encode, decode
+
+class Command(BaseCommand):
+    help = 'Rewrites PreviousRoster archives in the compact storage format and reports the space saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the space the compaction would save'
+        )
+        parser.add_argument(
+            '--expand',
+            action='store_true',
+            help='Store the archives as plain JSON again, e.g. before downgrading'
+        )
+
+    def stored_archives(self):
+        """(id, roster_data, unfulfilled_requirements) as stored, without decoding"""
+        table = connection.ops.quote_name(PreviousRoster._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, roster_data, unfulfilled_requirements FROM {table} ORDER BY id')
+            yield from cursor.fetchall()
+
+    def handle(self, *args, **options):
+        expand = options['expand']
+        before = after = total = 0
+        updates = []
+
+        for archive_id, stored_data, stored_unfulfilled in self.stored_archives():
+            total += 1
+            values = [json.loads(text) if text is not None else None for text in (stored_data, stored_unfulfilled)]
+            roster_data, unfulfilled = [decode(value) for value in values]
+            roster_data = dict(roster_data or {})
+
+            if expand:
+                roster_data.setdefault('unfulfilled_requirements', unfulfilled)
+                rewritten = [roster_data, unfulfilled]
+            else:
+                # The header used to repeat the unfulfilled requirements column
+                if roster_data.get('unfulfilled_requirements') == unfulfilled:
+                    roster_data.pop('unfulfilled_requirements')
+                rewritten = [encode(roster_data), encode(unfulfilled)]
+
+            before += sum(_stored_size(text) for text in (stored_data, stored_unfulfilled))
+            after += sum(_stored_size(json.dumps(value) if value is not None else None) for value in rewritten)
+            if rewritten != values:
+                updates.append((archive_id, rewritten))
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                for archive_id, (roster_data, unfulfilled) in updates:
+                    # Values wrapped in Value are stored as given, bypassing the field's encoding
+                    PreviousRoster.objects.filter(id=archive_id).update(
+                        roster_data=Value(roster_data, output_field=models.JSONField()),
+                        unfulfilled_requirements=(
+                            Value(unfulfilled, output_field=models.JSONField()) if unfulfilled is not None else None
+                        )
+                    )
+            # update() sends no signals; bump the versions so other processes drop what they derived
+            if updates:
+                bump_data_version(ROSTERS)
+                bump_data_version(GENERATION_INPUTS)
+
+        action = 'Would rewrite' if options['dry_run'] else 'Rewrote'
+        form = 'plain JSON' if expand else 'the compact format'
+        saved = before - after
+        percent = f' ({abs(saved) / before:.0%})' if before else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {len(updates)} of {total} archives in {form}: '
+            f'{_kib(before)} -> {_kib(after)}, {"saved" if saved >= 0 else "added"} {_kib(abs(saved))}{percent}'
+        ))
+
+
+def _stored_size(text):
+    return len(text.encode()) if text is not None else 0
+
+
+def _kib(size):
+    return f'{size / 1024:.1f} KiB'
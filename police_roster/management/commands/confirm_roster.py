@@ -1,4 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
 from police_roster.models import Roster, RosterAssignment, PreviousRoster
 from police_roster.serializers import RosterSerializer
 
@@ -19,6 +21,12 @@ class Command(BaseCommand):
             default='save',
             help='Action to take: save or discard the roster'
         )
+        
+        parser.add_argument(
+            '--name',
+            type=str,
+            help='Rename the roster when saving it'
+        )
 
     def handle(self, *args, **options):
         roster_id = options['roster_id']
@@ -27,7 +35,7 @@ class Command(BaseCommand):
         try:
             # Find the roster
             try:
-                roster = Roster.objects.get(id=roster_id)
+                roster = RosterSerializer.setup_eager_loading(Roster.objects).get(id=roster_id)
             except Roster.DoesNotExist:
                 raise CommandError(f'Roster with ID {roster_id} does not exist')
             
@@ -37,26 +45,23 @@ class Command(BaseCommand):
                 return
             
             if action == 'save':
-                # Save to PreviousRoster first
-                # Create a serialized version of all roster data
-                serializer = RosterSerializer(roster)
-                # Convert to Python dict to ensure we're not passing any unexpected types
-                roster_data = dict(serializer.data)
-                
-                # Create a PreviousRoster entry
-                PreviousRoster.objects.create(
-                    name=roster.name,
-                    created_at=roster.created_at,
-                    repetition_count=roster.repetition_count,
-                    same_area_repetition_count=roster.same_area_repetition_count,
-                    unfulfilled_requirements=roster.unfulfilled_requirements,
-                    roster_data=roster_data
-                )
-                
-                # Activate the roster
+                with transaction.atomic():
+                    # Claim the pending roster with a conditional update, so of several concurrent
+                    # confirmations exactly one archives it and the others see it as already saved
+                    if options.get('name'):
+                        roster.name = options['name']
+                    claimed = Roster.objects.filter(id=roster_id, is_pending=True).update(
+                        name=roster.name, is_pending=False, is_active=True, updated_at=timezone.now()
+                    )
+                    if not claimed:
+                        self.stdout.write(self.style.WARNING(f'Roster #{roster_id} was confirmed concurrently'))
+                        return
+                    
+                    # Create a PreviousRoster entry with its archived assignments, from the roster
+                    # as it was when generated
+                    PreviousRoster.archive(roster, RosterSerializer(roster).data)
                 roster.is_pending = False
                 roster.is_active = True
-                roster.save()
                 
                 self.stdout.write(self.style.SUCCESS(f'Roster #{roster_id} "{roster.name}" has been activated and stored in PreviousRoster'))
                 
@@ -69,8 +74,10 @@ class Command(BaseCommand):
                 # Get the roster name before deleting
                 roster_name = roster.name
                 
-                # Delete the roster and its assignments
-                roster.delete()
+                # Delete the roster and its assignments, unless it was saved in the meantime
+                if not Roster.objects.filter(id=roster_id, is_pending=True).delete()[0]:
+                    self.stdout.write(self.style.WARNING(f'Roster #{roster_id} was confirmed concurrently'))
+                    return
                 
                 self.stdout.write(self.style.SUCCESS(f'Roster #{roster_id} "{roster_name}" has been discarded'))
                 
@@ -1,155 +1,310 @@
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
 from django.utils import timezone
+import heapq
 import random
-from collections import defaultdict
+import time
+from collections import defaultdict, deque
 
-from police_roster.models import (
-    Zone, Area, Policeman, Deployment, 
-    Roster, RosterAssignment, PreviousRoster, CorrigendumChange
-)
+from police_roster.models import Roster, RosterAssignment
+from police_roster.constraints import ConstraintSet
+from police_roster.metrics import registry as metrics
+from police_roster.snapshot import get_snapshot
+
+
+class ZoneShortageScheduler:
+    """Orders area processing so shortages are spread evenly across zones.
+
+    Areas are queued per zone and a heap keyed on (shortage ratio, zone id) picks the
+    zone to serve next. A zone is re-pushed with its current ratio after each of its
+    areas is processed, so shortages accrued during a pass lower its priority right away.
+    Each step costs O(log z) for z zones instead of re-sorting the whole area list.
+    """
+    
+    def __init__(self, areas_with_deployments, zone_shortages):
+        self.zone_shortages = zone_shortages  # Shared with the generator, updated as areas are processed
+        self.zone_requirements = defaultdict(int)
+        for area, deployment in areas_with_deployments:
+            self.zone_requirements[area.zone_id] += (
+                deployment.si_count + 
+                deployment.asi_count + 
+                deployment.hc_count + 
+                deployment.constable_count
+            )
+    
+    def shortage_ratio(self, zone_id):
+        """Return the current shortage of a zone relative to its total requirement"""
+        total_required = self.zone_requirements.get(zone_id, 0)
+        if total_required > 0:
+            return self.zone_shortages.get(zone_id, 0) / total_required
+        return 0
+    
+    def iterate(self, areas_with_deployments):
+        """Yield (area, deployment) pairs, always from the zone with the lowest shortage ratio
+        
+        Within a zone, areas keep the order in which they were given.
+        """
+        queues = defaultdict(deque)
+        for area, deployment in areas_with_deployments:
+            queues[area.zone_id].append((area, deployment))
+        
+        heap = [(self.shortage_ratio(zone_id), zone_id) for zone_id in queues]
+        heapq.heapify(heap)
+        
+        while heap:
+            _, zone_id = heapq.heappop(heap)
+            queue = queues[zone_id]
+            yield queue.popleft()
+            if queue:
+                heapq.heappush(heap, (self.shortage_ratio(zone_id), zone_id))
+
+
+class UnfulfilledRequirements:
+    """Unfulfilled requirements keyed by area id, with an index of open areas per rank.
+
+    Each entry keeps the {'area': area, 'unfulfilled': {rank: count}} shape used for
+    display and serialization. Updates are O(1), and areas leave the per-rank index as
+    soon as their slots for that rank are filled, so top-up passes only visit areas
+    that still have open slots.
+    """
+    
+    def __init__(self):
+        self.areas = {}  # {area_id: {'area': area, 'unfulfilled': {rank: count}}}
+        self.open_by_rank = defaultdict(dict)  # {rank: {area_id: area}}, in insertion order
+    
+    def set(self, area, rank, count):
+        """Record the number of open slots for a rank in an area"""
+        if count <= 0:
+            self._clear(area.id, rank)
+            return
+        item = self.areas.setdefault(area.id, {'area': area, 'unfulfilled': {}})
+        item['unfulfilled'][rank] = count
+        self.open_by_rank[rank][area.id] = area
+    
+    def update(self, area, requirements):
+        """Record open slots for several ranks in an area"""
+        for rank, count in requirements.items():
+            self.set(area, rank, count)
+    
+    def count(self, area_id, rank):
+        """Return the number of open slots for a rank in an area"""
+        item = self.areas.get(area_id)
+        return item['unfulfilled'].get(rank, 0) if item else 0
+    
+    def fill(self, area_id, rank, filled=1):
+        """Mark slots as filled, dropping the rank (and the area) once nothing is open"""
+        remaining = self.count(area_id, rank) - filled
+        if remaining > 0:
+            self.areas[area_id]['unfulfilled'][rank] = remaining
+        else:
+            self._clear(area_id, rank)
+    
+    def totals(self):
+        """Return the open slots summed over all areas, by rank"""
+        totals = defaultdict(int)
+        for item in self.areas.values():
+            for rank, count in item['unfulfilled'].items():
+                totals[rank] += count
+        return dict(totals)
+    
+    def open_areas(self, rank):
+        """Return the areas that still have open slots for a rank"""
+        return list(self.open_by_rank[rank].values())
+    
+    def _clear(self, area_id, rank):
+        item = self.areas.get(area_id)
+        if item:
+            item['unfulfilled'].pop(rank, None)
+            if not item['unfulfilled']:
+                del self.areas[area_id]
+        self.open_by_rank[rank].pop(area_id, None)
+    
+    def __iter__(self):
+        # Iterate over a snapshot so callers can fill slots while iterating
+        return iter(list(self.areas.values()))
+    
+    def __len__(self):
+        return len(self.areas)
 
 
 class RosterGenerator:
     """Helper class for roster generation logic"""
     
-    # Restricted areas for female employees
-    RESTRICTED_AREAS = {
-        'Zebra-101', 'Zebra-102', 'Zebra-103', 'Zebra-104', 'Zebra-105', 'Zebra-106', 
-        'Zebra-107', 'Zebra-108', 'Zebra-109', 'Zebra-111', 'Zebra-112', 'Zebra-201', 
-        'Zebra-202', 'Zebra-203', 'Zebra-204', 'Zebra-205', 'Zebra-207', 'Zebra-208', 
-        'Zebra-210', 'Zebra-211', 'Zebra-212', 'Zebra-213', 'Zebra-301', 'Zebra-303', 
-        'Zebra-304', 'Zebra-306', 'Zebra-308', 'Zebra-309', 'Zeb-310', 'Zeb-311', 
-        'Zebra-401', 'Zebra-403', 'Zebra-404', 'Zebra-406', 'Zebra-407', 'Zebra-408', 
-        'Zebra-409', 'Zebra-410', 'Zullu-01', 'Zullu-02', 'Eagle-05 M/C', 'Eagle-01', 
-        'Eagle-02', 'Eagle-03', 'Eagle-04', 'Eagle-05', 'Eagle-06', 'Eagle-07', 'Eagle-08', 
-        'Eagle-09', 'Eagle-10', 'Eagle-11', 'Eagle-12', 'Towing-01', 'Towing-02', 
-        'Towing-03', 'Towing-04', 'Rec-01', 'Rec-02', 'Rec-03', 'Rec-04', 'Recovery -05', 
-        'Rhino-01', 'Rhino-02'
+    # Deployment requirement field filled by each rank
+    RANK_COUNT_FIELDS = {
+        'SI': 'si_count',
+        'ASI': 'asi_count',
+        'HC': 'hc_count',
+        'CONST': 'constable_count',
+        'HG': 'hgv_count',
     }
     
-   
-    # FORCED_ASSIGNMENTS = {
-    #     # Add your forced assignments here
-    #     "6320": 602,
-    #     "3148": 602
-        
-    # }
+    # Generation phases, each followed by a progress event from iter_generate_roster
+    PHASES = ('load', 'si', 'senior', 'drivers', 'ranks', 'hg', 'write')
     
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, seed=None):
         self.repetition_count = 0
         self.same_area_repetition_count = 0
         self.previous_assignments = {}  # Dict to track {officer_id: (zone_id, area_id)} from previous roster
         self.assigned_officers = set()  # Track officers already assigned in current roster
-        self.incomplete_assignments = []  # Track areas with unfulfilled requirements
+        self.incomplete_assignments = UnfulfilledRequirements()  # Track areas with unfulfilled requirements
         self.reserved_officers = []  # Track officers not assigned in current roster (reserved)
         self.verbose = verbose
         self.zone_shortages = defaultdict(int)  # Track shortages by zone to distribute them evenly
-        # Initialize forced assignments from class variable
-        self.forced_assignments = self.FORCED_ASSIGNMENTS
-        if self.verbose and self.forced_assignments:
-            print(f"DEBUG: Loaded {len(self.forced_assignments)} forced assignments")
-            for belt_no, area_id in self.forced_assignments.items():
-                print(f"  - Belt #{belt_no} -> Area ID {area_id}")
+        self.constraints = ConstraintSet([])  # Compiled assignment rules, from the generation snapshot
+        self.forced_assignments = {}  # {area_id: [officers]} pinned via ForcedAssignment, from the snapshot
+        self.forced_areas = {}  # {area_id: area} of the pins
+        self.skipped_forced_assignments = []  # Pins that could not be applied, with the reason
+        self.seed = seed
+        self.random = random.Random(seed)  # Same seed and same inputs give the same roster
+        self.roster = None  # Roster of the current run, set once it is created
+        self.started = None
     
-    def load_previous_assignments(self):
-        """Load most recent previous assignments and corrigendum changes"""
-        previous_roster = PreviousRoster.objects.all().order_by('-created_at').first()
+    def load_snapshot(self):
+        """Take the warm generation inputs (rules, officers, deployments, previous assignments)"""
+        snapshot = get_snapshot()
+        self.constraints = snapshot.constraints
+        self.previous_assignments = snapshot.previous_assignments
+        self.forced_assignments = snapshot.forced_assignments
+        self.forced_areas = snapshot.forced_areas
         
-        if not previous_roster:
-            if self.verbose:
+        if self.verbose:
+            if snapshot.previous_roster_id is None:
                 print("No previous roster found")
-            return
-            
-        try:
-            # First load the regular assignments from roster_data
-            if previous_roster.roster_data and isinstance(previous_roster.roster_data, dict):
-                assignments = previous_roster.roster_data.get('assignments', [])
-                if isinstance(assignments, list):
-                    if self.verbose:
-                        print(f"Found {len(assignments)} assignments in previous roster {previous_roster.id}")
-                    for assignment in assignments:
-                        self._process_previous_assignment(assignment)
-                    if self.verbose:
-                        print(f"Processed {len(self.previous_assignments)} previous assignments")
-                else:
-                    if self.verbose:
-                        print("Previous roster assignments is not a list")
             else:
-                if self.verbose:
-                    print("Previous roster has no valid roster_data")
-
-            # Then load and apply corrigendum changes to override previous assignments
-            corrigendum_changes = CorrigendumChange.objects.filter(
-                roster=previous_roster
-            ).select_related('policeman', 'area', 'area__zone').order_by('-created_at')
-
-            if self.verbose:
-                print(f"Found {corrigendum_changes.count()} corrigendum changes")
-
-            # Apply corrigendum changes - these override the original assignments
-            for change in corrigendum_changes:
-                self.previous_assignments[change.policeman.id] = (
-                    change.area.zone_id,
-                    change.area.id
-                )
-                if self.verbose:
-                    print(f"Applied corrigendum change: Officer {change.policeman.name} -> Area {change.area.name}")
-
-        except Exception as e:
-            if self.verbose:
-                print(f"Error loading previous assignments and changes: {e}")
-                import traceback
-                print(traceback.format_exc())
+                print(f"Processed {len(self.previous_assignments)} previous assignments "
+                      f"(corrigenda applied) from roster {snapshot.previous_roster_id}")
+            if self.forced_assignments:
+                print(f"DEBUG: Loaded forced assignments for {len(self.forced_assignments)} areas")
+                for area_id, officers in self.forced_assignments.items():
+                    for officer in officers:
+                        print(f"  - Belt #{officer.belt_no} -> Area ID {area_id}")
+        return snapshot
     
-    def _process_previous_assignment(self, assignment):
-        """Process a single previous assignment"""
-        try:
-            if ('area' in assignment and 'policeman' in assignment and 
-                isinstance(assignment['area'], int) and 
-                isinstance(assignment['policeman'], int)):
+    def _apply_forced_assignments(self, areas_with_deployments, roster):
+        """Assign pinned officers to their areas and reduce the requirements they fill"""
+        forced_assignments = []
+        if not self.forced_assignments:
+            return forced_assignments
+        
+        for area, deployment in areas_with_deployments:
+            for officer in self.forced_assignments.get(area.id, []):
+                # Skip officers who are not available for field duty (static or fixed postings)
+                if not self.constraints.in_pool(officer, 'FIELD'):
+                    self._skip_forced_assignment(officer, area, 'Not available for field duty')
+                    continue
                 
-                area_id = assignment['area']
-                try:
-                    area = Area.objects.get(id=area_id)
-                    self.previous_assignments[assignment['policeman']] = (
-                        area.zone_id,
-                        area_id
-                    )
-                    if self.verbose:
-                        print(f"Added previous assignment: Officer {assignment['policeman']} -> Area {area_id} (Zone {area.zone_id})")
-                except Area.DoesNotExist:
-                    if self.verbose:
-                        print(f"Area {area_id} not found")
-                    pass
-        except (TypeError, ValueError, KeyError) as e:
-            if self.verbose:
-                print(f"Error processing assignment: {e}")
-            pass
+                # Skip if an assignment rule forbids this officer here
+                if not self.constraints.allows(officer, area):
+                    self._skip_forced_assignment(officer, area, 'Restricted area')
+                    continue
+                
+                was_previous_zone, was_previous_area = self._check_previous_assignment(officer, area)
+                forced_assignments.append(RosterAssignment(
+                    roster=roster,
+                    area=area,
+                    policeman=officer,
+                    was_previous_zone=was_previous_zone,
+                    was_previous_area=was_previous_area
+                ))
+                
+                # Update tracking
+                self.assigned_officers.add(officer.id)
+                if was_previous_zone:
+                    self.repetition_count += 1
+                if was_previous_area:
+                    self.same_area_repetition_count += 1
+                
+                # Adjust deployment requirements based on the forced assignment
+                count_field = self.RANK_COUNT_FIELDS.get(officer.rank)
+                if count_field:
+                    setattr(deployment, count_field, max(0, getattr(deployment, count_field) - 1))
+                if officer.is_driver:
+                    deployment.driver_count = max(0, deployment.driver_count - 1)
+                if officer.rank in ['SI', 'ASI', 'HC']:
+                    deployment.senior_count = max(0, deployment.senior_count - 1)
+                
+                if self.verbose:
+                    print(f"DEBUG: Force assigned officer {officer.name} (Belt #{officer.belt_no}, Rank: {officer.rank}) to area {area.name}")
+        
+        # Pins to areas without a current deployment have no slot to fill
+        deployed_area_ids = {area.id for area, deployment in areas_with_deployments}
+        for area_id, officers in self.forced_assignments.items():
+            if area_id not in deployed_area_ids:
+                for officer in officers:
+                    self._skip_forced_assignment(officer, self.forced_areas[area_id], 'No deployment for area')
+        
+        RosterAssignment.objects.bulk_create(forced_assignments)
+        return forced_assignments
+    
+    def _skip_forced_assignment(self, officer, area, reason):
+        """Record a forced assignment that could not be applied"""
+        self.skipped_forced_assignments.append({'officer': officer, 'area': area, 'reason': reason})
+        if self.verbose:
+            print(f"WARNING: Cannot force assign officer {officer.name} to area {area.name}: {reason}")
     
     def generate_roster(self, name=None, pending=True):
         """Generate a new roster based on deployments and previous assignments"""
+        for event in self.iter_generate_roster(name, pending):
+            pass
+        return self.roster
+    
+    def iter_generate_roster(self, name=None, pending=True):
+        """Generate a roster, yielding a progress event after each of PHASES.
+
+        The roster is in self.roster once the iterator is exhausted. Closing the iterator
+        early (e.g. when a streaming client disconnects) abandons the run and deletes the
+        partial roster.
+        """
+        self.started = time.perf_counter()
+        self.roster = None
+        try:
+            yield from self._generate_roster(name, pending)
+        except GeneratorExit:
+            if self.roster is not None and self.roster.pk is not None:
+                self.roster.delete()
+            raise
+        except Exception:
+            metrics.record_generation_failure()
+            raise
+        metrics.record_generation(self, time.perf_counter() - self.started)
+    
+    def _progress(self, phase, **extra):
+        """Progress event for a finished phase: officers placed so far and the open slots by rank"""
+        return {
+            'phase': phase,
+            'step': self.PHASES.index(phase) + 1,
+            'steps': len(self.PHASES),
+            'roster': self.roster.id if self.roster else None,
+            'assigned': len(self.assigned_officers),
+            'shortages': self.incomplete_assignments.totals(),
+            'elapsed': round(time.perf_counter() - self.started, 3),
+            **extra
+        }
+    
+    def _generate_roster(self, name, pending):
         # Reset tracking variables
         self.assigned_officers = set()
-        self.incomplete_assignments = []
+        self.incomplete_assignments = UnfulfilledRequirements()
         self.repetition_count = 0
         self.same_area_repetition_count = 0
         self.zone_shortages = defaultdict(int)
         self.reserved_officers = []
+        self.skipped_forced_assignments = []
+        self.random = random.Random(self.seed)
         
-        # Load previous assignments to avoid repetition
-        self.load_previous_assignments()
+        # Rules, officers, deployments and previous assignments, loaded once per data version
+        snapshot = self.load_snapshot()
         
         # Create a new roster
         roster_name = name or f"Roster {timezone.now().strftime('%Y-%m-%d')}"
-        roster = Roster.objects.create(
+        roster = self.roster = Roster.objects.create(
             name=roster_name, 
             is_active=not pending,
             is_pending=pending
         )
         
-        # Get all areas with their latest deployments
-        areas_with_deployments = self._get_areas_with_deployments()
+        # Get all areas with their latest deployments (copies, forced assignments reduce them)
+        areas_with_deployments = snapshot.areas_with_deployment_copies()
         
         # Calculate total requirements 
         total_requirements = {
@@ -177,11 +332,10 @@ class RosterGenerator:
                 print(f"{rank}: {count}")
             print("=====================================\n")
         
-        # Get all field officers
-        available_officers = self._get_available_officers()
+        yield self._progress('load', required=total_requirements)
         
-        # Group officers by rank
-        officers_by_rank = self._group_officers_by_rank(available_officers)
+        # Field officers grouped by rank (fresh lists, they are shuffled and filtered below)
+        officers_by_rank = snapshot.officer_lists_by_rank()
         
         # Print available officers by rank for debugging
         if self.verbose:
@@ -190,8 +344,8 @@ class RosterGenerator:
                 print(f"{rank}: {len(officers)}")
             print("==================================\n")
         
-        # Get drivers separately - ensure they are FIELD duty drivers only
-        drivers = list(filter(lambda o: o.is_driver and o.preferred_duty == 'FIELD' and not o.has_fixed_duty, available_officers))
+        # Get drivers separately - eligibility comes from the DRIVER pool requirements
+        drivers = list(snapshot.drivers)
         
         if self.verbose:
             print(f"DEBUG: Found {len(drivers)} field-duty drivers available for assignment")
@@ -207,6 +361,11 @@ class RosterGenerator:
             'SENIOR': 0
         }
 
+        # Apply forced assignments in a single pre-pass so every later pass sees them as assigned
+        for assignment in self._apply_forced_assignments(areas_with_deployments, roster):
+            if assignment.policeman.rank in rank_assignments:
+                rank_assignments[assignment.policeman.rank] += 1
+
         # FIRST: Handle SI assignments separately
         si_assignments = []
         if 'SI' in officers_by_rank:
@@ -227,9 +386,7 @@ class RosterGenerator:
             for area, deployment in areas_needing_sis:
                 if deployment.si_count > 0 and available_sis:
                     # Get available SIs for this area (considering restrictions)
-                    available_sis_for_area = available_sis
-                    if self._is_restricted_area(area):
-                        available_sis_for_area = [si for si in available_sis if not self._is_female_officer(si)]
+                    available_sis_for_area = self.constraints.filter_pool(available_sis, area)
                     
                     if available_sis_for_area:
                         si_assignments_for_area = self._allocate_officers('SI', available_sis_for_area, deployment.si_count, area)
@@ -242,11 +399,13 @@ class RosterGenerator:
                         
                         if self.verbose:
                             print(f"DEBUG: Assigned {len(si_assignments_for_area)} SIs to {area.name}")
-                            if len(si_assignments_for_area) < deployment.si_count:
+                        
+                        # Track unfulfilled SI requirements
+                        if len(si_assignments_for_area) < deployment.si_count:
+                            if self.verbose:
                                 print(f"WARNING: Could not fulfill all SI requirements for {area.name}. Needed {deployment.si_count}, assigned {len(si_assignments_for_area)}")
-                                # Track unfulfilled SI requirements
-                                unfulfilled = deployment.si_count - len(si_assignments_for_area)
-                                self._add_unfulfilled_requirement(area, 'SI', unfulfilled)
+                            unfulfilled = deployment.si_count - len(si_assignments_for_area)
+                            self._add_unfulfilled_requirement(area, 'SI', unfulfilled)
                     else:
                         if self.verbose:
                             print(f"WARNING: No suitable SIs available for {area.name}")
@@ -273,6 +432,8 @@ class RosterGenerator:
                     policeman__rank='SI'
                 ).count()
                 print(f"DEBUG: Verified SI assignments in database: {assigned_si_count}")
+        
+        yield self._progress('si')
 
         # SECOND: Create senior officers pool with remaining SIs
         senior_officers = []
@@ -290,9 +451,9 @@ class RosterGenerator:
         
         # Shuffle all officer lists for randomness
         for rank in officers_by_rank:
-            random.shuffle(officers_by_rank[rank])
-        random.shuffle(drivers)
-        random.shuffle(senior_officers)
+            self.random.shuffle(officers_by_rank[rank])
+        self.random.shuffle(drivers)
+        self.random.shuffle(senior_officers)
         
         # Group areas by zone for balanced shortage distribution
         areas_by_zone = self._group_areas_by_zone(areas_with_deployments)
@@ -352,154 +513,41 @@ class RosterGenerator:
             print(f"Senior Assignments: {len(senior_assignments)}")
             print("=========================\n")
         
-        # Now process regular assignments for all areas
-        # Sort areas by zones with higher shortage ratio for better distribution
-        sorted_areas_with_deployments = self._sort_areas_for_balanced_shortage(areas_with_deployments)
+        yield self._progress('senior')
         
-        # First Pass: Calculate total driver requirements by priority
-        # Sort areas by driver requirement first, this ensures we allocate drivers to where they're needed most
-        areas_needing_drivers = [(area, deployment) for area, deployment in sorted_areas_with_deployments if deployment.driver_count > 0]
-        areas_needing_drivers.sort(key=lambda x: x[1].driver_count, reverse=True)
+        # Now process regular assignments for all areas
+        # Serve zones with the lowest current shortage ratio first for better distribution
+        scheduler = ZoneShortageScheduler(areas_with_deployments, self.zone_shortages)
         
+        # Place all drivers at once: driver slots first, then slots of their own rank
         total_driver_requirement = sum(deployment.driver_count for area, deployment in areas_with_deployments)
         if self.verbose:
             print(f"DEBUG: Total driver requirement across all areas: {total_driver_requirement}")
             print(f"DEBUG: Total available drivers: {len(drivers)}")
-            print(f"DEBUG: Areas needing drivers: {len(areas_needing_drivers)}")
         
-        # Process each area and create assignments, but first allocate areas needing drivers
-        for area, deployment in areas_needing_drivers:
-            area_assignments = self._process_area_assignment(area, deployment, officers_by_rank, drivers, roster)
-            
-            # Update rank assignment counts
-            for assignment in area_assignments:
-                officer = assignment.policeman
-                if officer.is_driver:
-                    rank_assignments['DRIVER'] += 1
-                if officer.rank in rank_assignments:
-                    rank_assignments[officer.rank] += 1
+        for assignment, slot in self._match_drivers(areas_with_deployments, drivers, roster):
+            if slot == 'DRIVER':
+                rank_assignments['DRIVER'] += 1
+            if assignment.policeman.rank in rank_assignments:
+                rank_assignments[assignment.policeman.rank] += 1
+        
+        yield self._progress('drivers')
         
-        # Second pass: Process remaining areas without driver requirements
-        areas_without_drivers = [(area, deployment) for area, deployment in sorted_areas_with_deployments if deployment.driver_count == 0]
-        for area, deployment in areas_without_drivers:
-            area_assignments = self._process_area_assignment(area, deployment, officers_by_rank, drivers, roster)
+        # Process the remaining rank requirements of every area
+        for area, deployment in scheduler.iterate(areas_with_deployments):
+            area_assignments = self._process_area_assignment(area, deployment, officers_by_rank, roster)
             
             # Update rank assignment counts
             for assignment in area_assignments:
                 officer = assignment.policeman
-                if officer.is_driver:
-                    rank_assignments['DRIVER'] += 1
                 if officer.rank in rank_assignments:
                     rank_assignments[officer.rank] += 1
         
-        # Check for any unfulfilled requirements - if we still have drivers, use them in their ranks
-        remaining_drivers = [d for d in drivers if d.id not in self.assigned_officers]
-        if remaining_drivers and self.incomplete_assignments:
-            if self.verbose:
-                print(f"DEBUG: We have {len(remaining_drivers)} drivers left. Checking if they can fill other positions.")
-            
-            for item in list(self.incomplete_assignments):  # Use a copy to safely modify during iteration
-                area = item['area']
-                unfulfilled = item['unfulfilled']
-                
-                # First try to fill driver requirements if any are still unfulfilled
-                if 'DRIVER' in unfulfilled and unfulfilled['DRIVER'] > 0:
-                    drivers_needed = unfulfilled['DRIVER']
-                    drivers_to_assign = min(len(remaining_drivers), drivers_needed)
-                    
-                    if drivers_to_assign > 0:
-                        if self.verbose:
-                            print(f"DEBUG: Filling {drivers_to_assign} driver positions in {area.name}")
-                        
-                        for i in range(drivers_to_assign):
-                            driver = remaining_drivers.pop(0)
-                            
-                            # Skip if restricted area and female driver
-                            if self._is_restricted_area(area) and self._is_female_officer(driver):
-                                continue
-                                
-                            # Check if this would cause repetition
-                            was_previous_zone, was_previous_area = self._check_previous_assignment(driver, area)
-                            
-                            RosterAssignment.objects.create(
-                                roster=roster,
-                                area=area,
-                                policeman=driver,
-                                was_previous_zone=was_previous_zone,
-                                was_previous_area=was_previous_area
-                            )
-                            
-                            # Update tracking
-                            self.assigned_officers.add(driver.id)
-                            if was_previous_zone:
-                                self.repetition_count += 1
-                            if was_previous_area:
-                                self.same_area_repetition_count += 1
-                            
-                            # Update unfulfilled count
-                            unfulfilled['DRIVER'] -= 1
-                            if unfulfilled['DRIVER'] == 0:
-                                del unfulfilled['DRIVER']
-                            
-                            rank_assignments['DRIVER'] += 1
-                
-                # Then try to fill other ranks with remaining drivers
-                if remaining_drivers:
-                    for rank in list(unfulfilled.keys()):  # Use list() to safely modify during iteration
-                        if rank != 'DRIVER' and unfulfilled[rank] > 0:
-                            # Find drivers with matching rank
-                            matching_drivers = [d for d in remaining_drivers if d.rank == rank]
-                            
-                            if matching_drivers:
-                                drivers_to_assign = min(len(matching_drivers), unfulfilled[rank])
-                                
-                                if self.verbose:
-                                    print(f"DEBUG: Filling {drivers_to_assign} {rank} positions with drivers in {area.name}")
-                                
-                                for i in range(drivers_to_assign):
-                                    driver = matching_drivers[i]
-                                    remaining_drivers.remove(driver)
-                                    
-                                    # Skip if restricted area and female driver
-                                    if self._is_restricted_area(area) and self._is_female_officer(driver):
-                                        continue
-                                        
-                                    # Check if this would cause repetition
-                                    was_previous_zone, was_previous_area = self._check_previous_assignment(driver, area)
-                                    
-                                    RosterAssignment.objects.create(
-                                        roster=roster,
-                                        area=area,
-                                        policeman=driver,
-                                        was_previous_zone=was_previous_zone,
-                                        was_previous_area=was_previous_area
-                                    )
-                                    
-                                    # Update tracking
-                                    self.assigned_officers.add(driver.id)
-                                    if was_previous_zone:
-                                        self.repetition_count += 1
-                                    if was_previous_area:
-                                        self.same_area_repetition_count += 1
-                                    
-                                    # Update unfulfilled count
-                                    unfulfilled[rank] -= 1
-                                    if unfulfilled[rank] == 0:
-                                        del unfulfilled[rank]
-                                    
-                                    # Update assignments count
-                                    rank_assignments[rank] += 1
-                
-                # If all requirements for this area are now fulfilled, remove it from incomplete_assignments
-                if not unfulfilled:
-                    self.incomplete_assignments.remove(item)
+        yield self._progress('ranks')
         
         # Special pass for Home Guards - ensure all Home Guard positions are filled
         # They can be assigned anywhere without restriction (except gender restriction in restricted areas)
-        areas_needing_homeguards = []
-        for item in list(self.incomplete_assignments):
-            if 'HG' in item['unfulfilled'] and item['unfulfilled']['HG'] > 0:
-                areas_needing_homeguards.append(item)
+        areas_needing_homeguards = self.incomplete_assignments.open_areas('HG')
         
         if areas_needing_homeguards:
             # Get all available Home Guards not yet assigned
@@ -509,17 +557,11 @@ class RosterGenerator:
                 print(f"DEBUG: We have {len(available_hgs)} Home Guards left. Trying to fill {len(areas_needing_homeguards)} areas needing Home Guards.")
             
             # Sort Home Guards by least repetition risk
-            for area_item in areas_needing_homeguards:
-                area = area_item['area']
-                hgs_needed = area_item['unfulfilled']['HG']
-                
-                # Check if area is restricted
-                is_restricted = self._is_restricted_area(area)
+            for area in areas_needing_homeguards:
+                hgs_needed = self.incomplete_assignments.count(area.id, 'HG')
                 
                 # Filter available Home Guards for this area
-                hgs_for_area = available_hgs
-                if is_restricted:
-                    hgs_for_area = [hg for hg in hgs_for_area if not self._is_female_officer(hg)]
+                hgs_for_area = self.constraints.filter_pool(available_hgs, area)
                 
                 # If we have any HGs for this area, try to assign them
                 if hgs_for_area:
@@ -558,16 +600,12 @@ class RosterGenerator:
                             self.same_area_repetition_count += 1
                         
                         # Update unfulfilled count
-                        area_item['unfulfilled']['HG'] -= 1
-                        if area_item['unfulfilled']['HG'] == 0:
-                            del area_item['unfulfilled']['HG']
+                        self.incomplete_assignments.fill(area.id, 'HG')
                         
                         # Update assignments count
                         rank_assignments['HG'] += 1
-                        
-                    # If all requirements for this area are now fulfilled, remove it from incomplete_assignments
-                    if not area_item['unfulfilled']:
-                        self.incomplete_assignments.remove(area_item)
+        
+        yield self._progress('hg')
         
         # Print assignment statistics
         if self.verbose:
@@ -590,8 +628,7 @@ class RosterGenerator:
             roster.unfulfilled_requirements = None
         
         # Find all unassigned (reserved) field officers
-        all_field_officers = self._get_available_officers()
-        self.reserved_officers = [officer for officer in all_field_officers if officer.id not in self.assigned_officers]
+        self.reserved_officers = [officer for officer in snapshot.field_officers if officer.id not in self.assigned_officers]
         
         # Format and store reserved officers in the roster
         if self.reserved_officers:
@@ -600,19 +637,15 @@ class RosterGenerator:
                 roster.unfulfilled_requirements['reserved'] = reserved_by_rank
             else:
                 roster.unfulfilled_requirements = {'reserved': reserved_by_rank}
+        
+        # Report forced assignments that were skipped
+        if self.skipped_forced_assignments:
+            roster.unfulfilled_requirements = roster.unfulfilled_requirements or {}
+            roster.unfulfilled_requirements['forced_skipped'] = self._format_skipped_forced_assignments()
             
         roster.save()
         
-        return roster
-    
-    def _get_areas_with_deployments(self):
-        """Get all areas with their latest deployments"""
-        areas_with_deployments = []
-        for area in Area.objects.all():
-            deployment = area.deployments.order_by('-created_at').first()
-            if deployment:
-                areas_with_deployments.append((area, deployment))
-        return areas_with_deployments
+        yield self._progress('write')
     
     def _group_areas_by_zone(self, areas_with_deployments):
         """Group areas by zone for balanced processing"""
@@ -629,37 +662,6 @@ class RosterGenerator:
                 zone_requirements[area.zone_id] += deployment.senior_count
         return zone_requirements
     
-    def _sort_areas_for_balanced_shortage(self, areas_with_deployments):
-        """Sort areas to balance shortages across zones"""
-        # Calculate current shortage ratio by zone
-        total_zone_requirements = defaultdict(int)
-        for area, deployment in areas_with_deployments:
-            total = (
-                deployment.si_count + 
-                deployment.asi_count + 
-                deployment.hc_count + 
-                deployment.constable_count
-            )
-            total_zone_requirements[area.zone_id] += total
-        
-        # Calculate shortage ratio
-        zone_shortage_ratio = {}
-        for zone_id, total_required in total_zone_requirements.items():
-            if total_required > 0:
-                shortage = self.zone_shortages.get(zone_id, 0)
-                zone_shortage_ratio[zone_id] = shortage / total_required
-            else:
-                zone_shortage_ratio[zone_id] = 0
-        
-        # Sort areas so that zones with lower shortage ratio are processed first
-        # This helps distribute shortages more evenly
-        result = sorted(
-            areas_with_deployments,
-            key=lambda x: (zone_shortage_ratio.get(x[0].zone_id, 0), x[0].zone_id)
-        )
-        
-        return result
-    
     def _allocate_senior_officers(self, senior_officers_pool, count, area):
         """Allocate senior officers (SI, ASI, HC) to meet senior_count requirements"""
         assignments = []
@@ -675,92 +677,14 @@ class RosterGenerator:
         if self.verbose or count > 0:
             print(f"DEBUG: Allocating {count} senior officers to area {area.name}")
             
-        # Check for forced assignments for this area
-        if self.forced_assignments:
-            # Find officers with belt numbers that should be forced to this area
-            forced_belt_numbers = [belt_no for belt_no, area_id in self.forced_assignments.items() 
-                                 if area_id == area.id]
-            
-            if forced_belt_numbers:
-                if self.verbose:
-                    print(f"DEBUG: Found {len(forced_belt_numbers)} forced assignments for area {area.name}")
-                    print(f"DEBUG: Forced belt numbers: {forced_belt_numbers}")
-                
-                # Find officers with matching belt numbers for senior positions
-                forced_officers = []
-                for belt_no in forced_belt_numbers:
-                    # Search for officers with matching belt number and senior rank
-                    matching_officers = Policeman.objects.filter(
-                        belt_no=belt_no,
-                        preferred_duty='FIELD',
-                        has_fixed_duty=False,
-                        rank__in=['SI', 'ASI', 'HC']  # Only look for senior ranks
-                    ).exclude(
-                        id__in=list(self.assigned_officers)
-                    )
-                    
-                    if matching_officers.exists():
-                        officer = matching_officers.first()
-                        if self.verbose:
-                            print(f"DEBUG: Found forced senior officer {officer.name} (Belt #{officer.belt_no}, Rank: {officer.rank})")
-                        forced_officers.append(officer)
-                    else:
-                        if self.verbose:
-                            print(f"WARNING: Could not find senior officer with belt number {belt_no}")
-                
-                # Process forced assignments
-                for officer in forced_officers:
-                    # Skip if restricted area and female officer
-                    if is_restricted and self._is_female_officer(officer):
-                        if self.verbose:
-                            print(f"WARNING: Cannot force assign female officer {officer.name} to restricted area {area.name}")
-                        continue
-                    
-                    was_previous_zone, was_previous_area = self._check_previous_assignment(officer, area)
-                    
-                    assignments.append({
-                        'officer': officer,
-                        'was_previous_zone': was_previous_zone,
-                        'was_previous_area': was_previous_area
-                    })
-                    
-                    # Update tracking
-                    self.assigned_officers.add(officer.id)
-                    if was_previous_zone:
-                        self.repetition_count += 1
-                    if was_previous_area:
-                        self.same_area_repetition_count += 1
-                    
-                    if self.verbose:
-                        print(f"DEBUG: Force assigned senior officer {officer.name} (Belt #{officer.belt_no}, Rank: {officer.rank}) to area {area.name}")
-                
-                # Adjust count for remaining officers needed
-                count -= len(assignments)
-                if count <= 0:
-                    return assignments
-
         # Filter out officers already assigned to this roster
         available_officers = [o for o in senior_officers_pool if o.id not in self.assigned_officers]
         
-        # Count before gender filtering
+        # Apply assignment rules (e.g. gender restrictions) for this area
         count_before = len(available_officers)
-        
-        # Filter out female officers if this is a restricted area
-        if is_restricted:
-            # Store female officers separately for debugging
-            female_officers = [o for o in available_officers if self._is_female_officer(o)]
-            if female_officers and (self.verbose or count > 0):
-                print(f"RESTRICTED AREA: Filtering out {len(female_officers)} female senior officers from allocation pool for {area.name}")
-                for female in female_officers[:5]:  # Show first 5 for brevity
-                    print(f"  - Excluded female officer: {female.name} (rank: {female.rank}, gender: {female.gender})")
-                if len(female_officers) > 5:
-                    print(f"  - ... and {len(female_officers) - 5} more female officers excluded")
-            
-            available_officers = [o for o in available_officers if not self._is_female_officer(o)]
-            
-            # Print results of filtering
-            if self.verbose or count > 0:
-                print(f"RESTRICTED AREA: For {area.name}, reduced senior officer pool from {count_before} to {len(available_officers)} after filtering out females")
+        available_officers = self.constraints.filter_pool(available_officers, area)
+        if is_restricted and self.verbose:
+            print(f"RESTRICTED AREA: For {area.name}, reduced senior officer pool from {count_before} to {len(available_officers)}")
         
         # Categorize officers by previous assignment status
         no_repetition = []
@@ -807,11 +731,6 @@ class RosterGenerator:
                 officer = available_officers[i]
                 was_previous_zone, was_previous_area = self._check_previous_assignment(officer, area)
             
-            # Double-check we're not assigning a female to restricted area
-            if is_restricted and self._is_female_officer(officer):
-                print(f"ERROR PREVENTION: Attempted to assign female officer {officer.name} (rank: {rank}) to restricted area {area.name}. Skipping.")
-                continue
-                
             assignments.append({
                 'officer': officer,
                 'was_previous_zone': was_previous_zone,
@@ -832,157 +751,16 @@ class RosterGenerator:
         return assignments
     
     def _add_unfulfilled_requirement(self, area, requirement_type, count):
-        """Add an unfulfilled requirement to the tracking list"""
-        # Check if this area already has unfulfilled requirements
-        area_found = False
-        for item in self.incomplete_assignments:
-            if item['area'].id == area.id:
-                item['unfulfilled'][requirement_type] = count
-                area_found = True
-                break
-        
-        # If area not found, add a new entry
-        if not area_found:
-            self.incomplete_assignments.append({
-                'area': area,
-                'unfulfilled': {requirement_type: count}
-            })
-    
-    def _get_available_officers(self):
-        """Get all available field officers and Home Guards"""
-        return list(Policeman.objects.filter(
-            Q(preferred_duty='FIELD', has_fixed_duty=False)
-            # Only include Home Guards who are field officers (not static)
-            # We no longer include ALL Home Guards regardless of settings
-        ))
+        """Add an unfulfilled requirement to the tracking index"""
+        self.incomplete_assignments.set(area, requirement_type, count)
     
-    def _group_officers_by_rank(self, officers):
-        """Group officers by rank"""
-        officers_by_rank = defaultdict(list)
-        for officer in officers:
-            # Since we're only getting field officers in _get_available_officers,
-            # we don't need special handling for Home Guards here
-            officers_by_rank[officer.rank].append(officer)
-        return officers_by_rank
-    
-    def _process_area_assignment(self, area, deployment, officers_by_rank, drivers, roster):
-        """Process assignments for a single area"""
+    def _process_area_assignment(self, area, deployment, officers_by_rank, roster):
+        """Process rank assignments for a single area (drivers are placed by _match_drivers)"""
         area_assignments = []
         unfulfilled_requirements = {}
         created_assignments = []  # Track created assignments to return
         
-        # Check if this is a restricted area
-        is_restricted = self._is_restricted_area(area)
-        if is_restricted:
-            print(f"RESTRICTED AREA CHECK: {area.name} with call_sign '{area.call_sign}' - NO female officers allowed")
-        
-        # FIRST: Handle forced assignments for this area
-        if self.forced_assignments:
-            forced_belt_numbers = [belt_no for belt_no, area_id in self.forced_assignments.items() 
-                                 if area_id == area.id]
-            
-            if forced_belt_numbers:
-                if self.verbose:
-                    print(f"DEBUG: Processing forced assignments for area {area.name}")
-                    print(f"DEBUG: Forced belt numbers: {forced_belt_numbers}")
-                
-                # Process each forced assignment
-                for belt_no in forced_belt_numbers:
-                    # Find the officer with this belt number
-                    forced_officer = Policeman.objects.filter(
-                        belt_no=belt_no,
-                        preferred_duty='FIELD',
-                        has_fixed_duty=False
-                    ).first()  # Remove the exclude to ensure we find the forced officer even if already assigned
-                    
-                    if forced_officer:
-                        # Skip if restricted area and female officer
-                        if is_restricted and self._is_female_officer(forced_officer):
-                            if self.verbose:
-                                print(f"WARNING: Cannot force assign female officer {forced_officer.name} to restricted area {area.name}")
-                            continue
-                        
-                        # If the officer is already assigned somewhere else, remove that assignment
-                        if forced_officer.id in self.assigned_officers:
-                            if self.verbose:
-                                print(f"DEBUG: Removing previous assignment for forced officer {forced_officer.name}")
-                            # Remove from assigned officers set
-                            self.assigned_officers.remove(forced_officer.id)
-                            # Remove any existing assignments for this officer in this roster
-                            RosterAssignment.objects.filter(
-                                roster=roster,
-                                policeman=forced_officer
-                            ).delete()
-                            # Remove from any existing assignments in our list
-                            area_assignments = [a for a in area_assignments if a['officer'].id != forced_officer.id]
-                        
-                        was_previous_zone, was_previous_area = self._check_previous_assignment(forced_officer, area)
-                        
-                        # Create the assignment
-                        assignment = {
-                            'officer': forced_officer,
-                            'was_previous_zone': was_previous_zone,
-                            'was_previous_area': was_previous_area
-                        }
-                        
-                        # Add to assignments
-                        area_assignments.append(assignment)
-                        
-                        # Update tracking
-                        self.assigned_officers.add(forced_officer.id)
-                        if was_previous_zone:
-                            self.repetition_count += 1
-                        if was_previous_area:
-                            self.same_area_repetition_count += 1
-                        
-                        if self.verbose:
-                            print(f"DEBUG: Force assigned officer {forced_officer.name} (Belt #{forced_officer.belt_no}, Rank: {forced_officer.rank}) to area {area.name}")
-                        
-                        # Adjust deployment requirements based on the forced assignment
-                        if forced_officer.rank == 'SI':
-                            deployment.si_count = max(0, deployment.si_count - 1)
-                        elif forced_officer.rank == 'ASI':
-                            deployment.asi_count = max(0, deployment.asi_count - 1)
-                        elif forced_officer.rank == 'HC':
-                            deployment.hc_count = max(0, deployment.hc_count - 1)
-                        elif forced_officer.rank == 'CONST':
-                            deployment.constable_count = max(0, deployment.constable_count - 1)
-                        elif forced_officer.rank == 'HG':
-                            deployment.hgv_count = max(0, deployment.hgv_count - 1)
-                        elif forced_officer.is_driver:
-                            deployment.driver_count = max(0, deployment.driver_count - 1)
-                        
-                        # Adjust senior count if applicable
-                        if forced_officer.rank in ['SI', 'ASI', 'HC']:
-                            deployment.senior_count = max(0, deployment.senior_count - 1)
-                        
-                        # Remove the forced officer from their rank pool to prevent double assignment
-                        if forced_officer.rank in officers_by_rank:
-                            officers_by_rank[forced_officer.rank] = [
-                                o for o in officers_by_rank[forced_officer.rank] 
-                                if o.id != forced_officer.id
-                            ]
-        
-        # SECOND: Allocate drivers - prioritize driver allocation before anything else
-        driver_assignments = self._allocate_drivers(drivers, deployment.driver_count, area)
-        
-        # Verify no female drivers were assigned to restricted areas
-        if is_restricted:
-            driver_assignments = [a for a in driver_assignments if not self._is_female_officer(a['officer'])]
-        
-        area_assignments.extend(driver_assignments)
-        driver_count_assigned = len(driver_assignments)
-        
-        # Update assigned officers with the drivers we just assigned
-        for assignment in driver_assignments:
-            self.assigned_officers.add(assignment['officer'].id)
-        
-        if driver_count_assigned < deployment.driver_count:
-            unfulfilled_requirements['DRIVER'] = deployment.driver_count - driver_count_assigned
-            # Track shortage by zone for balanced distribution
-            self.zone_shortages[area.zone_id] += (deployment.driver_count - driver_count_assigned)
-        
-        # NEXT: Allocate officers by rank
+        # Allocate officers by rank
         ranks_to_allocate = {
             'SI': deployment.si_count,
             'ASI': deployment.asi_count,
@@ -997,10 +775,6 @@ class RosterGenerator:
                 available_officers = [o for o in officers_by_rank.get(rank, []) if o.id not in self.assigned_officers]
                 assignments = self._allocate_officers(rank, available_officers, count, area)
                 
-                # Verify no female officers were assigned to restricted areas
-                if is_restricted:
-                    assignments = [a for a in assignments if not self._is_female_officer(a['officer'])]
-                
                 area_assignments.extend(assignments)
                 
                 if len(assignments) < count:
@@ -1010,28 +784,10 @@ class RosterGenerator:
         
         # Track areas with unfulfilled requirements
         if unfulfilled_requirements:
-            # Check if this area already has unfulfilled requirements
-            area_found = False
-            for item in self.incomplete_assignments:
-                if item['area'].id == area.id:
-                    item['unfulfilled'].update(unfulfilled_requirements)
-                    area_found = True
-                    break
-            
-            # If area not found, add a new entry
-            if not area_found:
-                self.incomplete_assignments.append({
-                    'area': area,
-                    'unfulfilled': unfulfilled_requirements
-                })
+            self.incomplete_assignments.update(area, unfulfilled_requirements)
         
         # Create roster assignments
         for assignment in area_assignments:
-            # Final safety check for restricted areas
-            if is_restricted and self._is_female_officer(assignment['officer']):
-                print(f"SECURITY CHECK: Prevented female officer {assignment['officer'].name} from being assigned to restricted area {area.name}")
-                continue
-            
             # Remove any existing assignment for this officer in this roster
             RosterAssignment.objects.filter(
                 roster=roster,
@@ -1047,111 +803,134 @@ class RosterGenerator:
             )
             created_assignments.append(roster_assignment)
         
-        # Final verification for this area
-        if is_restricted:
-            roster_assignments = RosterAssignment.objects.filter(roster=roster, area=area)
-            for assignment in roster_assignments:
-                if self._is_female_officer(assignment.policeman):
-                    print(f"FINAL VERIFICATION ERROR: Female officer {assignment.policeman.name} was assigned to restricted area {area.name}!")
-                    # Remove the incorrect assignment
-                    assignment.delete()
-                    print(f"CORRECTION: Removed invalid assignment of {assignment.policeman.name} from restricted area {area.name}")
-                    
-                    # Also remove from our return list
-                    created_assignments = [a for a in created_assignments if a.id != assignment.id]
-                    
         return created_assignments
     
-    def _allocate_drivers(self, drivers, count, area):
-        """Allocate drivers to an area"""
-        driver_assignments = []
+    def _match_drivers(self, areas_with_deployments, drivers, roster):
+        """Place drivers with a single bipartite matching over driver slots and rank slots.
+        
+        Each area offers driver_count driver slots and, for every driver rank, the number of
+        slots of that rank still required. Edges exist where the assignment rules allow the
+        driver in the area, and each driver tries its cheapest areas first (no repetition,
+        then same zone, then same area; restricted areas before open ones). Driver slots are matched first with augmenting
+        paths, which fills the maximum possible number of them; drivers left over are then
+        matched to slots of their own rank. Rank slots taken here are deducted from the
+        deployment so the rank pass only fills what remains.
+        
+        Returns a list of (RosterAssignment, slot) pairs where slot is 'DRIVER' or a rank.
+        """
+        available_drivers = [d for d in drivers if d.id not in self.assigned_officers]
+        deployments_by_area = {area.id: (area, deployment) for area, deployment in areas_with_deployments}
+        
+        # Candidate areas for each driver, cheapest repetition cost first
+        candidates = {}
+        for driver in available_drivers:
+            options = []
+            for area, deployment in areas_with_deployments:
+                if self.constraints.allows(driver, area):
+                    was_previous_zone, was_previous_area = self._check_previous_assignment(driver, area)
+                    # Restricted areas first: fewer officers can serve there
+                    options.append((was_previous_zone + was_previous_area,
+                                    not self.constraints.is_restricted(area), area.id))
+            options.sort(key=lambda option: option[:2])
+            candidates[driver.id] = [area_id for cost, unrestricted, area_id in options]
+        
+        def capacity(slot, area_id):
+            deployment = deployments_by_area[area_id][1]
+            if slot == 'DRIVER':
+                return deployment.driver_count
+            return getattr(deployment, self.RANK_COUNT_FIELDS[slot])
+        
+        def augment(driver_id, slot, matched):
+            # Kuhn's augmenting path search over area-level slot capacities, as a depth-first
+            # search with an explicit stack so long paths cannot exhaust the recursion limit.
+            # Each frame is [driver, its remaining candidate areas, area whose holders are
+            # being re-placed, index of the next holder to try].
+            visited = set()
+            stack = [[driver_id, iter(candidates[driver_id]), None, 0]]
+            while stack:
+                frame = stack[-1]
+                driver, areas, area_id, index = frame
+                if area_id is not None and index < len(matched[area_id]):
+                    # Try to move the next holder of the area elsewhere
+                    frame[3] = index + 1
+                    holder_id = matched[area_id][index]
+                    stack.append([holder_id, iter(candidates[holder_id]), None, 0])
+                    continue
+                area_id = next((area_id for area_id in areas if area_id not in visited), None)
+                if area_id is None:
+                    stack.pop()  # No path through this driver
+                    continue
+                visited.add(area_id)
+                holders = matched[area_id]
+                if len(holders) < capacity(slot, area_id):
+                    holders.append(driver)
+                    # Each driver down the path takes the slot of the holder it moved
+                    stack.pop()
+                    for driver, areas, area_id, index in reversed(stack):
+                        matched[area_id][index - 1] = driver
+                    return True
+                frame[2], frame[3] = area_id, 0
+            return False
+        
+        # Most constrained drivers first so they are not crowded out
+        drivers_by_id = {d.id: d for d in available_drivers}
+        order = sorted(available_drivers, key=lambda d: len(candidates[d.id]))
+        
+        driver_matches = defaultdict(list)
+        for driver in order:
+            augment(driver.id, 'DRIVER', driver_matches)
+        
+        placements = [('DRIVER', area_id, driver_id)
+                      for area_id, holders in driver_matches.items() for driver_id in holders]
+        matched_ids = {driver_id for slot, area_id, driver_id in placements}
+        
+        # Leftover drivers take slots of their own rank
+        rank_matches = defaultdict(lambda: defaultdict(list))
+        for driver in order:
+            if driver.id not in matched_ids and driver.rank in self.RANK_COUNT_FIELDS:
+                augment(driver.id, driver.rank, rank_matches[driver.rank])
+        for rank, matches in rank_matches.items():
+            placements.extend((rank, area_id, driver_id)
+                              for area_id, holders in matches.items() for driver_id in holders)
+        
+        # Record the assignments and deduct the slots they fill
+        results = []
+        for slot, area_id, driver_id in placements:
+            area, deployment = deployments_by_area[area_id]
+            driver = drivers_by_id[driver_id]
+            was_previous_zone, was_previous_area = self._check_previous_assignment(driver, area)
+            results.append((RosterAssignment(
+                roster=roster,
+                area=area,
+                policeman=driver,
+                was_previous_zone=was_previous_zone,
+                was_previous_area=was_previous_area
+            ), slot))
+            
+            # Update tracking
+            self.assigned_officers.add(driver.id)
+            if was_previous_zone:
+                self.repetition_count += 1
+            if was_previous_area:
+                self.same_area_repetition_count += 1
+            if slot != 'DRIVER':
+                count_field = self.RANK_COUNT_FIELDS[slot]
+                setattr(deployment, count_field, getattr(deployment, count_field) - 1)
         
-        # Check if area has restricted call sign for female employees
-        is_restricted = self._is_restricted_area(area)
+        # Track driver slots that could not be filled
+        for area, deployment in areas_with_deployments:
+            missing = deployment.driver_count - len(driver_matches.get(area.id, []))
+            if missing > 0:
+                self._add_unfulfilled_requirement(area, 'DRIVER', missing)
+                self.zone_shortages[area.zone_id] += missing
         
-        if count > 0:
-            if self.verbose:
-                print(f"DEBUG: Allocating {count} drivers to area {area.name} (restricted: {is_restricted})")
-                print(f"DEBUG: Total driver pool: {len(drivers)}")
-                
-            # Only filter out officers that are already assigned, don't modify the original list
-            available_drivers = [d for d in drivers if d.id not in self.assigned_officers]
-            
-            if self.verbose:
-                print(f"DEBUG: Area {area.name} requires {count} drivers. {len(available_drivers)} drivers available.")
-                
-            # Count before gender filtering
-            count_before = len(available_drivers)
-            
-            # Filter out female drivers if this is a restricted area
-            if is_restricted:
-                # Store female officers separately for debugging
-                female_drivers = [d for d in available_drivers if self._is_female_officer(d)]
-                if female_drivers and (self.verbose or count > 0):
-                    print(f"RESTRICTED AREA: Filtering out {len(female_drivers)} female drivers from allocation pool for {area.name}")
-                    for female in female_drivers[:5]:  # Show first 5 for brevity
-                        print(f"  - Excluded female driver: {female.name} (gender: {female.gender})")
-                    if len(female_drivers) > 5:
-                        print(f"  - ... and {len(female_drivers) - 5} more female drivers excluded")
-                
-                available_drivers = [d for d in available_drivers if not self._is_female_officer(d)]
-                
-                # Print results of filtering
-                if self.verbose or count > 0:
-                    print(f"RESTRICTED AREA: For {area.name}, reduced driver pool from {count_before} to {len(available_drivers)} after filtering out females")
-            
-            # Sort drivers for assignment (prefer those with no previous zone/area assignment)
-            prioritized_drivers = []
-            for driver in available_drivers:
-                was_previous_zone, was_previous_area = self._check_previous_assignment(driver, area)
-                prioritized_drivers.append((driver, was_previous_zone, was_previous_area))
-                
-            # Sort prioritized drivers: prefer no repetition, then zone repetition, then area repetition
-            # This matches the allocation strategy for other ranks
-            prioritized_drivers.sort(key=lambda x: (1 if x[1] else 0, 1 if x[2] else 0))
-            
-            # Assign drivers according to priority and count needed
-            to_assign = min(count, len(prioritized_drivers))
-            
-            # If we're still short on drivers but have some available, relax the repetition constraints
-            if to_assign < count and self.verbose:
-                print(f"PRIORITY OVERRIDE: Area {area.name} has critical driver shortage. Will attempt to assign with repetition.")
-                # Use all available drivers, even if it means repetition
-                if available_drivers:
-                    to_assign = min(count, len(available_drivers))
-            
-            if self.verbose:
-                print(f"DEBUG: Attempting to assign {to_assign} of {count} requested drivers to {area.name}")
-                
-            for i in range(to_assign):
-                if i < len(prioritized_drivers):
-                    driver, was_previous_zone, was_previous_area = prioritized_drivers[i]
-                    
-                    # Double-check we're not assigning a female to restricted area
-                    if is_restricted and self._is_female_officer(driver):
-                        print(f"ERROR PREVENTION: Attempted to assign female driver {driver.name} to restricted area {area.name}. Skipping.")
-                        continue
-                    
-                    driver_assignments.append({
-                        'officer': driver,
-                        'was_previous_zone': was_previous_zone,
-                        'was_previous_area': was_previous_area
-                    })
-                    
-                    # Update repetition counters
-                    if was_previous_zone:
-                        self.repetition_count += 1
-                    if was_previous_area:
-                        self.same_area_repetition_count += 1
-                    
-                    # Mark this officer as assigned
-                    self.assigned_officers.add(driver.id)
-                    
-            if len(driver_assignments) < count:
-                if self.verbose:
-                    print(f"WARNING: Could only fulfill {len(driver_assignments)} of {count} driver requirements for area {area.name}")
+        RosterAssignment.objects.bulk_create([assignment for assignment, slot in results])
+        
+        if self.verbose:
+            print(f"DEBUG: Matched {len(matched_ids)} drivers to driver slots "
+                  f"and {len(results) - len(matched_ids)} to rank slots")
         
-        return driver_assignments
+        return results
     
     def _check_previous_assignment(self, officer, area):
         """Check if an officer was previously assigned to this zone or area"""
@@ -1206,6 +985,20 @@ class RosterGenerator:
             "totals": total_details
         }
     
+    def _format_skipped_forced_assignments(self):
+        """Format skipped forced assignments for storage"""
+        return [
+            {
+                "officer_id": item['officer'].id,
+                "officer_name": item['officer'].name,
+                "belt_no": item['officer'].belt_no,
+                "area_id": item['area'].id,
+                "area_name": item['area'].name,
+                "reason": item['reason']
+            }
+            for item in self.skipped_forced_assignments
+        ]
+    
     def _get_rank_display(self, rank):
         """Convert rank code to display name"""
         rank_display_map = {
@@ -1220,26 +1013,10 @@ class RosterGenerator:
         return rank_display_map.get(rank, rank)
 
     def _is_restricted_area(self, area):
-        """Check if an area is restricted for female officers"""
-        call_sign = area.call_sign.strip() if area.call_sign else ""
-        
-        # Check exact match first
-        is_restricted = call_sign in self.RESTRICTED_AREAS
-        
-        # If not restricted by exact match, check if any restricted call sign prefix matches
-        if not is_restricted:
-            for restricted in self.RESTRICTED_AREAS:
-                if call_sign.startswith(restricted.split(' ')[0]):  # Check first part (e.g., "Rhino" in "Rhino-01")
-                    is_restricted = True
-                    print(f"DEBUG: Area {area.name} with call sign '{call_sign}' is restricted due to prefix match with '{restricted}'")
-                    break
-        
-        # Always print debug info for restricted areas
-        if is_restricted:
-            print(f"DEBUG: Area {area.name} with call sign '{call_sign}' IS RESTRICTED for female officers")
-        elif self.verbose:
-            print(f"DEBUG: Area {area.name} with call sign '{call_sign}' is not restricted")
-            
+        """Check if any assignment rule restricts who may serve in an area"""
+        is_restricted = self.constraints.is_restricted(area)
+        if self.verbose:
+            print(f"DEBUG: Area {area.name} with call sign '{area.call_sign}' restricted={is_restricted}")
         return is_restricted
     
     def _is_female_officer(self, officer):
@@ -1251,8 +1028,6 @@ class RosterGenerator:
         if not is_female and officer.name:
             is_female = 'L/C' in officer.name or 'L/Const' in officer.name or 'Lady Const' in officer.name
         
-        if self.verbose or is_female:
-            print(f"DEBUG: Officer {officer.name} has gender '{officer.gender}', is_female={is_female}")
         return is_female
 
     def _format_reserved_officers(self):
@@ -1311,103 +1086,14 @@ class RosterGenerator:
             print(f"DEBUG: Allocating {count} officers of rank {rank} to area {area.name} (restricted: {is_restricted})")
             print(f"DEBUG: Initial pool size for rank {rank}: {len(officers_pool)}")
             
-        # Check for forced assignments for this area
-        if self.forced_assignments:
-            # Find officers with belt numbers that should be forced to this area
-            forced_belt_numbers = [belt_no for belt_no, area_id in self.forced_assignments.items() 
-                                 if area_id == area.id]
-            
-            if forced_belt_numbers:
-                if self.verbose:
-                    print(f"DEBUG: Found {len(forced_belt_numbers)} forced assignments for area {area.name}")
-                    print(f"DEBUG: Forced belt numbers: {forced_belt_numbers}")
-                
-                # Find officers with matching belt numbers for this specific rank
-                forced_officers = []
-                for belt_no in forced_belt_numbers:
-                    # Search for officers with matching belt number
-                    matching_officers = Policeman.objects.filter(
-                        belt_no=belt_no,
-                        preferred_duty='FIELD',
-                        has_fixed_duty=False
-                    ).exclude(
-                        id__in=list(self.assigned_officers)
-                    )
-                    
-                    # Special handling for senior ranks
-                    if rank == 'SENIOR':
-                        # For senior positions, accept SI, ASI, or HC
-                        matching_officers = matching_officers.filter(rank__in=['SI', 'ASI', 'HC'])
-                        if self.verbose:
-                            print(f"DEBUG: Looking for senior officer with belt #{belt_no}")
-                    else:
-                        # For other positions, match exact rank
-                        matching_officers = matching_officers.filter(rank=rank)
-                        if self.verbose:
-                            print(f"DEBUG: Looking for {rank} officer with belt #{belt_no}")
-                    
-                    if matching_officers.exists():
-                        officer = matching_officers.first()
-                        if self.verbose:
-                            print(f"DEBUG: Found forced officer {officer.name} (Belt #{officer.belt_no}, Rank: {officer.rank}) for rank {rank}")
-                        forced_officers.append(officer)
-                    else:
-                        if self.verbose:
-                            print(f"WARNING: Could not find officer with belt number {belt_no} for rank {rank}")
-                
-                # Process forced assignments
-                for officer in forced_officers:
-                    # Skip if restricted area and female officer
-                    if is_restricted and self._is_female_officer(officer):
-                        if self.verbose:
-                            print(f"WARNING: Cannot force assign female officer {officer.name} to restricted area {area.name}")
-                        continue
-                    
-                    was_previous_zone, was_previous_area = self._check_previous_assignment(officer, area)
-                    
-                    assignments.append({
-                        'officer': officer,
-                        'was_previous_zone': was_previous_zone,
-                        'was_previous_area': was_previous_area
-                    })
-                    
-                    # Update tracking
-                    self.assigned_officers.add(officer.id)
-                    if was_previous_zone:
-                        self.repetition_count += 1
-                    if was_previous_area:
-                        self.same_area_repetition_count += 1
-                    
-                    if self.verbose:
-                        print(f"DEBUG: Force assigned officer {officer.name} (Belt #{officer.belt_no}, Rank: {officer.rank}) to area {area.name}")
-                
-                # Adjust count for remaining officers needed
-                count -= len(assignments)
-                if count <= 0:
-                    return assignments
-
         # Filter out officers already assigned to this roster
         available_officers = [o for o in officers_pool if o.id not in self.assigned_officers]
         
-        # Count before gender filtering
+        # Apply assignment rules (e.g. gender restrictions) for this area
         count_before = len(available_officers)
-        
-        # Filter out female officers if this is a restricted area
-        if is_restricted:
-            # Store female officers separately for debugging
-            female_officers = [o for o in available_officers if self._is_female_officer(o)]
-            if female_officers and (self.verbose or count > 0):
-                print(f"RESTRICTED AREA: Filtering out {len(female_officers)} female officers of rank {rank} from allocation pool for {area.name}")
-                for female in female_officers[:5]:  # Show first 5 for brevity
-                    print(f"  - Excluded female officer: {female.name} (rank: {female.rank}, gender: {female.gender})")
-                if len(female_officers) > 5:
-                    print(f"  - ... and {len(female_officers) - 5} more female officers excluded")
-            
-            available_officers = [o for o in available_officers if not self._is_female_officer(o)]
-            
-            # Print results of filtering
-            if self.verbose or count > 0:
-                print(f"RESTRICTED AREA: For {area.name}, reduced {rank} officer pool from {count_before} to {len(available_officers)} after filtering out females")
+        available_officers = self.constraints.filter_pool(available_officers, area)
+        if is_restricted and self.verbose:
+            print(f"RESTRICTED AREA: For {area.name}, reduced {rank} officer pool from {count_before} to {len(available_officers)}")
         
         # Categorize officers by previous assignment status
         no_repetition = []
@@ -1454,11 +1140,6 @@ class RosterGenerator:
                 officer = available_officers[i]
                 was_previous_zone, was_previous_area = self._check_previous_assignment(officer, area)
             
-            # Double-check we're not assigning a female to restricted area
-            if is_restricted and self._is_female_officer(officer):
-                print(f"ERROR PREVENTION: Attempted to assign female officer {officer.name} (rank: {rank}) to restricted area {area.name}. Skipping.")
-                continue
-                
             assignments.append({
                 'officer': officer,
                 'was_previous_zone': was_previous_zone,
@@ -1498,13 +1179,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Display detailed information about the generation process'
         )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Seed for the shuffles, to reproduce a roster from the same inputs'
+        )
 
     def handle(self, *args, **options):
         try:
             self.stdout.write(self.style.SUCCESS('Starting roster generation...'))
             
             # Create the generator with verbose flag
-            generator = RosterGenerator(verbose=options.get('verbose', False))
+            generator = RosterGenerator(verbose=options.get('verbose', False), seed=options.get('seed'))
             
             # Generate the roster
             roster = generator.generate_roster(
@@ -1525,6 +1211,13 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.SUCCESS('\nAll area requirements were fulfilled'))
             
+            # Display forced assignments that could not be applied
+            for item in generator.skipped_forced_assignments:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped forced assignment of {item['officer'].name} (Belt #{item['officer'].belt_no}) "
+                    f"to {item['area'].name}: {item['reason']}"
+                ))
+            
             # Display reserved officers
             if generator.reserved_officers:
                 self._display_reserved_officers(generator, verbose=options.get('verbose', False))
@@ -1564,13 +1257,8 @@ class Command(BaseCommand):
             self.stdout.write(f"  {area.name} ({area.zone.name}) - Missing: {', '.join(req_details)}")
         
         # Count total missing personnel
-        total_missing = defaultdict(int)
-        for item in generator.incomplete_assignments:
-            for rank, count in item['unfulfilled'].items():
-                total_missing[rank] += count
-        
         missing_details = []
-        for rank, count in total_missing.items():
+        for rank, count in generator.incomplete_assignments.totals().items():
             rank_display = generator._get_rank_display(rank)
             missing_details.append(f"{rank_display}: {count}")
         
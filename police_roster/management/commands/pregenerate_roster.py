@@ -0,0 +1,99 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from police_roster.caching import shared_cache
+from police_roster.pregeneration import pregenerate, next_run_time, parse_time, load_state
+
+class Command(BaseCommand):
+    help = 'Pre-generates the next pending roster every day at an off-peak time, or once with --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--at',
+            type=str,
+            default=settings.ROSTER_PREGENERATE_AT,
+            help='Local time of the daily run, as HH:MM (default: ROSTER_PREGENERATE_AT)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Pre-generate now and exit instead of waiting for the daily run'
+        )
+        parser.add_argument(
+            '--days-ahead',
+            type=int,
+            default=1,
+            help='Generate the roster for this many days after the run date'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Seed for the shuffles, to reproduce a roster from the same inputs'
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='Show the recent pre-generation runs and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.show_status()
+            return
+
+        try:
+            at = parse_time(options['at'])
+        except ValueError:
+            raise CommandError(f'Invalid time "{options["at"]}", expected HH:MM')
+
+        # With a per-process cache the warmed responses and data versions never reach the web workers
+        if not shared_cache():
+            raise CommandError('Pre-generation needs the cache shared with the web workers; set ROSTER_CACHE_DIR')
+
+        if options['once']:
+            self.run(options)
+            return
+
+        while True:
+            run_at = next_run_time(at)
+            self.stdout.write(f'Next pre-generation at {run_at:%Y-%m-%d %H:%M %Z}')
+            # Sleep in short steps so clock changes and interrupts are picked up
+            while (remaining := (run_at - timezone.now()).total_seconds()) > 0:
+                time.sleep(min(remaining, 60))
+            try:
+                self.run(options)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Pre-generation failed: {e}'))
+            finally:
+                close_old_connections()
+
+    def run(self, options):
+        date = timezone.localdate() + datetime.timedelta(days=options['days_ahead'])
+        result = pregenerate(date, seed=options.get('seed'))
+        status = result['status']
+        if status == 'generated':
+            replaced = f', replacing stale roster #{result["replaced"]}' if result['replaced'] else ''
+            warmed = f', caches warmed in {result["warm_seconds"]:.2f}s'
+            self.stdout.write(self.style.SUCCESS(
+                f'Pre-generated roster #{result["roster"]} for {result["date"]} in '
+                f'{result["generation_seconds"]:.2f}s ({result["assignments"]} assignments{replaced}{warmed})'
+            ))
+        elif status == 'locked':
+            self.stdout.write(self.style.WARNING('Another pre-generation is running, skipped'))
+        else:
+            self.stdout.write(f'Roster #{result["roster"]} for {result["date"]} is {status}, skipped')
+
+    def show_status(self):
+        runs = load_state()['runs']
+        if not runs:
+            self.stdout.write('No pre-generation runs recorded')
+            return
+        for run in runs:
+            self.stdout.write(
+                f'{run["finished_at"]}  {run["date"]}  roster #{run["roster"]}  '
+                f'{run["generation_seconds"]:.2f}s  {run["assignments"]} assignments'
+            )
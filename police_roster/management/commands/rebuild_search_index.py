@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand, CommandError
+from police_roster.models import Policeman
+from police_roster.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the officer search index from the Policeman table'
+
+    def handle(self, *args, **options):
+        if not rebuild_index():
+            raise CommandError('This database does not support the FTS5 search index')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {Policeman.objects.count()} officers'))
@@ -0,0 +1,190 @@
+# metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds (seconds) of the request latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RouteStats:
+    """Totals for one (view, method) pair"""
+    __slots__ = ('statuses', 'buckets', 'duration', 'queries', 'sql_duration', 'response_bytes')
+
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    """In-process counters, updated in O(1) per request and only formatted when scraped.
+
+    Each worker process keeps its own registry, like any Prometheus client without a
+    multiprocess collector; scrape every worker or run a single one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.routes = defaultdict(RouteStats)
+            self.generation = defaultdict(float)
+            self.unfulfilled = defaultdict(int)
+
+    def record_request(self, view, method, status, duration, queries, sql_duration, response_bytes):
+        with self.lock:
+            stats = self.routes[(view, method)]
+            stats.statuses[status] += 1
+            stats.buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+            stats.duration += duration
+            stats.queries += queries
+            stats.sql_duration += sql_duration
+            stats.response_bytes += response_bytes
+
+    def record_generation(self, generator, duration):
+        """Record a finished RosterGenerator run"""
+        with self.lock:
+            self.generation['runs'] += 1
+            self.generation['duration'] += duration
+            self.generation['last_duration'] = duration
+            self.generation['assignments'] += len(generator.assigned_officers)
+            self.generation['zone_repetitions'] += generator.repetition_count
+            self.generation['area_repetitions'] += generator.same_area_repetition_count
+            self.generation['reserved'] += len(generator.reserved_officers)
+            for item in generator.incomplete_assignments:
+                for rank, count in item['unfulfilled'].items():
+                    self.unfulfilled[rank] += count
+
+    def record_generation_failure(self):
+        with self.lock:
+            self.generation['failures'] += 1
+
+    def render(self):
+        """Format every metric in the Prometheus text exposition format"""
+        with self.lock:
+            routes = {key: (dict(stats.statuses), list(stats.buckets), stats.duration, stats.queries,
+                            stats.sql_duration, stats.response_bytes)
+                      for key, stats in self.routes.items()}
+            generation = dict(self.generation)
+            unfulfilled = dict(self.unfulfilled)
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                sample = f'{name}{suffix}{{{label_text}}}' if label_text else f'{name}{suffix}'
+                lines.append(f'{sample} {_number(value)}')
+
+        def route_labels(view, method):
+            return {'view': view, 'method': method}
+
+        metric('roster_http_requests_total', 'counter', 'HTTP requests by view, method and status', [
+            ('', dict(route_labels(*key), status=str(code)), count)
+            for key, (statuses, *_) in sorted(routes.items()) for code, count in sorted(statuses.items())
+        ])
+
+        histogram = []
+        for key, (statuses, buckets, duration, *_) in sorted(routes.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                histogram.append(('_bucket', dict(route_labels(*key), le=le), cumulative))
+            histogram.append(('_sum', route_labels(*key), duration))
+            histogram.append(('_count', route_labels(*key), cumulative))
+        metric('roster_http_request_duration_seconds', 'histogram', 'HTTP request latency', histogram)
+
+        metric('roster_http_sql_queries_total', 'counter', 'SQL queries run while serving requests', [
+            ('', route_labels(*key), values[3]) for key, values in sorted(routes.items())
+        ])
+        metric('roster_http_sql_duration_seconds_total', 'counter', 'Time spent in SQL while serving requests', [
+            ('', route_labels(*key), values[4]) for key, values in sorted(routes.items())
+        ])
+        metric('roster_http_response_bytes_total', 'counter', 'Response body bytes (streamed bodies are not counted)', [
+            ('', route_labels(*key), values[5]) for key, values in sorted(routes.items())
+        ])
+
+        metric('roster_generations_total', 'counter', 'Completed roster generations',
+               [('', {}, generation.get('runs', 0))])
+        metric('roster_generation_failures_total', 'counter', 'Roster generations that raised an error',
+               [('', {}, generation.get('failures', 0))])
+        metric('roster_generation_duration_seconds_total', 'counter', 'Time spent generating rosters',
+               [('', {}, generation.get('duration', 0))])
+        metric('roster_generation_last_duration_seconds', 'gauge', 'Duration of the latest roster generation',
+               [('', {}, generation.get('last_duration', 0))])
+        metric('roster_generation_assignments_total', 'counter', 'Officers assigned by roster generations',
+               [('', {}, generation.get('assignments', 0))])
+        metric('roster_generation_repetitions_total', 'counter', 'Officers assigned to their previous zone or area', [
+            ('', {'scope': 'zone'}, generation.get('zone_repetitions', 0)),
+            ('', {'scope': 'area'}, generation.get('area_repetitions', 0)),
+        ])
+        metric('roster_generation_reserved_officers_total', 'counter', 'Field officers left unassigned',
+               [('', {}, generation.get('reserved', 0))])
+        metric('roster_generation_unfulfilled_slots_total', 'counter', 'Deployment slots left open, by rank',
+               [('', {'rank': rank}, count) for rank, count in sorted(unfulfilled.items())])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Record latency, SQL query count and time, and response size per resolved view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = [0, 0.0]
+
+        def time_query(execute, sql_text, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql[0] += 1
+                sql[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(time_query):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        size = 0 if response.streaming else len(response.content)
+        registry.record_request(view, request.method, response.status_code, duration, sql[0], sql[1], size)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, served only to METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')):
+        return HttpResponseForbidden('Metrics are only served locally')
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,78 @@
+# Generated by Django 5.2 on 2026-10-18 22:49
+
+from django.db import migrations, models
+
+
+RESTRICTED_CALL_SIGNS = [
+    'Zebra-101', 'Zebra-102', 'Zebra-103', 'Zebra-104', 'Zebra-105', 'Zebra-106',
+    'Zebra-107', 'Zebra-108', 'Zebra-109', 'Zebra-111', 'Zebra-112', 'Zebra-201',
+    'Zebra-202', 'Zebra-203', 'Zebra-204', 'Zebra-205', 'Zebra-207', 'Zebra-208',
+    'Zebra-210', 'Zebra-211', 'Zebra-212', 'Zebra-213', 'Zebra-301', 'Zebra-303',
+    'Zebra-304', 'Zebra-306', 'Zebra-308', 'Zebra-309', 'Zeb-310', 'Zeb-311',
+    'Zebra-401', 'Zebra-403', 'Zebra-404', 'Zebra-406', 'Zebra-407', 'Zebra-408',
+    'Zebra-409', 'Zebra-410', 'Zullu-01', 'Zullu-02', 'Eagle-05 M/C', 'Eagle-01',
+    'Eagle-02', 'Eagle-03', 'Eagle-04', 'Eagle-05', 'Eagle-06', 'Eagle-07', 'Eagle-08',
+    'Eagle-09', 'Eagle-10', 'Eagle-11', 'Eagle-12', 'Towing-01', 'Towing-02',
+    'Towing-03', 'Towing-04', 'Rec-01', 'Rec-02', 'Rec-03', 'Rec-04', 'Recovery -05',
+    'Rhino-01', 'Rhino-02',
+]
+
+
+def seed_constraints(apps, schema_editor):
+    """Create the rules that were previously hardcoded in the roster generator"""
+    AssignmentConstraint = apps.get_model('police_roster', 'AssignmentConstraint')
+    AssignmentConstraint.objects.create(
+        name='Female officers excluded from restricted call signs',
+        kind='AREA_EXCLUSION',
+        parameters={
+            'officer': {
+                'genders': ['F', 'Female', 'female', 'f'],
+                'name_markers': ['L/C', 'L/Const', 'Lady Const'],
+            },
+            'area': {'call_signs': RESTRICTED_CALL_SIGNS, 'match_prefix': True},
+        },
+    )
+    AssignmentConstraint.objects.create(
+        name='Roster pool is field duty without fixed posting',
+        kind='POOL_REQUIREMENT',
+        parameters={'pool': 'FIELD', 'filters': {'preferred_duty': 'FIELD', 'has_fixed_duty': False}},
+    )
+    AssignmentConstraint.objects.create(
+        name='Drivers are field duty only',
+        kind='POOL_REQUIREMENT',
+        parameters={
+            'pool': 'DRIVER',
+            'filters': {'is_driver': True, 'preferred_duty': 'FIELD', 'has_fixed_duty': False},
+        },
+    )
+    AssignmentConstraint.objects.create(
+        name='Home Guards count as field duty',
+        kind='DUTY_OVERRIDE',
+        parameters={'ranks': ['HG'], 'duty': 'FIELD'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0008_alter_roster_name_corrigendumchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentConstraint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('kind', models.CharField(choices=[('AREA_EXCLUSION', 'Exclude matching officers from matching areas'), ('POOL_REQUIREMENT', 'Field requirements for an allocation pool'), ('DUTY_OVERRIDE', 'Override the effective duty of a rank')], max_length=20)),
+                ('parameters', models.JSONField(default=dict)),
+                ('is_active', models.BooleanField(default=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'name'],
+            },
+        ),
+        migrations.RunPython(seed_constraints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 22:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0009_assignmentconstraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForcedAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forced_assignments', to='police_roster.area')),
+                ('policeman', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forced_assignment', to='police_roster.policeman')),
+            ],
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2 on 2026-10-18 23:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+RANK_CODES_BY_DISPLAY = {
+    'Inspector': 'INSP', 'Sub Inspector': 'SI', 'Assistant Sub Inspector': 'ASI',
+    'Head Constable': 'HC', 'Constable': 'CONST', 'Home Guard': 'HG',
+}
+RANK_DISPLAY = {code: display for display, code in RANK_CODES_BY_DISPLAY.items()}
+
+
+def move_assignments_to_table(apps, schema_editor):
+    """Copy roster_data['assignments'] of every archive into ArchivedAssignment rows"""
+    PreviousRoster = apps.get_model('police_roster', 'PreviousRoster')
+    ArchivedAssignment = apps.get_model('police_roster', 'ArchivedAssignment')
+    Area = apps.get_model('police_roster', 'Area')
+    Policeman = apps.get_model('police_roster', 'Policeman')
+
+    area_zones = dict(Area.objects.values_list('id', 'zone_id'))
+    policeman_ids = set(Policeman.objects.values_list('id', flat=True))
+
+    for previous_roster in PreviousRoster.objects.all():
+        roster_data = previous_roster.roster_data if isinstance(previous_roster.roster_data, dict) else {}
+        rows = {}
+        for data in roster_data.pop('assignments', None) or []:
+            if not isinstance(data, dict):
+                continue
+            rank = data.get('rank') or ''
+            if rank not in RANK_DISPLAY:
+                rank = RANK_CODES_BY_DISPLAY.get(data.get('policeman_rank'), rank)
+            policeman_id = data.get('policeman') if data.get('policeman') in policeman_ids else None
+            area_id = data.get('area') if data.get('area') in area_zones else None
+            # Corrigenda were appended to the list, so later entries win
+            rows[policeman_id or f'row-{len(rows)}'] = ArchivedAssignment(
+                previous_roster=previous_roster,
+                policeman_id=policeman_id,
+                area_id=area_id,
+                zone_id=area_zones.get(area_id),
+                policeman_name=data.get('policeman_name') or '',
+                belt_no=data.get('belt_no') or '',
+                rank=rank[:10],
+                area_name=data.get('area_name') or '',
+                zone_name=data.get('zone_name') or '',
+                call_sign=data.get('call_sign') or '',
+                was_previous_zone=bool(data.get('was_previous_zone')),
+                was_previous_area=bool(data.get('was_previous_area')),
+            )
+        ArchivedAssignment.objects.bulk_create(rows.values())
+        previous_roster.roster_data = roster_data
+        previous_roster.save(update_fields=['roster_data'])
+
+
+def move_assignments_to_blob(apps, schema_editor):
+    """Write the ArchivedAssignment rows back into roster_data['assignments']"""
+    PreviousRoster = apps.get_model('police_roster', 'PreviousRoster')
+
+    for previous_roster in PreviousRoster.objects.all():
+        roster_data = previous_roster.roster_data if isinstance(previous_roster.roster_data, dict) else {}
+        roster_data['assignments'] = [{
+            'policeman': row.policeman_id,
+            'policeman_name': row.policeman_name,
+            'policeman_rank': RANK_DISPLAY.get(row.rank, row.rank),
+            'rank': row.rank,
+            'belt_no': row.belt_no,
+            'area': row.area_id,
+            'area_name': row.area_name,
+            'zone_name': row.zone_name,
+            'call_sign': row.call_sign,
+            'was_previous_zone': row.was_previous_zone,
+            'was_previous_area': row.was_previous_area,
+        } for row in previous_roster.archived_assignments.order_by('id')]
+        previous_roster.roster_data = roster_data
+        previous_roster.save(update_fields=['roster_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0010_forcedassignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('policeman_name', models.CharField(blank=True, max_length=100)),
+                ('belt_no', models.CharField(blank=True, max_length=50)),
+                ('rank', models.CharField(blank=True, max_length=10)),
+                ('area_name', models.CharField(blank=True, max_length=100)),
+                ('zone_name', models.CharField(blank=True, max_length=100)),
+                ('call_sign', models.CharField(blank=True, max_length=50)),
+                ('was_previous_zone', models.BooleanField(default=False)),
+                ('was_previous_area', models.BooleanField(default=False)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assignments', to='police_roster.area')),
+                ('policeman', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assignments', to='police_roster.policeman')),
+                ('previous_roster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_assignments', to='police_roster.previousroster')),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assignments', to='police_roster.zone')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['policeman', 'previous_roster'], name='archived_officer_history')],
+                'unique_together': {('previous_roster', 'policeman')},
+            },
+        ),
+        migrations.RunPython(move_assignments_to_table, move_assignments_to_blob),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 23:40
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SEARCH_TABLE = 'police_roster_policeman_search'
+
+RANK_DISPLAY = {
+    'INSP': 'Inspector', 'SI': 'Sub Inspector', 'ASI': 'Assistant Sub Inspector',
+    'HC': 'Head Constable', 'CONST': 'Constable', 'HG': 'Home Guard',
+}
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 officer search table and index every existing officer (SQLite with FTS5 only)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Policeman = apps.get_model('police_roster', 'Policeman')
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                f"name, belt_no, rank_words, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+            )
+        except OperationalError:
+            return  # SQLite built without FTS5; search falls back to plain queries
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, belt_no, rank_words) VALUES (%s, %s, %s, %s)',
+            [(pk, name, belt_no, f'{rank} {RANK_DISPLAY.get(rank, "")}'.strip())
+             for pk, name, belt_no, rank in Policeman.objects.values_list('id', 'name', 'belt_no', 'rank')]
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0011_archivedassignment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
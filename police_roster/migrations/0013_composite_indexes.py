@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0012_policeman_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='corrigendumchange',
+            index=models.Index(fields=['roster', '-created_at'], name='corrigendum_roster_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['area', '-created_at'], name='deployment_area_latest'),
+        ),
+        migrations.AddIndex(
+            model_name='policeman',
+            index=models.Index(fields=['preferred_duty', 'has_fixed_duty', 'rank'], name='policeman_duty_pool'),
+        ),
+        migrations.AddIndex(
+            model_name='previousroster',
+            index=models.Index(fields=['-created_at'], name='previous_roster_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='roster',
+            index=models.Index(condition=models.Q(('is_pending', True)), fields=['-created_at', '-id'], name='roster_pending_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='roster',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_pending', False)), fields=['-created_at', '-id'], name='roster_active_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='rosterassignment',
+            index=models.Index(fields=['roster', 'area'], name='assignment_roster_area'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 23:27
+
+import police_roster.archive_format
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('police_roster', '0013_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='previousroster',
+            name='roster_data',
+            field=police_roster.archive_format.CompactJSONField(),
+        ),
+        migrations.AlterField(
+            model_name='previousroster',
+            name='unfulfilled_requirements',
+            field=police_roster.archive_format.CompactJSONField(blank=True, null=True),
+        ),
+    ]
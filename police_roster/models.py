@@ -1,14 +1,18 @@
 # models.py
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth.models import User
 import json
 from datetime import datetime
 
+from .archive_format import CompactJSONField
+
 class Zone(models.Model):
     """Represents a police zone (Central, East, etc.)"""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -19,6 +23,7 @@ class Area(models.Model):
     name = models.CharField(max_length=100)
     call_sign = models.CharField(max_length=50)
     vehicle_no = models.CharField(max_length=20, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.name} ({self.zone.name})"
@@ -53,10 +58,17 @@ class Policeman(models.Model):
     specialized_duty = models.CharField(max_length=100, blank=True, null=True)
     has_fixed_duty = models.BooleanField(default=False)
     fixed_area = models.ForeignKey('Area', on_delete=models.SET_NULL, null=True, blank=True, related_name='fixed_duty_officers')
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.name} ({self.belt_no}) - {self.get_rank_display()}"
     
+    class Meta:
+        indexes = [
+            # Duty pools: preferred_duty='FIELD', has_fixed_duty=False, optionally by rank
+            models.Index(fields=['preferred_duty', 'has_fixed_duty', 'rank'], name='policeman_duty_pool'),
+        ]
+    
     @property
     def is_senior(self):
         """Return True if officer is a senior rank (SI, ASI, HC)"""
@@ -66,14 +78,6 @@ class Policeman(models.Model):
     def is_home_guard(self):
         """Return True if officer is a Home Guard"""
         return self.rank == 'HG'
-    
-    @property
-    def effective_duty(self):
-        """Return the effective duty type, with special handling for Home Guards
-        Home Guards are always considered available for field duty regardless of their preferred_duty setting"""
-        if self.rank == 'HG':
-            return 'FIELD'  # Home Guards are always available for field duty
-        return self.preferred_duty
         
     def clean(self):
         """Validate that fixed_area is set if has_fixed_duty is True"""
@@ -88,6 +92,10 @@ class Policeman(models.Model):
             self.fixed_area = None
         super().save(*args, **kwargs)
 
+RANK_DISPLAY = dict(Policeman.RANK_CHOICES)
+RANK_CODES = set(RANK_DISPLAY)
+RANK_CODES_BY_DISPLAY = {display: code for code, display in Policeman.RANK_CHOICES}
+
 class Deployment(models.Model):
     """Represents required personnel deployment for an area"""
     area = models.ForeignKey(Area, related_name='deployments', on_delete=models.SET_NULL, null=True)
@@ -101,6 +109,11 @@ class Deployment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['area', '-created_at'], name='deployment_area_latest'),
+        ]
+    
     def __str__(self):
         return f"Deployment for {self.area} - Updated: {self.updated_at.date()}"
 
@@ -113,6 +126,16 @@ class Roster(models.Model):
     repetition_count = models.PositiveIntegerField(default=0)  # Count of officers assigned to same zone
     same_area_repetition_count = models.PositiveIntegerField(default=0)  # Count of officers assigned to same area
     unfulfilled_requirements = models.JSONField(null=True, blank=True)  # Areas with unfulfilled requirements
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Pending/active roster lists, newest first. Django renders boolean filters as bare
+            # column tests on SQLite, which only partial indexes with the same condition can serve
+            models.Index(fields=['-created_at', '-id'], condition=Q(is_pending=True), name='roster_pending_recent'),
+            models.Index(fields=['-created_at', '-id'], condition=Q(is_active=True, is_pending=False),
+                         name='roster_active_recent'),
+        ]
     
     def __str__(self):
         status = "Pending" if self.is_pending else "Active" if self.is_active else "Inactive"
@@ -125,25 +148,207 @@ class RosterAssignment(models.Model):
     policeman = models.ForeignKey(Policeman, related_name='roster_assignments', on_delete=models.CASCADE)
     was_previous_zone = models.BooleanField(default=False)  # Flag if officer was in same zone in previous roster
     was_previous_area = models.BooleanField(default=False)  # Flag if officer was in same area in previous roster
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.policeman.name} assigned to {self.area.name}"
         
     class Meta:
         unique_together = ('roster', 'policeman')  # One officer cannot be assigned twice in same roster
+        indexes = [
+            models.Index(fields=['roster', 'area'], name='assignment_roster_area'),
+        ]
 
 class PreviousRoster(models.Model):
     """Archive of previous rosters for reference"""
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField()
     archived_at = models.DateTimeField(auto_now_add=True)
-    roster_data = models.JSONField()  # Stores serialized roster data
+    # Serialized roster header (assignments live in ArchivedAssignment, unfulfilled
+    # requirements in their own column), in the compact archive encoding
+    roster_data = CompactJSONField()
     repetition_count = models.PositiveIntegerField(default=0)
     same_area_repetition_count = models.PositiveIntegerField(default=0)
-    unfulfilled_requirements = models.JSONField(null=True, blank=True)  # Areas with unfulfilled requirements
+    unfulfilled_requirements = CompactJSONField(null=True, blank=True)  # Areas with unfulfilled requirements
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Latest archive (previous assignments for generation) and the archive list
+            models.Index(fields=['-created_at'], name='previous_roster_recent'),
+        ]
     
     def __str__(self):
         return f"Previous {self.name} ({self.created_at.strftime('%Y-%m-%d')})"
+    
+    @classmethod
+    def archive(cls, roster, roster_data):
+        """Archive a roster from its serialized data (RosterSerializer output)"""
+        roster_data = dict(roster_data)
+        assignments = roster_data.pop('assignments', [])
+        roster_data.pop('unfulfilled_requirements', None)  # Kept once, in its own column
+        with transaction.atomic():
+            previous_roster = cls.objects.create(
+                name=roster.name,
+                created_at=roster.created_at,
+                repetition_count=roster.repetition_count,
+                same_area_repetition_count=roster.same_area_repetition_count,
+                unfulfilled_requirements=roster.unfulfilled_requirements,
+                roster_data=roster_data
+            )
+            previous_roster.replace_assignments(assignments)
+        return previous_roster
+    
+    def replace_assignments(self, assignments):
+        """Replace all archived assignments with the given assignment dicts"""
+        area_zones = dict(Area.objects.values_list('id', 'zone_id'))
+        rows = {}
+        for assignment in assignments:
+            row = ArchivedAssignment.from_dict(self, assignment, area_zones)
+            rows[row.policeman_id or f'row-{len(rows)}'] = row  # Later entries win, as corrigenda are appended
+        with transaction.atomic():
+            self.archived_assignments.all().delete()
+            ArchivedAssignment.objects.bulk_create(rows.values())
+    
+    def assignment_list(self):
+        """Return the archived assignments as dicts in the serialized roster format"""
+        return [assignment.to_dict() for assignment in self.archived_assignments.all()]
+    
+    def full_roster_data(self):
+        """Return roster_data with its assignments, as originally archived.
+
+        The unfulfilled requirements are left to the unfulfilled_requirements column, also
+        when an older (or expanded) archive header repeats them.
+        """
+        roster_data = dict(self.roster_data or {})
+        roster_data.pop('unfulfilled_requirements', None)
+        roster_data['assignments'] = self.assignment_list()
+        return roster_data
+
+class ArchivedAssignment(models.Model):
+    """A single assignment of an archived roster.
+    
+    Names are copied at archive time so the archive still reads correctly after officers
+    or areas are renamed or deleted.
+    """
+    previous_roster = models.ForeignKey(PreviousRoster, related_name='archived_assignments', on_delete=models.CASCADE)
+    policeman = models.ForeignKey(Policeman, related_name='archived_assignments', on_delete=models.SET_NULL, null=True, blank=True)
+    area = models.ForeignKey(Area, related_name='archived_assignments', on_delete=models.SET_NULL, null=True, blank=True)
+    zone = models.ForeignKey(Zone, related_name='archived_assignments', on_delete=models.SET_NULL, null=True, blank=True)
+    policeman_name = models.CharField(max_length=100, blank=True)
+    belt_no = models.CharField(max_length=50, blank=True)
+    rank = models.CharField(max_length=10, blank=True)
+    area_name = models.CharField(max_length=100, blank=True)
+    zone_name = models.CharField(max_length=100, blank=True)
+    call_sign = models.CharField(max_length=50, blank=True)
+    was_previous_zone = models.BooleanField(default=False)
+    was_previous_area = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['id']
+        unique_together = ('previous_roster', 'policeman')  # One officer per archived roster
+        indexes = [
+            models.Index(fields=['policeman', 'previous_roster'], name='archived_officer_history'),
+        ]
+    
+    def __str__(self):
+        return f"{self.policeman_name} in {self.area_name} ({self.previous_roster_id})"
+    
+    @classmethod
+    def from_dict(cls, previous_roster, data, area_zones):
+        """Build an unsaved row from a serialized assignment; area_zones maps area ids to zone ids"""
+        rank = data.get('rank') or ''
+        if rank not in RANK_CODES:
+            rank = RANK_CODES_BY_DISPLAY.get(data.get('policeman_rank'), rank)
+        area_id = data.get('area')
+        return cls(
+            previous_roster=previous_roster,
+            policeman_id=data.get('policeman'),
+            area_id=area_id if area_id in area_zones else None,
+            zone_id=area_zones.get(area_id),
+            policeman_name=data.get('policeman_name') or '',
+            belt_no=data.get('belt_no') or '',
+            rank=rank,
+            area_name=data.get('area_name') or '',
+            zone_name=data.get('zone_name') or '',
+            call_sign=data.get('call_sign') or '',
+            was_previous_zone=bool(data.get('was_previous_zone')),
+            was_previous_area=bool(data.get('was_previous_area'))
+        )
+    
+    @staticmethod
+    def snapshot_fields(policeman, area):
+        """Field values recording the officer in the area now, e.g. for a corrigendum"""
+        return {
+            'policeman_name': policeman.name,
+            'belt_no': policeman.belt_no,
+            'rank': policeman.rank,
+            'area': area,
+            'zone_id': area.zone_id,
+            'area_name': area.name,
+            'zone_name': area.zone.name,
+            'call_sign': area.call_sign,
+            'was_previous_zone': False,
+            'was_previous_area': False
+        }
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'policeman': self.policeman_id,
+            'policeman_name': self.policeman_name,
+            'policeman_rank': RANK_DISPLAY.get(self.rank, self.rank),
+            'rank': self.rank,
+            'belt_no': self.belt_no,
+            'area': self.area_id,
+            'area_name': self.area_name,
+            'zone_name': self.zone_name,
+            'call_sign': self.call_sign,
+            'was_previous_zone': self.was_previous_zone,
+            'was_previous_area': self.was_previous_area
+        }
+
+class ForcedAssignment(models.Model):
+    """Pins an officer to an area in every generated roster"""
+    policeman = models.OneToOneField(Policeman, related_name='forced_assignment', on_delete=models.CASCADE)
+    area = models.ForeignKey(Area, related_name='forced_assignments', on_delete=models.CASCADE)
+    is_active = models.BooleanField(default=True)
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.policeman.name} ({self.policeman.belt_no}) pinned to {self.area.name}"
+
+class AssignmentConstraint(models.Model):
+    """A roster generation rule declared as data so it can be edited in admin.
+
+    Parameters by kind:
+    - AREA_EXCLUSION: {"officer": {"genders": [...], "name_markers": [...], "ranks": [...]},
+                       "area": {"call_signs": [...], "match_prefix": true}}
+    - POOL_REQUIREMENT: {"pool": "FIELD" | "DRIVER", "filters": {"<policeman field>": value}}
+    - DUTY_OVERRIDE: {"ranks": [...], "duty": "FIELD" | "STATIC"}, the displayed duty only
+    """
+    KIND_CHOICES = [
+        ('AREA_EXCLUSION', 'Exclude matching officers from matching areas'),
+        ('POOL_REQUIREMENT', 'Field requirements for an allocation pool'),
+        ('DUTY_OVERRIDE', 'Override the effective duty of a rank'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    parameters = models.JSONField(default=dict)
+    is_active = models.BooleanField(default=True)
+    description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'name']
+
+    def __str__(self):
+        status = "" if self.is_active else " (inactive)"
+        return f"{self.name} [{self.get_kind_display()}]{status}"
 
 class CorrigendumChange(models.Model):
     """Model to track manual changes that should affect future roster generation"""
@@ -151,10 +356,14 @@ class CorrigendumChange(models.Model):
     policeman = models.ForeignKey('Policeman', on_delete=models.CASCADE)
     area = models.ForeignKey('Area', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['roster', '-created_at'], name='corrigendum_roster_recent'),
+        ]
         
     def __str__(self):
         return f"Change for {self.policeman.name} to {self.area.name} on {self.created_at}"
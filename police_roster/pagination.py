@@ -0,0 +1,18 @@
+# pagination.py
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RosterCursorPagination(CursorPagination):
+    """Newest rosters first; cursors keep pages stable while new rosters are generated"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class AssignmentPagination(PageNumberPagination):
+    """Pages of roster assignments for the dedicated assignments endpoints"""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
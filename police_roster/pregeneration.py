@@ -0,0 +1,164 @@
+# pregeneration.py
+
+import contextlib
+import datetime
+import io
+import json
+import os
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import cache_response_data
+from .models import Roster
+from .previews import input_fingerprint
+from .snapshot import get_snapshot
+from .views import ZoneViewSet, AreaViewSet, PolicemanViewSet, DeploymentViewSet
+from .management.commands.generate_roster import RosterGenerator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Reference endpoints the roster pages load, served from the versioned response cache:
+# (viewset, basename, action, path, the objects the action serializes)
+WARM_ENDPOINTS = (
+    (ZoneViewSet, 'zone', 'list', '/api/zones/', lambda: ZoneViewSet.queryset.all()),
+    (AreaViewSet, 'area', 'list', '/api/areas/', lambda: AreaViewSet.queryset.all()),
+    (PolicemanViewSet, 'policeman', 'list', '/api/policemen/', lambda: PolicemanViewSet.queryset.all()),
+    (PolicemanViewSet, 'policeman', 'field_officers', '/api/policemen/field_officers/',
+     lambda: get_snapshot().field_officers),
+    (PolicemanViewSet, 'policeman', 'drivers', '/api/policemen/drivers/', PolicemanViewSet.drivers_queryset),
+    (DeploymentViewSet, 'deployment', 'latest_by_area', '/api/deployments/latest_by_area/',
+     DeploymentViewSet.latest_deployments),
+)
+
+# Number of runs kept in the state file
+HISTORY_LENGTH = 30
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path without waiting; yields False if another process holds it"""
+    with open(path, 'a+') as handle:
+        try:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def parse_time(value):
+    """datetime.time from 'HH:MM'"""
+    return datetime.datetime.strptime(value, '%H:%M').time()
+
+
+def next_run_time(at, now=None):
+    """The next occurrence of the local time `at` strictly after now"""
+    now = timezone.localtime(now)
+    run = timezone.make_aware(datetime.datetime.combine(now.date(), at))
+    if run <= now:
+        run = timezone.make_aware(datetime.datetime.combine(now.date() + datetime.timedelta(days=1), at))
+    return run
+
+
+def roster_name(date):
+    return f"Roster {date.strftime('%Y-%m-%d')}"
+
+
+def load_state():
+    """{'runs': [...]} from ROSTER_PREGENERATE_STATE, oldest run first"""
+    try:
+        with open(settings.ROSTER_PREGENERATE_STATE) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {'runs': []}
+
+
+def save_state(state):
+    path = settings.ROSTER_PREGENERATE_STATE
+    with open(f'{path}.tmp', 'w') as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def warm_caches():
+    """Fill the response cache of the reference endpoints so the first morning requests are hits.
+
+    Each entry is built with the serializer and objects the view action uses.
+    """
+    for viewset, basename, action, path, objects in WARM_ENDPOINTS:
+        data = viewset.serializer_class(objects(), many=True).data
+        cache_response_data(basename, action, path, data)
+
+
+def pregenerate(date, seed=None):
+    """Generate the pending roster for date unless an up-to-date one exists.
+
+    A pending roster pre-generated earlier is kept while the generation inputs are
+    unchanged and replaced (then deleted) once they changed; once it has been confirmed
+    nothing is done. Only one process runs at a time, others get status 'locked'.
+    Returns the run record, which is also appended to the state file.
+    """
+    with file_lock(f'{settings.ROSTER_PREGENERATE_STATE}.lock') as acquired:
+        if not acquired:
+            return {'date': date.isoformat(), 'status': 'locked'}
+
+        state = load_state()
+        # Runs happen in separate processes: the table states are comparable between them, and
+        # the data version is left out so a cleared cache does not look like changed inputs
+        fingerprint = input_fingerprint(versioned=False)
+        previous = next((run for run in reversed(state['runs'])
+                         if run['date'] == date.isoformat() and run.get('roster')), None)
+        stale_id = None
+        if previous:
+            roster = Roster.objects.filter(id=previous['roster']).first()
+            if roster and not roster.is_pending:
+                return {'date': date.isoformat(), 'status': 'confirmed', 'roster': roster.id}
+            if roster and previous['fingerprint'] == fingerprint:
+                return {'date': date.isoformat(), 'status': 'up-to-date', 'roster': roster.id}
+            stale_id = roster.id if roster else None
+
+        started = time.perf_counter()
+        generator = RosterGenerator(seed=seed)
+        with contextlib.redirect_stdout(io.StringIO()):  # the generator prints its progress
+            roster = generator.generate_roster(name=roster_name(date), pending=True)
+        generation_seconds = time.perf_counter() - started
+
+        if stale_id:
+            Roster.objects.filter(id=stale_id, is_pending=True).delete()
+
+        started = time.perf_counter()
+        warm_caches()
+        warm_seconds = round(time.perf_counter() - started, 3)
+
+        run = {
+            'date': date.isoformat(),
+            'status': 'generated',
+            'roster': roster.id,
+            'replaced': stale_id,
+            'fingerprint': fingerprint,
+            'finished_at': timezone.now().isoformat(),
+            'generation_seconds': round(generation_seconds, 3),
+            'warm_seconds': warm_seconds,
+            'assignments': len(generator.assigned_officers),
+            'unfulfilled': generator.incomplete_assignments.totals(),
+        }
+        state['runs'] = (state['runs'] + [run])[-HISTORY_LENGTH:]
+        save_state(state)
+        return run
@@ -0,0 +1,83 @@
+# previews.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .caching import get_data_version, GENERATION_INPUTS
+from .models import (
+    Zone, Area, Policeman, Deployment, PreviousRoster, ArchivedAssignment,
+    CorrigendumChange, ForcedAssignment, AssignmentConstraint, Roster
+)
+
+# Generator inputs; every input table has an updated_at column
+INPUT_MODELS = [Zone, Area, Policeman, Deployment, ForcedAssignment, AssignmentConstraint]
+
+
+def _table_state(queryset):
+    return sorted(queryset.aggregate(count=Count('id'), max_id=Max('id'), updated_at=Max('updated_at')).items())
+
+
+def input_fingerprint(versioned=True):
+    """Cheap digest of everything RosterGenerator reads, from counts and max ids/updated_at per table.
+
+    Saves touch updated_at and deletes lower the count or max id, so the table states alone
+    detect changes made by any process; versioned=False digests just those. The default also
+    includes the generation inputs data version, which catches edits within the timestamp
+    resolution but is only comparable between processes sharing the cache.
+    """
+    state = [get_data_version(GENERATION_INPUTS)] if versioned else []
+    state += [_table_state(model.objects.all()) for model in INPUT_MODELS]
+
+    previous_id = PreviousRoster.objects.order_by('-created_at').values_list('id', flat=True).first()
+    state.append(previous_id)
+    if previous_id is not None:
+        state.append(_table_state(ArchivedAssignment.objects.filter(previous_roster_id=previous_id)))
+        state.append(_table_state(CorrigendumChange.objects.filter(roster_id=previous_id)))
+    return hashlib.md5(repr(state).encode()).hexdigest()
+
+
+class PreviewCache:
+    """LRU of seeded pending rosters keyed on (input fingerprint, seed, options).
+
+    Values are roster ids; an entry is only served while its roster is still pending, so
+    confirmed or discarded previews are regenerated on the next request.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(fingerprint, seed, **options):
+        return (fingerprint, seed, tuple(sorted(options.items())))
+
+    def get(self, key):
+        with self.lock:
+            roster_id = self.entries.get(key)
+            if roster_id is None:
+                return None
+            self.entries.move_to_end(key)
+        if Roster.objects.filter(id=roster_id, is_pending=True).exists():
+            return roster_id
+        with self.lock:
+            self.entries.pop(key, None)
+        return None
+
+    def put(self, key, roster_id):
+        with self.lock:
+            self.entries[key] = roster_id
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+preview_cache = PreviewCache(getattr(settings, 'ROSTER_PREVIEW_CACHE_SIZE', 32))
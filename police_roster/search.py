@@ -0,0 +1,133 @@
+# search.py
+
+import re
+
+from django.db import connection, OperationalError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import RANK_DISPLAY, Policeman
+
+# SQLite FTS5 table mirroring officers (rowid = policeman id), kept in sync by signals
+SEARCH_TABLE = 'police_roster_policeman_search'
+
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+
+# Prefix indexes make 'term*' queries index lookups instead of full term scans
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"name, belt_no, rank_words, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+)
+
+_index_available = {}
+
+
+def search_tokens(term):
+    """Split a search term into lowercase word tokens"""
+    return re.findall(r'\w+', (term or '').lower())
+
+
+def rank_text(rank):
+    """Index both the rank code and its display name so 'SI' and 'Sub Inspector' both match"""
+    return f'{rank} {RANK_DISPLAY.get(rank, "")}'.strip()
+
+
+def index_available(using=connection):
+    """Whether the FTS5 table exists on this database (not every SQLite build ships FTS5)"""
+    key = (using.vendor, using.settings_dict['NAME'])
+    if key not in _index_available:
+        _index_available[key] = using.vendor == 'sqlite' and SEARCH_TABLE in using.introspection.table_names(
+            include_views=True
+        )
+    return _index_available[key]
+
+
+def create_index(using=connection, officers=()):
+    """Create the FTS5 table and fill it with (id, name, belt_no, rank) rows; False if FTS5 is missing"""
+    if using.vendor != 'sqlite':
+        return False
+    with using.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_SEARCH_TABLE)
+        except OperationalError:
+            return False
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, belt_no, rank_words) VALUES (%s, %s, %s, %s)',
+            [(pk, name, belt_no, rank_text(rank)) for pk, name, belt_no, rank in officers]
+        )
+    _index_available.pop((using.vendor, using.settings_dict['NAME']), None)
+    return True
+
+
+def rebuild_index():
+    """Re-sync the whole index from the officers table"""
+    return create_index(officers=Policeman.objects.values_list('id', 'name', 'belt_no', 'rank').iterator())
+
+
+def _match_expression(term):
+    # Every token must match the start of a word: 'gur sin' -> "gur"* "sin"*
+    return ' '.join(f'"{token}"*' for token in search_tokens(term))
+
+
+def search_filter(term):
+    """Q object matching officers whose name, belt number or rank has words starting with every token"""
+    tokens = search_tokens(term)
+    if not tokens:
+        return Q()
+    if index_available():
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+                               [_match_expression(term)]))
+    query = Q()
+    for token in tokens:
+        query &= (Q(name__istartswith=token) | Q(name__icontains=f' {token}') |
+                  Q(belt_no__istartswith=token) | Q(rank__iexact=token))
+    return query
+
+
+def typeahead(term, limit=TYPEAHEAD_LIMIT):
+    """Best matches for a typeahead box as compact {id, name, belt_no, rank} rows"""
+    if not search_tokens(term):
+        return []
+    if not index_available():
+        return list(Policeman.objects.filter(search_filter(term))
+                    .order_by('name').values('id', 'name', 'belt_no', 'rank')[:limit])
+    with connection.cursor() as cursor:
+        # bm25 weights favour belt number hits, then names, then ranks
+        cursor.execute(
+            f'SELECT p.id, p.name, p.belt_no, p.rank FROM {SEARCH_TABLE} s '
+            f'JOIN {Policeman._meta.db_table} p ON p.id = s.rowid '
+            f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY bm25({SEARCH_TABLE}, 1.0, 4.0, 0.25), p.name LIMIT %s',
+            [_match_expression(term), limit]
+        )
+        return [dict(zip(('id', 'name', 'belt_no', 'rank'), row)) for row in cursor.fetchall()]
+
+
+def index_policeman(sender, instance, **kwargs):
+    """Signal receiver: upsert an officer into the index"""
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [instance.pk])
+        cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, name, belt_no, rank_words) VALUES (%s, %s, %s, %s)',
+                       [instance.pk, instance.name, instance.belt_no, rank_text(instance.rank)])
+
+
+def unindex_policeman(sender, instance, **kwargs):
+    """Signal receiver: drop a deleted officer from the index"""
+    if not index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [instance.pk])
+
+
+class OfficerSearchFilter(filters.SearchFilter):
+    """?search= backed by the FTS5 index: prefix matches on name, belt number and rank words"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return queryset.filter(search_filter(' '.join(terms)))
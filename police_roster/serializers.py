@@ -1,7 +1,11 @@
 # serializers.py
 
 from rest_framework import serializers
-from .models import Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster, CorrigendumChange
+from django.db.models import Prefetch
+from .models import (
+    Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster,
+    CorrigendumChange, ForcedAssignment
+)
 
 class ZoneSerializer(serializers.ModelSerializer):
     class Meta:
@@ -39,6 +43,18 @@ class DeploymentSerializer(serializers.ModelSerializer):
         ]
         
 
+class ForcedAssignmentSerializer(serializers.ModelSerializer):
+    policeman_name = serializers.ReadOnlyField(source='policeman.name')
+    belt_no = serializers.ReadOnlyField(source='policeman.belt_no')
+    policeman_rank = serializers.ReadOnlyField(source='policeman.get_rank_display')
+    area_name = serializers.ReadOnlyField(source='area.name')
+    zone_name = serializers.ReadOnlyField(source='area.zone.name')
+
+    class Meta:
+        model = ForcedAssignment
+        fields = ['id', 'policeman', 'policeman_name', 'belt_no', 'policeman_rank',
+                  'area', 'area_name', 'zone_name', 'is_active', 'notes',
+                  'created_at', 'updated_at']
 
 class RosterAssignmentSerializer(serializers.ModelSerializer):
     policeman_name = serializers.ReadOnlyField(source='policeman.name')
@@ -62,6 +78,25 @@ class RosterSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'created_at', 'is_active', 
                   'repetition_count', 'same_area_repetition_count', 
                   'unfulfilled_requirements', 'assignments']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch assignments with their officer, area and zone so serializing
+        any number of rosters costs a fixed number of queries"""
+        return queryset.prefetch_related(
+            Prefetch('assignments', queryset=RosterAssignment.objects.select_related(
+                'policeman', 'area', 'area__zone'
+            ))
+        )
+
+class RosterSummarySerializer(serializers.ModelSerializer):
+    """Roster header fields only; expects the queryset to be annotated with assignment_count"""
+    assignment_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Roster
+        fields = ['id', 'name', 'created_at', 'is_active', 'is_pending',
+                  'repetition_count', 'same_area_repetition_count', 'assignment_count']
 
 class RosterCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -69,24 +104,33 @@ class RosterCreateSerializer(serializers.ModelSerializer):
         fields = ['name']
 
 class PreviousRosterSerializer(serializers.ModelSerializer):
-    assignments = serializers.SerializerMethodField()
+    """Full archived roster; roster_data['assignments'] is read from the ArchivedAssignment rows.
+
+    The unfulfilled requirements are only sent as the top-level field.
+    """
+    roster_data = serializers.SerializerMethodField()
     
     class Meta:
         model = PreviousRoster
         fields = ['id', 'name', 'created_at', 'archived_at', 
                   'repetition_count', 'same_area_repetition_count', 
-                  'unfulfilled_requirements', 'roster_data', 'assignments']
+                  'unfulfilled_requirements', 'roster_data']
     
-    def get_assignments(self, obj):
-        """Extract assignments from roster_data if available"""
-        if obj.roster_data and 'assignments' in obj.roster_data:
-            return obj.roster_data['assignments']
-        return []
+    def get_roster_data(self, obj):
+        return obj.full_roster_data()
+
+class PreviousRosterSummarySerializer(serializers.ModelSerializer):
+    """Archived roster header fields only, so listings never load roster_data"""
+    class Meta:
+        model = PreviousRoster
+        fields = ['id', 'name', 'created_at', 'archived_at',
+                  'repetition_count', 'same_area_repetition_count']
 
 # Special serializer for roster generation
 class RosterGenerationRequestSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=100, required=False, allow_null=True)
     save_immediately = serializers.BooleanField(default=False)
+    seed = serializers.IntegerField(required=False, allow_null=True, min_value=0)
 
 # Serializer for saving or discarding a generated roster
 class RosterActionSerializer(serializers.Serializer):
@@ -0,0 +1,45 @@
+# signals.py
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+
+from .caching import bump_reference_version, bump_roster_version, bump_generation_inputs_version
+from .search import index_policeman, unindex_policeman
+from .sqlite import configure_sqlite
+from .models import (
+    Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster, ArchivedAssignment,
+    ForcedAssignment, AssignmentConstraint, CorrigendumChange
+)
+
+# Reference data served by the versioned response cache (the rules decide the field officer pool)
+REFERENCE_MODELS = [Zone, Area, Policeman, Deployment, AssignmentConstraint]
+
+# Roster data covered by the roster ETags (bulk_create sends no signals, so code that
+# bulk creates assignments must also save their roster or archive afterwards)
+ROSTER_MODELS = [Roster, RosterAssignment, PreviousRoster, ArchivedAssignment]
+
+# Inputs of roster generation, covered by the warm generation snapshot and preview fingerprints
+GENERATION_INPUT_MODELS = REFERENCE_MODELS + [
+    ForcedAssignment, PreviousRoster, ArchivedAssignment, CorrigendumChange
+]
+
+for model in REFERENCE_MODELS:
+    post_save.connect(bump_reference_version, sender=model, dispatch_uid=f'bump_reference_version_save_{model.__name__}')
+    post_delete.connect(bump_reference_version, sender=model, dispatch_uid=f'bump_reference_version_delete_{model.__name__}')
+
+for model in ROSTER_MODELS:
+    post_save.connect(bump_roster_version, sender=model, dispatch_uid=f'bump_roster_version_save_{model.__name__}')
+    post_delete.connect(bump_roster_version, sender=model, dispatch_uid=f'bump_roster_version_delete_{model.__name__}')
+
+for model in GENERATION_INPUT_MODELS:
+    post_save.connect(bump_generation_inputs_version, sender=model,
+                      dispatch_uid=f'bump_generation_inputs_version_save_{model.__name__}')
+    post_delete.connect(bump_generation_inputs_version, sender=model,
+                        dispatch_uid=f'bump_generation_inputs_version_delete_{model.__name__}')
+
+# Officer search index (bulk updates of name, belt_no or rank need a rebuild_search_index run)
+post_save.connect(index_policeman, sender=Policeman, dispatch_uid='index_policeman')
+post_delete.connect(unindex_policeman, sender=Policeman, dispatch_uid='unindex_policeman')
+
+# Runtime pragmas of the production profile (settings.SQLITE_PRAGMAS)
+connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
@@ -0,0 +1,112 @@
+# snapshot.py
+
+import copy
+import threading
+from collections import defaultdict
+
+from .caching import get_data_version, shared_cache, GENERATION_INPUTS
+from .constraints import ConstraintSet
+from .models import Area, Deployment, Policeman, PreviousRoster, CorrigendumChange, ForcedAssignment
+from .previews import input_fingerprint
+
+
+class GenerationSnapshot:
+    """Everything RosterGenerator reads, loaded and indexed once and shared across runs.
+
+    The snapshot is read-only: officers, areas and the compiled constraints are shared by
+    concurrent runs, while deployments (which a run decrements for forced assignments)
+    and the per-rank officer lists (which a run shuffles and filters) are copied per run
+    by the accessors below.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.constraints = ConstraintSet.load()
+
+        # Latest deployment per area, in area order (one query instead of one per area)
+        latest = {}
+        for deployment in Deployment.objects.filter(area__isnull=False).order_by('area_id', '-created_at', '-id'):
+            latest.setdefault(deployment.area_id, deployment)
+        self.areas_with_deployments = tuple(
+            (area, latest[area.id]) for area in Area.objects.select_related('zone').order_by('id') if area.id in latest
+        )
+
+        # Ordered so a seed gives the same roster whatever the table's physical row order
+        self.field_officers = tuple(Policeman.objects.filter(self.constraints.pool_q('FIELD')).order_by('id'))
+        self.constraints.compile(self.field_officers, [area for area, deployment in self.areas_with_deployments])
+
+        officers_by_rank = defaultdict(list)
+        for officer in self.field_officers:
+            officers_by_rank[officer.rank].append(officer)
+        self.officers_by_rank = {rank: tuple(officers) for rank, officers in officers_by_rank.items()}
+        self.drivers = tuple(o for o in self.field_officers if self.constraints.in_pool(o, 'DRIVER'))
+
+        # Pins of officers outside the field pool are kept so the run can report them as skipped
+        forced_assignments = defaultdict(list)  # {area_id: [officers]}
+        self.forced_areas = {}  # {area_id: area}, also for areas without a deployment
+        forced = ForcedAssignment.objects.filter(is_active=True).select_related('policeman', 'area').order_by('id')
+        for item in forced:
+            forced_assignments[item.area_id].append(item.policeman)
+            self.forced_areas[item.area_id] = item.area
+        self.forced_assignments = dict(forced_assignments)
+
+        self.previous_roster_id, self.previous_assignments = self._load_previous_assignments()
+
+    @staticmethod
+    def _load_previous_assignments():
+        """{officer_id: (zone_id, area_id)} from the latest archive, with its corrigenda applied"""
+        previous_roster = PreviousRoster.objects.only('id').order_by('-created_at').first()
+        if not previous_roster:
+            return None, {}
+        previous_assignments = {
+            policeman_id: (zone_id, area_id)
+            for policeman_id, zone_id, area_id in previous_roster.archived_assignments.filter(
+                policeman__isnull=False, area__isnull=False
+            ).values_list('policeman_id', 'area__zone_id', 'area_id')
+        }
+        # Corrigendum changes override the archived assignments
+        changes = CorrigendumChange.objects.filter(roster=previous_roster).order_by('-created_at', '-id')
+        for policeman_id, zone_id, area_id in changes.values_list('policeman_id', 'area__zone_id', 'area_id'):
+            previous_assignments[policeman_id] = (zone_id, area_id)
+        return previous_roster.id, previous_assignments
+
+    def areas_with_deployment_copies(self):
+        """(area, deployment) pairs with deployments a run may modify"""
+        return [(area, copy.copy(deployment)) for area, deployment in self.areas_with_deployments]
+
+    def officer_lists_by_rank(self):
+        return defaultdict(list, {rank: list(officers) for rank, officers in self.officers_by_rank.items()})
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def _current_version():
+    """The generation inputs data version, which model signals bump.
+
+    Only a shared cache (ROSTER_CACHE_DIR) sees the bumps of other processes, such as
+    other workers or the confirm_roster command; with the per-process cache the table
+    states of the inputs are compared as well, at the cost of a few aggregate queries.
+    """
+    version = get_data_version(GENERATION_INPUTS)
+    if shared_cache():
+        return version
+    return version, input_fingerprint(versioned=False)
+
+
+def get_snapshot():
+    """The current snapshot, rebuilt lazily after any generation input changed"""
+    global _snapshot
+    version = _current_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        snapshot = GenerationSnapshot(version)
+        # Keep it only if nothing changed while loading, otherwise the next run rebuilds
+        if _current_version() == version:
+            _snapshot = snapshot
+        return snapshot
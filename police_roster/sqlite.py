@@ -0,0 +1,17 @@
+# sqlite.py
+
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver applying settings.SQLITE_PRAGMAS to every new SQLite connection.
+
+    journal_mode=WAL is stored in the database file; the remaining pragmas are per connection,
+    so they are applied each time, which with CONN_MAX_AGE is once per worker thread.
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
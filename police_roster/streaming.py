@@ -0,0 +1,103 @@
+# streaming.py
+
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/event-stream'
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Accepts 'Accept: text/event-stream' (sent by EventSource) in content negotiation.
+
+    Streams are returned as StreamingHttpResponse and bypass rendering; other responses,
+    such as validation errors, are sent as a single 'error' event.
+    """
+    media_type = CONTENT_TYPE
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event('error', data)
+
+
+def event_stream_response(events):
+    """StreamingHttpResponse for an iterator of formatted server-sent events"""
+    response = StreamingHttpResponse(events, content_type=CONTENT_TYPE)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+    return response
+
+
+class ClosingEvents:
+    """Iterator over events that calls on_close once, when it is exhausted or closed.
+
+    Unlike a finally block in a generator, on_close also runs when the response is closed
+    before it was iterated (the client went away before the first event was sent).
+    """
+
+    def __init__(self, events, on_close):
+        self.events = events
+        self.on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            try:
+                self.events.close()
+            finally:
+                on_close()
+
+
+def generation_events(generator, name=None, pending=True, on_done=None):
+    """Server-sent events of a RosterGenerator run.
+
+    Sends a 'progress' event after each generation phase, then 'done' with a summary of
+    the roster (after calling on_done with it) or 'error'. The run happens while the
+    response is iterated, so a client that disconnects abandons it and its partial
+    roster is deleted.
+    """
+    events = generator.iter_generate_roster(name, pending)
+    try:
+        for event in events:
+            yield sse_event('progress', event)
+    except Exception as e:
+        logger.exception('Streamed roster generation failed')
+        yield sse_event('error', {'error': f'Failed to generate roster: {e}'})
+        return
+    finally:
+        events.close()
+    if on_done:
+        on_done(generator.roster)
+    yield sse_event('done', roster_summary(generator.roster))
+
+
+def roster_summary(roster, **extra):
+    return {
+        'roster': roster.id,
+        'name': roster.name,
+        'status': 'pending' if roster.is_pending else 'active',
+        'assignments': roster.assignments.count(),
+        'repetition_count': roster.repetition_count,
+        'same_area_repetition_count': roster.same_area_repetition_count,
+        **extra
+    }
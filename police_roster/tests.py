@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import io
+import json
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection, models, OperationalError
+from django.db.models import Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Zone, Area, Policeman, Deployment, Roster, RosterAssignment, PreviousRoster, CorrigendumChange, ForcedAssignment,
+    AssignmentConstraint
+)
+from .search import index_available
+from .sqlite import configure_sqlite
+from .metrics import registry as metrics
+from .idempotency import SingleFlight, single_flight
+from .previews import input_fingerprint, preview_cache
+from .caching import get_data_version, GENERATION_INPUTS
+from .snapshot import get_snapshot
+from .constraints import ConstraintSet
+from .pregeneration import pregenerate, next_run_time, file_lock, load_state, WARM_ENDPOINTS
+from .archive_format import encode, decode, is_compact
+from .exports import _xml_row
+from .management.commands.generate_roster import RosterGenerator, ZoneShortageScheduler, UnfulfilledRequirements
+
+
+@contextlib.contextmanager
+def file_cache():
+    """A cache shared between processes, as with ROSTER_CACHE_DIR, instead of the per-process default"""
+    with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+    }}):
+        yield
+
+
+class AssignmentConstraintTests(TestCase):
+    """Rules compiled into bitmasks decide who may serve where and who is in the field pool"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.restricted = Area.objects.create(zone=zone, name='Zebra', call_sign='Zebra-101')
+        cls.prefixed = Area.objects.create(zone=zone, name='Eagle', call_sign='Eagle-05 M/C 2')
+        cls.open = Area.objects.create(zone=zone, name='Tiger', call_sign='Tiger-01')
+        cls.male = Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+        cls.female = Policeman.objects.create(name='Officer', belt_no='B2', rank='CONST', gender='F')
+        cls.marked = Policeman.objects.create(name='L/C Officer', belt_no='B3', rank='CONST')
+        cls.static_hg = Policeman.objects.create(name='Guard', belt_no='H1', rank='HG', preferred_duty='STATIC')
+        cls.static_const = Policeman.objects.create(name='Clerk', belt_no='C1', rank='CONST', preferred_duty='STATIC')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_restricted_areas_exclude_matching_officers(self):
+        officers = [self.male, self.female, self.marked]
+        constraints = ConstraintSet.load().compile(officers, [self.restricted, self.prefixed, self.open])
+        self.assertTrue(constraints.is_restricted(self.restricted))
+        self.assertTrue(constraints.is_restricted(self.prefixed))
+        self.assertFalse(constraints.is_restricted(self.open))
+        self.assertEqual(constraints.filter_pool(officers, self.restricted), [self.male])
+        self.assertEqual(constraints.filter_pool(officers, self.prefixed), [self.male])
+        self.assertEqual(constraints.filter_pool(officers, self.open), officers)
+
+        Deployment.objects.create(area=self.restricted, constable_count=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            roster = RosterGenerator(seed=1).generate_roster()
+        self.assertEqual(list(roster.assignments.values_list('policeman_id', flat=True)), [self.male.id])
+
+    def test_duty_overrides_only_change_the_displayed_duty(self):
+        constraints = ConstraintSet.load()
+        self.assertEqual(constraints.effective_duty(self.static_hg), 'FIELD')
+        self.assertEqual(constraints.effective_duty(self.static_const), 'STATIC')
+        self.assertFalse(constraints.in_pool(self.static_hg, 'FIELD'))
+        field = set(Policeman.objects.filter(constraints.pool_q('FIELD')))
+        self.assertNotIn(self.static_hg, field)
+        self.assertNotIn(self.static_const, field)
+        self.assertNotIn(self.static_hg, get_snapshot().field_officers)
+
+    def test_static_home_guards_stay_off_the_roster(self):
+        Deployment.objects.create(area=self.open, hgv_count=5)
+        Policeman.objects.create(name='Field Guard', belt_no='H2', rank='HG')
+        with contextlib.redirect_stdout(io.StringIO()):
+            roster = RosterGenerator(seed=1).generate_roster()
+        self.assertEqual(list(roster.assignments.values_list('policeman__belt_no', flat=True)), ['H2'])
+
+    def test_field_officers_endpoint_follows_the_rules(self):
+        client = APIClient()
+        belt_numbers = {officer['belt_no'] for officer in client.get('/api/policemen/field_officers/').json()}
+        self.assertEqual(belt_numbers, {'B1', 'B2', 'B3'})
+
+        rule = AssignmentConstraint.objects.get(kind='POOL_REQUIREMENT', parameters__pool='FIELD')
+        rule.parameters = {'pool': 'FIELD', 'filters': {'has_fixed_duty': False}}
+        rule.save()
+        belt_numbers = {officer['belt_no'] for officer in client.get('/api/policemen/field_officers/').json()}
+        self.assertEqual(belt_numbers, {'B1', 'B2', 'B3', 'H1', 'C1'})
+
+
+class ForcedAssignmentTests(TestCase):
+    """Pinned officers are placed in a pre-pass before the allocation passes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.pinned_area = Area.objects.create(zone=zone, name='Pinned', call_sign='Tiger-01')
+        cls.other_area = Area.objects.create(zone=zone, name='Other', call_sign='Tiger-02')
+        Deployment.objects.create(area=cls.pinned_area, constable_count=2)
+        Deployment.objects.create(area=cls.other_area, constable_count=3)
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST') for i in range(4)]
+        cls.pinned = cls.officers[0]
+        ForcedAssignment.objects.create(policeman=cls.pinned, area=cls.pinned_area)
+
+    def setUp(self):
+        cache.clear()
+
+    def generate(self):
+        generator = RosterGenerator(seed=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generator, generator.generate_roster()
+
+    def test_forced_officer_is_placed_once_in_the_forced_area(self):
+        generator, roster = self.generate()
+        self.assertEqual(list(roster.assignments.filter(policeman=self.pinned).values_list('area_id', flat=True)),
+                         [self.pinned_area.id])
+        # Four officers for five slots: the pinned one is not drawn again by the general passes
+        self.assertEqual(roster.assignments.count(), 4)
+        self.assertEqual(generator.incomplete_assignments.totals(), {'CONST': 1})
+
+    def test_forced_slot_counts_against_the_requirement(self):
+        generator, roster = self.generate()
+        self.assertEqual(roster.assignments.filter(area=self.pinned_area).count(), 2)
+        self.assertEqual(generator.incomplete_assignments.count(self.pinned_area.id, 'CONST'), 0)
+        self.assertEqual(generator.incomplete_assignments.count(self.other_area.id, 'CONST'), 1)
+
+    def test_unavailable_forced_officer_is_skipped_and_reported(self):
+        self.pinned.preferred_duty = 'STATIC'
+        self.pinned.save()
+        generator, roster = self.generate()
+        self.assertFalse(roster.assignments.filter(policeman=self.pinned).exists())
+        self.assertEqual(roster.assignments.count(), 3)
+        skipped = roster.unfulfilled_requirements['forced_skipped']
+        self.assertEqual([(item['belt_no'], item['area_id']) for item in skipped], [('B0', self.pinned_area.id)])
+        self.assertEqual(skipped[0]['reason'], 'Not available for field duty')
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            call_command('generate_roster', stdout=out)
+        self.assertIn('Skipped forced assignment of Officer 0 (Belt #B0) to Pinned', out.getvalue())
+
+    def test_inactive_pin_is_ignored(self):
+        ForcedAssignment.objects.filter(policeman=self.pinned).update(is_active=False)
+        cache.clear()
+        generator, roster = self.generate()
+        self.assertEqual(generator.skipped_forced_assignments, [])
+        self.assertEqual(roster.assignments.count(), 4)
+
+    def test_pin_to_area_without_deployment_is_reported(self):
+        idle_area = Area.objects.create(zone=self.pinned_area.zone, name='Idle', call_sign='Tiger-03')
+        ForcedAssignment.objects.filter(policeman=self.pinned).update(area=idle_area)
+        cache.clear()
+        generator, roster = self.generate()
+        self.assertFalse(roster.assignments.filter(area=idle_area).exists())
+        skipped = roster.unfulfilled_requirements['forced_skipped']
+        self.assertEqual([(item['belt_no'], item['area_name'], item['reason']) for item in skipped],
+                         [('B0', 'Idle', 'No deployment for area')])
+
+    def test_pinned_driver_fills_the_driver_requirement(self):
+        Deployment.objects.create(area=self.pinned_area, constable_count=2, driver_count=1)
+        self.pinned.is_driver = True
+        self.pinned.save()
+        other_driver = Policeman.objects.create(name='Driver', belt_no='D1', rank='HC', is_driver=True)
+        generator, roster = self.generate()
+        self.assertEqual(roster.assignments.filter(area=self.pinned_area, policeman__is_driver=True).count(), 1)
+        self.assertFalse(roster.assignments.filter(policeman=other_driver).exists())
+        self.assertEqual(generator.incomplete_assignments.count(self.pinned_area.id, 'DRIVER'), 0)
+
+
+class ZoneShortageSchedulerTests(TestCase):
+    """Areas are served from the zone with the lowest current shortage ratio, re-prioritized as shortages accrue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.zones = [Zone.objects.create(name=name) for name in ('Central', 'East')]
+        # The open areas of Central and the restricted areas of East compete for the same constables
+        cls.open_areas = [Area.objects.create(zone=cls.zones[0], name=f'Open {i}', call_sign=f'Tiger-0{i}') for i in (1, 2)]
+        cls.restricted_areas = [Area.objects.create(zone=cls.zones[1], name=f'Restricted {i}', call_sign=f'Zebra-10{i}')
+                                for i in (1, 2)]
+        Deployment.objects.create(area=cls.open_areas[0], si_count=1, constable_count=2)  # No SI: Central runs short first
+        Deployment.objects.create(area=cls.open_areas[1], constable_count=2)
+        for area in cls.restricted_areas:
+            Deployment.objects.create(area=area, constable_count=2)
+        for i in range(4):
+            Policeman.objects.create(name=f'Officer {i}', belt_no=f'M{i}', rank='CONST')
+        for i in range(2):
+            Policeman.objects.create(name=f'Officer {i}', belt_no=f'F{i}', rank='CONST', gender='F')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lowest_shortage_ratio_is_served_first(self):
+        central, east = self.zones
+        areas = [(area, Deployment(constable_count=2)) for area in self.open_areas + self.restricted_areas]
+        shortages = defaultdict(int, {central.id: 1})
+        scheduler = ZoneShortageScheduler(areas, shortages)
+
+        order = []
+        for area, deployment in scheduler.iterate(areas):
+            order.append(area)
+            if area == self.restricted_areas[0]:
+                shortages[east.id] += 2  # East now has the higher ratio, Central is served next
+        self.assertEqual(order, [self.restricted_areas[0], self.open_areas[0], self.open_areas[1], self.restricted_areas[1]])
+
+    def test_fills_at_least_as_much_as_the_fixed_zone_order(self):
+        class FixedZoneOrder(ZoneShortageScheduler):
+            # The previous behaviour: zones sorted once by their ratio before the pass
+            def iterate(self, areas_with_deployments):
+                ratios = {zone_id: self.shortage_ratio(zone_id) for zone_id in self.zone_requirements}
+                return iter(sorted(areas_with_deployments, key=lambda x: (ratios[x[0].zone_id], x[0].zone_id)))
+
+        def filled(seed):
+            with contextlib.redirect_stdout(io.StringIO()):
+                return RosterGenerator(seed=seed).generate_roster().assignments.count()
+
+        scheduled, fixed = [], []
+        for seed in range(10):
+            scheduled.append(filled(seed))
+            with mock.patch('police_roster.management.commands.generate_roster.ZoneShortageScheduler', FixedZoneOrder):
+                fixed.append(filled(seed))
+        self.assertEqual(scheduled, [6] * 10)
+        self.assertTrue(all(a >= b for a, b in zip(scheduled, fixed)), (scheduled, fixed))
+        self.assertLess(sum(fixed), sum(scheduled))
+
+
+class UnfulfilledRequirementsTests(TestCase):
+    """Open slots are kept per area and rank and reported with the generated roster"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.areas = [Area.objects.create(zone=zone, name=f'Area {i}', call_sign=f'Tiger-0{i}') for i in range(3)]
+        Deployment.objects.create(area=cls.areas[0], si_count=2, constable_count=3, hgv_count=1)
+        Deployment.objects.create(area=cls.areas[1], constable_count=1)
+        Policeman.objects.create(name='Inspector', belt_no='S1', rank='SI')
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        cache.clear()
+        preview_cache.clear()
+
+    def test_index_aggregates_by_rank_and_area(self):
+        index = UnfulfilledRequirements()
+        index.update(self.areas[0], {'CONST': 2, 'HG': 1})
+        index.set(self.areas[1], 'CONST', 3)
+        index.set(self.areas[2], 'HG', 0)
+        self.assertEqual(index.totals(), {'CONST': 5, 'HG': 1})
+        self.assertEqual(index.open_areas('CONST'), self.areas[:2])
+        self.assertEqual(len(index), 2)
+
+        index.fill(self.areas[0].id, 'HG')
+        self.assertEqual(index.open_areas('HG'), [])
+        index.fill(self.areas[1].id, 'CONST', 2)
+        self.assertEqual(index.count(self.areas[1].id, 'CONST'), 1)
+        index.fill(self.areas[1].id, 'CONST')
+        self.assertEqual([item['area'] for item in index], [self.areas[0]])
+        self.assertEqual(index.totals(), {'CONST': 2})
+
+    def test_partial_si_fill_is_tracked_without_verbose(self):
+        generator = RosterGenerator(seed=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            events = {event['phase']: event for event in generator.iter_generate_roster()}
+        self.assertEqual(events['si']['shortages'], {'SI': 1})
+
+    def test_generated_roster_reports_unfulfilled_requirements(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = APIClient().post('/api/generate-roster/', {'name': 'Week 1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        unfulfilled = response.json()['roster']['unfulfilled_requirements']
+
+        by_area = {item['area_id']: {req['rank']: req['count'] for req in item['unfulfilled']}
+                   for item in unfulfilled['areas']}
+        self.assertEqual(set(by_area), {self.areas[0].id, self.areas[1].id})
+        self.assertEqual(by_area[self.areas[0].id]['HG'], 1)
+        self.assertEqual(sum(counts.get('CONST', 0) for counts in by_area.values()), 3)
+        totals = {item['rank']: item['count'] for item in unfulfilled['totals']}
+        self.assertEqual(totals['CONST'], 3)
+        self.assertEqual(totals['HG'], 1)
+        self.assertEqual(totals, {rank: sum(counts.get(rank, 0) for counts in by_area.values()) for rank in totals})
+
+
+class DriverMatchingTests(TestCase):
+    """Drivers are placed by maximum bipartite matching, never filling fewer slots than a greedy pass"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fills_the_slot_a_greedy_pass_leaves_empty(self):
+        zone = Zone.objects.create(name='Central')
+        open_area = Area.objects.create(zone=zone, name='Open', call_sign='Tiger-01')
+        restricted = Area.objects.create(zone=zone, name='Restricted', call_sign='Zebra-101')
+        for area in (open_area, restricted):
+            Deployment.objects.create(area=area, driver_count=1)
+        male = Policeman.objects.create(name='Driver', belt_no='D1', rank='CONST', is_driver=True)
+        female = Policeman.objects.create(name='Driver', belt_no='D2', rank='CONST', is_driver=True, gender='F')
+
+        # Greedy in area order: the open area takes the male driver and nobody may serve the restricted one
+        constraints = ConstraintSet.load()
+        remaining, greedy = [male, female], 0
+        for area in (open_area, restricted):
+            driver = next((d for d in remaining if constraints.allows(d, area)), None)
+            if driver:
+                remaining.remove(driver)
+                greedy += 1
+        self.assertEqual(greedy, 1)
+
+        for seed in range(5):
+            generator = RosterGenerator(seed=seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                roster = generator.generate_roster()
+            self.assertEqual(dict(roster.assignments.values_list('policeman_id', 'area_id')),
+                             {male.id: restricted.id, female.id: open_area.id})
+            self.assertEqual(generator.incomplete_assignments.totals(), {})
+
+    def test_long_augmenting_paths_do_not_recurse(self):
+        # Driver i may serve areas i and i+1 and takes area i; the last driver may only serve
+        # area 0 (or an area without driver slots), so placing it shifts every other driver
+        size = sys.getrecursionlimit() + 100
+        zone = Zone.objects.create(name='Central')
+        Area.objects.bulk_create([Area(zone=zone, name=f'Area {i}', call_sign=f'Tiger-{i}') for i in range(size + 1)])
+        areas = list(Area.objects.order_by('id'))
+        Policeman.objects.bulk_create([
+            Policeman(name=f'Driver {i}', belt_no=f'D{i}', rank='CONST', is_driver=True) for i in range(size)
+        ])
+        drivers = list(Policeman.objects.order_by('id'))
+        areas_with_deployments = [(area, Deployment(area=area, driver_count=0 if area == areas[-1] else 1))
+                                  for area in areas]
+
+        generator = RosterGenerator()
+        all_bits = (1 << len(areas)) - 1
+        generator.constraints.area_masks = {area.id: 1 << i for i, area in enumerate(areas)}
+        generator.constraints.officer_masks = {
+            driver.id: all_bits & ~((1 << i) | (1 << (i + 1))) for i, driver in enumerate(drivers[:-1])
+        }
+        generator.constraints.officer_masks[drivers[-1].id] = all_bits & ~(1 | (1 << size))
+
+        results = generator._match_drivers(areas_with_deployments, drivers, Roster.objects.create(name='Roster'))
+        placed = {assignment.policeman_id: assignment.area_id for assignment, slot in results}
+        self.assertEqual(len(placed), size)
+        self.assertEqual(placed[drivers[-1].id], areas[0].id)
+        self.assertEqual(placed[drivers[0].id], areas[1].id)
+
+
+class RosterListQueryBudgetTests(TestCase):
+    """Listing rosters must cost a fixed number of queries however many assignments they hold"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.areas = [Area.objects.create(zone=zone, name=f'Area {i}', call_sign=f'Tiger-{i:02d}') for i in range(5)]
+        cls.officers = [
+            Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST')
+            for i in range(40)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _create_roster(self, officers, **kwargs):
+        roster = Roster.objects.create(name='Roster', **kwargs)
+        RosterAssignment.objects.bulk_create([
+            RosterAssignment(roster=roster, area=self.areas[i % len(self.areas)], policeman=officer)
+            for i, officer in enumerate(officers)
+        ])
+        return roster
+
+    def test_detail_query_count_is_constant(self):
+        small = self._create_roster(self.officers[:10])
+        large = self._create_roster(self.officers)
+        for roster in (small, large):
+            with self.assertNumQueries(3):  # With the ETag's table state query
+                response = self.client.get(f'/api/rosters/{roster.id}/')
+            self.assertEqual(response.json()['assignments'][0]['zone_name'], 'Central')
+
+    def test_pending_and_active_query_count_is_constant(self):
+        for _ in range(3):
+            self._create_roster(self.officers, is_pending=True)
+            self._create_roster(self.officers, is_pending=False, is_active=True)
+
+        # Summaries with annotated counts; assignments come from the detail endpoint. The
+        # second query is the ETag's table state
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/rosters/pending/')
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(response.json()[0]['assignment_count'], len(self.officers))
+        self.assertNotIn('assignments', response.json()[0])
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/rosters/active/')
+        self.assertEqual(len(response.json()), 3)
+        self.assertTrue(all(not roster['is_pending'] for roster in response.json()))
+
+
+class RosterSummaryListingTests(TestCase):
+    """The roster listing returns paginated summaries; assignments have their own endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        area = Area.objects.create(zone=zone, name='Sector 17', call_sign='Tiger-01')
+        officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST') for i in range(5)]
+        cls.rosters = []
+        for i in range(3):
+            roster = Roster.objects.create(name=f'Roster {i}', is_pending=(i == 2), is_active=(i != 2))
+            RosterAssignment.objects.bulk_create([
+                RosterAssignment(roster=roster, area=area, policeman=officer) for officer in officers[:i + 2]
+            ])
+            cls.rosters.append(roster)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_returns_summaries(self):
+        with self.assertNumQueries(2):  # With the ETag's table state query
+            response = self.client.get('/api/rosters/')
+        results = response.json()['results']
+        self.assertEqual([r['name'] for r in results], ['Roster 2', 'Roster 1', 'Roster 0'])
+        self.assertEqual([r['assignment_count'] for r in results], [4, 3, 2])
+        self.assertNotIn('assignments', results[0])
+
+    def test_list_cursor_pagination_and_status(self):
+        response = self.client.get('/api/rosters/', {'page_size': 2})
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Roster 0'])
+
+        response = self.client.get('/api/rosters/', {'status': 'pending'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Roster 2'])
+
+    def test_assignments_endpoint_is_paginated(self):
+        roster = self.rosters[2]
+        response = self.client.get(f'/api/rosters/{roster.id}/assignments/', {'page_size': 3})
+        data = response.json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(data['results'][0]['area_name'], 'Sector 17')
+
+    def test_stats_counts_without_listing(self):
+        PreviousRoster.objects.create(name='Week 0', created_at=timezone.now(), roster_data={})
+        with self.assertNumQueries(5):  # With the ETag's table state query
+            response = self.client.get('/api/rosters/stats/')
+        self.assertEqual(response.json(), {'active': 2, 'pending': 1, 'previous': 1, 'active_assignments': 5})
+
+
+class PreviousRosterListingTests(TestCase):
+    """Archived roster listings return summaries; roster_data is only sent by the detail view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(zone=Zone.objects.create(name='Central'), name='Sector 17', call_sign='Tiger-01')
+        officers = [Policeman.objects.create(name=f'Officer {j}', belt_no=f'B{j}', rank='CONST') for j in range(50)]
+        cls.archives = []
+        for i in range(3):
+            archive = PreviousRoster.objects.create(
+                name=f'Archive {i}',
+                created_at=timezone.now(),
+                roster_data={'name': f'Archive {i}'},
+                unfulfilled_requirements={'ranks': {'CONST': i}}
+            )
+            archive.replace_assignments([{'policeman': o.id, 'area': area.id, 'rank': 'CONST'} for o in officers])
+            cls.archives.append(archive)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_returns_summaries(self):
+        response = self.client.get('/api/previous-rosters/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertNotIn('roster_data', results[0])
+        self.assertNotIn('assignments', results[0])
+
+    def test_detail_returns_roster_data_once(self):
+        response = self.client.get(f'/api/previous-rosters/{self.archives[0].id}/')
+        data = response.json()
+        self.assertEqual(len(data['roster_data']['assignments']), 50)
+        self.assertNotIn('assignments', data)
+
+
+class RosterExportTests(TestCase):
+    """Exports stream rows grouped by zone and area"""
+
+    @classmethod
+    def setUpTestData(cls):
+        north = Zone.objects.create(name='North')
+        south = Zone.objects.create(name='South')
+        areas = [Area.objects.create(zone=south, name='Sector 9', call_sign='Eagle-02'),
+                 Area.objects.create(zone=north, name='Sector 1', call_sign='Eagle-01')]
+        cls.roster = Roster.objects.create(name='Weekly')
+        for i, area in enumerate(areas):
+            officer = Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='HC')
+            RosterAssignment.objects.create(roster=cls.roster, area=area, policeman=officer)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_csv_export(self):
+        response = self.client.get(f'/api/rosters/{self.roster.id}/export/csv/')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Weekly.csv"')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['Zone', 'Area', 'Call Sign'])
+        self.assertEqual(lines[1].split(',')[:6], ['North', 'Sector 1', 'Eagle-01', 'Officer 1', 'B1', 'Head Constable'])
+        self.assertEqual(lines[2].split(',')[0], 'South')
+
+    def test_spreadsheet_export_has_sheet_per_zone(self):
+        response = self.client.get(f'/api/rosters/{self.roster.id}/export/xls/')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('<Worksheet ss:Name="North">', body)
+        self.assertIn('<Worksheet ss:Name="South">', body)
+        self.assertTrue(body.rstrip().endswith('</Workbook>'))
+
+    def test_truncated_zone_names_get_distinct_sheet_names(self):
+        roster = Roster.objects.create(name='Long zones')
+        for i in range(2):
+            zone = Zone.objects.create(name=f'Traffic Regulation Zone Chandigarh {i}')
+            area = Area.objects.create(zone=zone, name=f'Sector {i}', call_sign=f'Hawk-0{i}')
+            officer = Policeman.objects.create(name=f'Long {i}', belt_no=f'L{i}', rank='HC')
+            RosterAssignment.objects.create(roster=roster, area=area, policeman=officer)
+
+        response = self.client.get(f'/api/rosters/{roster.id}/export/xls/')
+        body = b''.join(response.streaming_content).decode()
+        names = re.findall(r'<Worksheet ss:Name="([^"]*)">', body)
+        self.assertEqual(names, ['Traffic Regulation Zone Chandig', 'Traffic Regulation Zone Cha (2)'])
+        self.assertTrue(all(len(name) <= 31 for name in names))
+
+    def test_zero_values_are_kept(self):
+        self.assertIn('<Data ss:Type="String">0</Data>', _xml_row(['Sector 1', 0]))
+        self.assertIn('<Data ss:Type="String"></Data>', _xml_row(['Sector 1', None]))
+
+
+class ReferenceDataCacheTests(TestCase):
+    """Reference data responses are served from the cache until a model change bumps the version"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.zone = Zone.objects.create(name='Central')
+        cls.area = Area.objects.create(zone=cls.zone, name='Sector 17', call_sign='Tiger-01')
+        Deployment.objects.create(area=cls.area, constable_count=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_repeated_requests_skip_the_database(self):
+        with file_cache():
+            for url in ('/api/zones/', '/api/areas/', '/api/policemen/', '/api/deployments/latest_by_area/'):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first.json(), second.json())
+
+    def test_model_changes_invalidate_cached_responses(self):
+        self.assertEqual(len(self.client.get('/api/areas/').json()), 1)
+        Area.objects.create(zone=self.zone, name='Sector 22', call_sign='Tiger-02')
+        self.assertEqual(len(self.client.get('/api/areas/').json()), 2)
+
+        self.zone.name = 'Central Zone'
+        self.zone.save()
+        self.assertEqual(self.client.get('/api/areas/').json()[0]['zone_name'], 'Central Zone')
+
+    def test_writes_by_other_processes_invalidate_cached_responses(self):
+        self.assertEqual(len(self.client.get('/api/areas/').json()), 1)
+        with self.assertNumQueries(1):  # The table states; the body comes from the cache
+            self.assertEqual(len(self.client.get('/api/areas/').json()), 1)
+
+        # Another process bumps its own per-process version, which this one never sees
+        with mock.patch('police_roster.caching.bump_data_version'):
+            Area.objects.create(zone=self.zone, name='Sector 22', call_sign='Tiger-02')
+        self.assertEqual(len(self.client.get('/api/areas/').json()), 2)
+
+        with mock.patch('police_roster.caching.bump_data_version'):
+            self.zone.name = 'Central Zone'
+            self.zone.save()
+        self.assertEqual(self.client.get('/api/areas/').json()[0]['zone_name'], 'Central Zone')
+
+    def test_query_strings_are_cached_separately(self):
+        Policeman.objects.create(name='Driver', belt_no='D1', rank='CONST', is_driver=True)
+        Policeman.objects.create(name='Walker', belt_no='W1', rank='HC')
+        self.assertEqual(len(self.client.get('/api/policemen/', {'rank': 'HC'}).json()), 1)
+        self.assertEqual(len(self.client.get('/api/policemen/').json()), 2)
+
+
+class ConditionalGetTests(TestCase):
+    """ETags come from data versions and a matching If-None-Match skips the view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.area = Area.objects.create(zone=zone, name='Sector 17', call_sign='Tiger-01')
+        cls.officer = Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+        cls.roster = Roster.objects.create(name='Weekly')
+        RosterAssignment.objects.create(roster=cls.roster, area=cls.area, policeman=cls.officer)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_matching_etag_returns_304_without_queries(self):
+        with file_cache():
+            for url in ('/api/zones/', '/api/areas/', '/api/policemen/', f'/api/rosters/{self.roster.id}/', '/api/previous-rosters/'):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_per_process_cache_checks_the_table_states(self):
+        url = f'/api/rosters/{self.roster.id}/'
+        etag = self.client.get(url)['ETag']
+        # One query for the table states of both scopes
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Writes by another process (a worker, confirm_roster) bump only that process's versions
+        with mock.patch('police_roster.caching.bump_data_version'):
+            call_command('confirm_roster', self.roster.id, action='save', verbosity=0)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_active'])
+
+        etag = response['ETag']
+        with mock.patch('police_roster.caching.bump_data_version'):
+            self.officer.name = 'Renamed'
+            self.officer.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_changes_produce_a_new_etag(self):
+        url = f'/api/rosters/{self.roster.id}/'
+        etag = self.client.get(url)['ETag']
+
+        RosterAssignment.objects.filter(roster=self.roster).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['assignments'], [])
+
+        # Roster payloads embed officer names, so reference data changes count too
+        etag = response['ETag']
+        self.officer.name = 'Renamed'
+        self.officer.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PreviousRosterImportTests(TestCase):
+    """Excel imports resolve every row from two lookup maps"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.areas = [Area.objects.create(zone=zone, name=f'Sector {i}', call_sign=f'Tiger-{i}') for i in range(4)]
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'{100 + i}', rank='CONST') for i in range(20)]
+        cls.archive = PreviousRoster.objects.create(name='Archive', created_at=timezone.now(), roster_data={})
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _rows(self, count):
+        return [{
+            'area_name': f'sector {i % 4}', 'zone_name': 'CENTRAL',
+            'policeman_name': f'officer {i}', 'belt_no': 100 + i,
+        } for i in range(count)]
+
+    def _put(self, rows):
+        return self.client.put(f'/api/update-previous-roster/{self.archive.id}/', {'assignments': rows}, format='json')
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.assertEqual(self._put(self._rows(3)).status_code, 200)
+        with CaptureQueriesContext(connection) as small:
+            self._put(self._rows(3))
+        with CaptureQueriesContext(connection) as large:
+            self._put(self._rows(20))
+        self.assertEqual(len(small), len(large))
+        self.archive.refresh_from_db()
+        assignments = self.archive.assignment_list()
+        self.assertEqual(len(assignments), 20)
+        self.assertEqual(assignments[5]['area'], self.areas[1].id)
+
+    def test_all_row_errors_are_reported(self):
+        rows = self._rows(3)
+        rows[0]['area_name'] = 'Nowhere'
+        rows[2]['belt_no'] = 999
+        response = self._put(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Area 'Nowhere'", response.json()['error'])
+        self.assertIn("belt no '999'", response.json()['error'])
+
+
+class ArchivedAssignmentTests(TestCase):
+    """Archived assignments live in their own table; corrigenda touch a single row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.areas = [Area.objects.create(zone=zone, name=f'Sector {i}', call_sign=f'Tiger-{i}') for i in range(2)]
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='HC') for i in range(3)]
+        roster = Roster.objects.create(name='Weekly')
+        for officer in cls.officers:
+            RosterAssignment.objects.create(roster=roster, area=cls.areas[0], policeman=officer)
+        cls.roster = roster
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_archive_stores_rows_and_keeps_the_api_shape(self):
+        from .serializers import RosterSerializer
+        archive = PreviousRoster.archive(self.roster, RosterSerializer(self.roster).data)
+        self.assertNotIn('assignments', archive.roster_data)
+        self.assertEqual(archive.archived_assignments.count(), 3)
+        self.assertEqual(archive.archived_assignments.first().zone.name, 'Central')
+
+        data = self.client.get(f'/api/previous-rosters/{archive.id}/').json()
+        self.assertEqual(len(data['roster_data']['assignments']), 3)
+        self.assertEqual(data['roster_data']['assignments'][0]['policeman_rank'], 'Head Constable')
+
+    def test_corrigendum_updates_one_row(self):
+        from .serializers import RosterSerializer
+        archive = PreviousRoster.archive(self.roster, RosterSerializer(self.roster).data)
+        officer = self.officers[1]
+        response = self.client.post(f'/api/corrigendum-changes/{archive.id}/',
+                                    {'policeman_id': officer.id, 'area_id': self.areas[1].id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(archive.archived_assignments.count(), 3)
+        self.assertEqual(archive.archived_assignments.get(policeman=officer).area, self.areas[1])
+
+        change_id = response.json()['id']
+        self.client.delete(f'/api/corrigendum-changes/{archive.id}/{change_id}/')
+        self.assertFalse(archive.archived_assignments.filter(policeman=officer).exists())
+
+
+class BatchCorrigendumTests(TestCase):
+    """Batch corrigenda are validated up front and applied in one transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        cls.areas = [Area.objects.create(zone=zone, name=f'Sector {i}', call_sign=f'Tiger-{i}') for i in range(3)]
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST') for i in range(10)]
+        cls.archive = PreviousRoster.objects.create(name='Archive', created_at=timezone.now(), roster_data={})
+        cls.archive.replace_assignments([{'policeman': o.id, 'area': cls.areas[0].id} for o in cls.officers[:5]])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = f'/api/corrigendum-changes/{self.archive.id}/batch/'
+
+    def test_applies_all_changes(self):
+        changes = [{'policeman_id': o.id, 'area_id': self.areas[1].id, 'notes': 'swap'} for o in self.officers[3:8]]
+        changes.append({'policeman_id': self.officers[3].id, 'area_id': self.areas[2].id})
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, {'changes': changes}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual(CorrigendumChange.objects.filter(roster=self.archive).count(), 6)
+
+        rows = {row.policeman_id: row.area_id for row in self.archive.archived_assignments.all()}
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[self.officers[0].id], self.areas[0].id)
+        self.assertEqual(rows[self.officers[3].id], self.areas[2].id)
+        self.assertEqual(rows[self.officers[7].id], self.areas[1].id)
+
+    def test_invalid_changes_apply_nothing(self):
+        changes = [
+            {'policeman_id': self.officers[0].id, 'area_id': self.areas[1].id},
+            {'policeman_id': 9999, 'area_id': self.areas[1].id},
+            {'policeman_id': self.officers[1].id, 'area_id': 'x'},
+        ]
+        response = self.client.post(self.url, {'changes': changes}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['details']), 2)
+        self.assertFalse(CorrigendumChange.objects.exists())
+        self.assertEqual(self.archive.archived_assignments.get(policeman=self.officers[0]).area, self.areas[0])
+
+
+class RosterDiffTests(TestCase):
+    """The diff endpoint returns only what changed between two rosters of either kind"""
+
+    @classmethod
+    def setUpTestData(cls):
+        north = Zone.objects.create(name='North')
+        south = Zone.objects.create(name='South')
+        cls.areas = [Area.objects.create(zone=north, name='N1', call_sign='N-1'),
+                     Area.objects.create(zone=north, name='N2', call_sign='N-2'),
+                     Area.objects.create(zone=south, name='S1', call_sign='S-1')]
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST') for i in range(5)]
+
+        cls.archive = PreviousRoster.objects.create(name='Last week', created_at=timezone.now(), roster_data={},
+                                                    repetition_count=1)
+        cls.archive.replace_assignments([{'policeman': cls.officers[i].id, 'area': cls.areas[0].id} for i in range(4)])
+
+        cls.roster = Roster.objects.create(name='This week', repetition_count=3)
+        placements = {0: 0, 1: 1, 2: 2, 4: 0}  # 0 stays, 1 moves within the zone, 2 changes zone, 3 leaves, 4 joins
+        for officer_index, area_index in placements.items():
+            RosterAssignment.objects.create(roster=cls.roster, policeman=cls.officers[officer_index],
+                                            area=cls.areas[area_index])
+
+    def test_diff_between_archive_and_roster(self):
+        response = self.client.get('/api/rosters/diff/', {'a': f'previous:{self.archive.id}', 'b': f'roster:{self.roster.id}'})
+        data = response.json()
+        self.assertEqual([o['policeman'] for o in data['added']], [self.officers[4].id])
+        self.assertEqual([o['policeman'] for o in data['removed']], [self.officers[3].id])
+        moved = {o['policeman']: o for o in data['moved']}
+        self.assertEqual(set(moved), {self.officers[1].id, self.officers[2].id})
+        self.assertFalse(moved[self.officers[1].id]['zone_changed'])
+        self.assertTrue(moved[self.officers[2].id]['zone_changed'])
+        self.assertEqual(moved[self.officers[2].id]['to_area']['name'], 'S1')
+        self.assertEqual(data['unchanged_count'], 1)
+        self.assertEqual(data['repetition_change'], {'zone': 2, 'area': 0})
+
+    def test_invalid_and_missing_sources(self):
+        self.assertEqual(self.client.get('/api/rosters/diff/', {'a': 'bogus:1', 'b': '1'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/rosters/diff/', {'a': 'previous:999', 'b': str(self.roster.id)}).status_code, 404)
+
+
+class OfficerSearchTests(TestCase):
+    """Officer search uses the FTS5 index for prefix matches on name, belt number and rank"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gurmeet = Policeman.objects.create(name='Gurmeet Singh', belt_no='3469', rank='ASI')
+        cls.shiv = Policeman.objects.create(name='Shiv Kumar', belt_no='3484', rank='SI')
+        cls.joginder = Policeman.objects.create(name='Joginder Singh', belt_no='1201', rank='CONST')
+
+    def setUp(self):
+        cache.clear()
+
+    def typeahead(self, q):
+        return [officer['id'] for officer in self.client.get('/api/policemen/typeahead/', {'q': q}).json()]
+
+    def test_prefix_and_token_matching(self):
+        self.assertTrue(index_available())
+        self.assertEqual(set(self.typeahead('sin')), {self.gurmeet.id, self.joginder.id})
+        self.assertEqual(self.typeahead('gur sing'), [self.gurmeet.id])
+        self.assertEqual(self.typeahead('348'), [self.shiv.id])
+        self.assertEqual(set(self.typeahead('sub insp')), {self.gurmeet.id, self.shiv.id})
+        self.assertEqual(self.typeahead('assistant'), [self.gurmeet.id])
+        self.assertEqual(self.typeahead('urmeet'), [])
+        self.assertEqual(self.typeahead(''), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.shiv.name = 'Shivam Kumar'
+        self.shiv.save()
+        self.assertEqual(self.typeahead('shivam'), [self.shiv.id])
+        self.joginder.delete()
+        self.assertEqual(self.typeahead('joginder'), [])
+
+    def test_list_search_uses_index(self):
+        response = self.client.get('/api/policemen/', {'search': 'singh 34'})
+        self.assertEqual([officer['id'] for officer in response.json()], [self.gurmeet.id])
+
+
+class QueryPlanTests(TestCase):
+    """The hot lookups must be served by their indexes (EXPLAIN QUERY PLAN), never by full table scans"""
+
+    def assertIndexed(self, queryset, index):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {index}\b', plan)
+        self.assertNotRegex(plan, r'(?m)SCAN police_roster_\w+$', plan)
+        if queryset.query.order_by:
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_latest_deployment_per_area(self):
+        area = Area(id=1)
+        self.assertIndexed(area.deployments.order_by('-created_at')[:1], 'deployment_area_latest')
+
+    def test_assignments_by_roster_and_area(self):
+        self.assertIndexed(RosterAssignment.objects.filter(roster_id=1, area_id=1), 'assignment_roster_area')
+
+    def test_field_duty_pool(self):
+        self.assertIndexed(Policeman.objects.filter(preferred_duty='FIELD', has_fixed_duty=False, rank='SI'),
+                           'policeman_duty_pool')
+
+    def test_pending_and_active_roster_lists(self):
+        self.assertIndexed(Roster.objects.filter(is_pending=True).order_by('-created_at', '-id'),
+                           'roster_pending_recent')
+        self.assertIndexed(Roster.objects.filter(is_active=True, is_pending=False).order_by('-created_at', '-id'),
+                           'roster_active_recent')
+
+    def test_corrigendum_changes_of_archive(self):
+        self.assertIndexed(CorrigendumChange.objects.filter(roster_id=1), 'corrigendum_roster_recent')
+
+    def test_latest_previous_roster(self):
+        self.assertIndexed(PreviousRoster.objects.order_by('-created_at')[:1], 'previous_roster_recent')
+
+
+class SqliteProfileTests(TestCase):
+    """The connection_created hook applies SQLITE_PRAGMAS to new connections"""
+
+    def test_pragmas_applied(self):
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234}):
+            configure_sqlite(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    def test_benchmark_readers_back_off_while_locked(self):
+        from .management.commands.benchmark_concurrent_reads import Command
+        command = Command()
+        stop, latencies, errors = threading.Event(), [], []
+        with mock.patch.object(Command, 'read_once', side_effect=OperationalError('database is locked')):
+            reader = threading.Thread(target=command.reader, args=(stop, latencies, errors))
+            reader.start()
+            time.sleep(0.3)
+            stop.set()
+            reader.join()
+        # 10, 20, 40, 80, 160ms waits: a handful of attempts rather than a spin
+        self.assertLessEqual(len(errors), 8)
+        self.assertEqual(latencies, [])
+
+
+class MetricsTests(TestCase):
+    """Requests and generations are counted and served in Prometheus format at /api/_metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        area = Area.objects.create(zone=zone, name='N1', call_sign='N-1')
+        Deployment.objects.create(area=area, constable_count=2)
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_request_metrics(self):
+        self.client.get('/api/zones/')
+        self.client.get('/api/zones/')
+        body = self.client.get('/api/_metrics').content.decode()
+        self.assertIn('roster_http_requests_total{view="zone-list",method="GET",status="200"} 2', body)
+        self.assertIn('roster_http_request_duration_seconds_count{view="zone-list",method="GET"} 2', body)
+        self.assertIn('roster_http_request_duration_seconds_bucket{view="zone-list",method="GET",le="+Inf"} 2', body)
+        # The second request is answered from the response cache without SQL
+        self.assertRegex(body, r'roster_http_sql_queries_total\{view="zone-list",method="GET"\} [1-9]')
+
+    def test_generation_metrics(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            RosterGenerator().generate_roster()
+        body = self.client.get('/api/_metrics').content.decode()
+        self.assertIn('roster_generations_total 1', body)
+        self.assertIn('roster_generation_assignments_total 1', body)
+        self.assertIn('roster_generation_unfulfilled_slots_total{rank="CONST"} 1', body)
+
+    def test_remote_scrapes_are_refused(self):
+        self.assertEqual(self.client.get('/api/_metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+
+
+class IdempotentRosterActionTests(TestCase):
+    """Generate and confirm honour Idempotency-Key, and confirming archives a roster exactly once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        area = Area.objects.create(zone=zone, name='N1', call_sign='N-1')
+        Deployment.objects.create(area=area, constable_count=1)
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, url, data, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post(url, data, format='json', **headers)
+
+    def test_generate_replays_stored_result(self):
+        first = self.post('/api/generate-roster/', {'name': 'Week 1'}, key='abc')
+        replay = self.post('/api/generate-roster/', {'name': 'Week 1'}, key='abc')
+        self.assertEqual(Roster.objects.count(), 1)
+        self.assertEqual(replay.status_code, first.status_code)
+        self.assertEqual(replay.json()['roster']['id'], first.json()['roster']['id'])
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.post('/api/generate-roster/', {'name': 'Week 2'}, key='abc').status_code, 422)
+
+    def test_confirm_archives_once(self):
+        roster_id = self.post('/api/generate-roster/', {}).json()['roster']['id']
+        first = self.post(f'/api/confirm-roster/{roster_id}/', {'action': 'save', 'name': 'Final'})
+        second = self.post(f'/api/confirm-roster/{roster_id}/', {'action': 'save', 'name': 'Final'})
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(PreviousRoster.objects.count(), 1)
+        previous = PreviousRoster.objects.get()
+        self.assertEqual(previous.name, 'Final')
+        self.assertEqual(previous.archived_assignments.count(), 1)
+        roster = Roster.objects.get(id=roster_id)
+        self.assertEqual((roster.name, roster.is_active, roster.is_pending), ('Final', True, False))
+
+    def test_single_flight_shares_one_call(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'roster'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+        follower.start()
+        while not flight.calls['key'].waiters:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('roster', False), ('roster', True)])
+
+
+class PreviewCacheTests(TestCase):
+    """Seeded previews of unchanged inputs reuse the pending roster instead of regenerating"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        area = Area.objects.create(zone=zone, name='N1', call_sign='N-1')
+        cls.deployment = Deployment.objects.create(area=area, constable_count=1)
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        cache.clear()
+        preview_cache.clear()
+
+    def generate(self, **data):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post('/api/generate-roster/', data, format='json').json()['roster']['id']
+
+    def test_seeded_preview_is_reused_until_inputs_change(self):
+        first = self.generate(seed=7)
+        self.assertEqual(self.generate(seed=7), first)
+        self.assertEqual(Roster.objects.count(), 1)
+        self.assertNotEqual(self.generate(seed=8), first)
+
+        self.deployment.constable_count = 2
+        self.deployment.save()
+        self.assertNotEqual(self.generate(seed=7), first)
+
+    def test_unseeded_and_confirmed_previews_are_regenerated(self):
+        self.assertNotEqual(self.generate(), self.generate())
+        first = self.generate(seed=7)
+        Roster.objects.filter(id=first).update(is_pending=False, is_active=True)
+        self.assertNotEqual(self.generate(seed=7), first)
+
+    def test_fingerprint_tracks_officer_edits(self):
+        before = input_fingerprint()
+        self.assertEqual(input_fingerprint(), before)
+        officer = Policeman.objects.get()
+        officer.rank = 'HC'
+        officer.save()
+        self.assertNotEqual(input_fingerprint(), before)
+
+    def test_unversioned_fingerprint_tracks_in_place_edits(self):
+        # Other processes only see the table states, so every input table must reflect edits
+        officer = Policeman.objects.get()
+        area = Area.objects.get()
+        for instance, field, value in [(officer, 'rank', 'HC'), (area, 'call_sign', 'N-2'), (area.zone, 'name', 'East')]:
+            before = input_fingerprint(versioned=False)
+            setattr(instance, field, value)
+            instance.save()
+            self.assertNotEqual(input_fingerprint(versioned=False), before, field)
+
+
+class GenerationSnapshotTests(TestCase):
+    """Generation inputs are loaded once and reused until a generation input changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        cls.areas = [Area.objects.create(zone=zone, name=f'N{i}', call_sign=f'N-{i}') for i in range(2)]
+        cls.deployment = Deployment.objects.create(area=cls.areas[0], constable_count=2)
+        cls.officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='CONST') for i in range(3)]
+        cls.previous = PreviousRoster.objects.create(name='Week 0', created_at=timezone.now(), roster_data={})
+
+    def setUp(self):
+        cache.clear()
+
+    def generate(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return RosterGenerator(seed=1).generate_roster()
+
+    def test_snapshot_is_reused_across_runs(self):
+        snapshot = get_snapshot()
+        self.generate()
+        self.generate()
+        self.assertIs(get_snapshot(), snapshot)
+
+    def test_field_officers_do_not_depend_on_row_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = get_snapshot()
+        officer_queries = [q['sql'] for q in queries if 'FROM "police_roster_policeman" WHERE' in q['sql']]
+        self.assertTrue(officer_queries)
+        self.assertTrue(all('ORDER BY "police_roster_policeman"."id" ASC' in sql for sql in officer_queries))
+        self.assertEqual([o.id for o in snapshot.field_officers], sorted(o.id for o in self.officers))
+
+    def test_shared_cache_hit_needs_no_queries(self):
+        with file_cache():
+            snapshot = get_snapshot()
+            with self.assertNumQueries(0):
+                self.assertIs(get_snapshot(), snapshot)
+
+    def test_changes_made_by_another_process_rebuild_the_snapshot(self):
+        snapshot = get_snapshot()
+        # Another process bumps its own per-process data version, not ours
+        with mock.patch('police_roster.caching.bump_data_version'):
+            self.deployment.constable_count = 1
+            self.deployment.save()
+            officer = self.officers[2]
+            officer.preferred_duty = 'STATIC'
+            officer.save()
+        rebuilt = get_snapshot()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.areas_with_deployments[0][1].constable_count, 1)
+        self.assertNotIn(officer, rebuilt.field_officers)
+
+    def test_snapshot_is_rebuilt_after_input_changes(self):
+        snapshot = get_snapshot()
+        self.deployment.constable_count = 1
+        self.deployment.save()
+        rebuilt = get_snapshot()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.areas_with_deployments[0][1].constable_count, 1)
+
+        CorrigendumChange.objects.create(roster=self.previous, policeman=self.officers[0], area=self.areas[1])
+        self.assertEqual(get_snapshot().previous_assignments, {self.officers[0].id: (self.areas[1].zone_id, self.areas[1].id)})
+
+    def test_runs_do_not_modify_the_shared_deployments(self):
+        ForcedAssignment.objects.create(policeman=self.officers[0], area=self.areas[0])
+        self.assertEqual(self.generate().assignments.count(), 2)
+        self.assertEqual(get_snapshot().areas_with_deployments[0][1].constable_count, 2)
+        self.assertEqual(self.generate().assignments.count(), 2)
+
+
+class GenerationStreamTests(TestCase):
+    """Roster generation progress is streamed as server-sent events, one per phase"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        area = Area.objects.create(zone=zone, name='N1', call_sign='N-1')
+        Deployment.objects.create(area=area, si_count=1, constable_count=3)
+        Policeman.objects.create(name='Inspector', belt_no='S1', rank='SI')
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        preview_cache.clear()
+
+    @staticmethod
+    def parse(chunks):
+        events = []
+        for block in b''.join(chunks).decode().strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    def test_stream_reports_each_phase_then_the_roster(self):
+        response = self.client.get('/api/generate-roster/stream/', {'name': 'Week 1'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.parse(response.streaming_content)
+
+        progress = [data for event, data in events if event == 'progress']
+        self.assertEqual([data['phase'] for data in progress], list(RosterGenerator.PHASES))
+        self.assertEqual(progress[0]['required']['CONST'], 3)
+        self.assertEqual(progress[-1]['assigned'], 2)
+        self.assertEqual(progress[-1]['shortages']['CONST'], 2)
+
+        event, done = events[-1]
+        self.assertEqual(event, 'done')
+        self.assertEqual(done['assignments'], 2)
+        self.assertTrue(Roster.objects.get(id=done['roster'], name='Week 1').is_pending)
+
+    def test_disconnecting_abandons_the_partial_roster(self):
+        response = self.client.get('/api/generate-roster/stream/')
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        next(chunks)
+        self.assertEqual(Roster.objects.count(), 1)
+        response.close()
+        self.assertEqual(Roster.objects.count(), 0)
+
+    def test_reconnecting_with_the_same_key_replays_the_roster(self):
+        params = {'name': 'Week 1', 'idempotency_key': 'generate-1'}
+        first = self.parse(self.client.get('/api/generate-roster/stream/', params).streaming_content)[-1]
+        self.assertEqual(first[0], 'done')
+
+        response = self.client.get('/api/generate-roster/stream/', params)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.parse(response.streaming_content), [first])
+        self.assertEqual(Roster.objects.count(), 1)
+
+        # The key may come as a header as well, but only with the same parameters
+        response = self.client.get('/api/generate-roster/stream/', {'name': 'Week 2'}, HTTP_IDEMPOTENCY_KEY='generate-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Roster.objects.count(), 1)
+
+    def test_concurrent_streams_share_one_generation(self):
+        leader = self.client.get('/api/generate-roster/stream/', {'name': 'Week 1'})
+        chunks = iter(leader.streaming_content)
+        next(chunks)
+        follower = self.client.get('/api/generate-roster/stream/', {'name': 'Week 1'})
+        self.assertEqual(follower['Idempotent-Replayed'], 'true')
+
+        done = self.parse(chunks)[-1]
+        self.assertEqual(done[0], 'done')
+        self.assertEqual(self.parse(follower.streaming_content), [done])
+        self.assertEqual(Roster.objects.count(), 1)
+        self.assertEqual(single_flight.calls, {})
+
+    def test_unread_stream_releases_its_generation(self):
+        self.client.get('/api/generate-roster/stream/', {'name': 'Week 1'}).close()
+        self.assertEqual(single_flight.calls, {})
+        self.assertEqual(Roster.objects.count(), 0)
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/generate-roster/stream/', {'seed': -1}).status_code, 400)
+
+    def test_event_source_accept_header_is_served(self):
+        # EventSource always sends this Accept header
+        response = self.client.get('/api/generate-roster/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: progress\n', body)
+        self.assertEqual(self.parse([body.encode()])[-1][0], 'done')
+
+        response = self.client.get('/api/generate-roster/stream/', {'seed': -1}, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.content.decode().startswith('event: error\n'))
+
+
+class PregenerationTests(TestCase):
+    """Off-peak pre-generation keeps one up-to-date pending roster per day"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='North')
+        area = Area.objects.create(zone=zone, name='N1', call_sign='N-1')
+        cls.deployment = Deployment.objects.create(area=area, constable_count=1)
+        Policeman.objects.create(name='Officer', belt_no='B1', rank='CONST')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        state = override_settings(ROSTER_PREGENERATE_STATE=f'{directory.name}/pregenerate.json')
+        state.enable()
+        self.addCleanup(state.disable)
+        self.date = datetime.date(2025, 4, 26)
+
+    def test_next_run_time(self):
+        at = datetime.time(2, 0)
+        now = timezone.make_aware(datetime.datetime(2025, 4, 25, 1, 30))
+        self.assertEqual(next_run_time(at, now), timezone.make_aware(datetime.datetime(2025, 4, 25, 2, 0)))
+        now = timezone.make_aware(datetime.datetime(2025, 4, 25, 2, 0))
+        self.assertEqual(next_run_time(at, now), timezone.make_aware(datetime.datetime(2025, 4, 26, 2, 0)))
+
+    def test_pending_roster_is_kept_until_inputs_change(self):
+        first = pregenerate(self.date)
+        self.assertEqual(first['status'], 'generated')
+        roster = Roster.objects.get(id=first['roster'])
+        self.assertEqual((roster.name, roster.is_pending), ('Roster 2025-04-26', True))
+        self.assertEqual(pregenerate(self.date)['status'], 'up-to-date')
+
+        self.deployment.constable_count = 2
+        self.deployment.save()
+        second = pregenerate(self.date)
+        self.assertEqual((second['status'], second['replaced']), ('generated', first['roster']))
+        self.assertFalse(Roster.objects.filter(id=first['roster']).exists())
+        self.assertEqual([run['roster'] for run in load_state()['runs']], [first['roster'], second['roster']])
+
+        Roster.objects.filter(id=second['roster']).update(is_pending=False, is_active=True)
+        self.assertEqual(pregenerate(self.date)['status'], 'confirmed')
+
+    def test_warming_fills_the_response_cache(self):
+        client = APIClient()
+        with file_cache():
+            pregenerate(self.date)
+            warmed = {}
+            for path in [endpoint[3] for endpoint in WARM_ENDPOINTS]:
+                with self.assertNumQueries(0):
+                    warmed[path] = client.get(path).json()
+            # The warmed entries match what the views build themselves
+            cache.clear()
+            for path, data in warmed.items():
+                self.assertEqual(client.get(path).json(), data, path)
+            self.assertEqual(len(warmed['/api/policemen/field_officers/']), 1)
+
+    def test_command_requires_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, 'ROSTER_CACHE_DIR'):
+            call_command('pregenerate_roster', '--once')
+        self.assertFalse(Roster.objects.exists())
+
+        with file_cache():
+            out = io.StringIO()
+            call_command('pregenerate_roster', '--once', stdout=out)
+        self.assertIn('caches warmed', out.getvalue())
+        self.assertTrue(Roster.objects.filter(is_pending=True).exists())
+
+    def test_concurrent_run_is_skipped(self):
+        with file_lock(f'{settings.ROSTER_PREGENERATE_STATE}.lock'):
+            self.assertEqual(pregenerate(self.date)['status'], 'locked')
+        self.assertFalse(Roster.objects.exists())
+
+
+class CompactArchiveTests(TestCase):
+    """Archive headers are stored compactly and read back unchanged"""
+
+    @classmethod
+    def setUpTestData(cls):
+        zone = Zone.objects.create(name='Central')
+        area = Area.objects.create(zone=zone, name='Sector 1', call_sign='Tiger-1')
+        officers = [Policeman.objects.create(name=f'Officer {i}', belt_no=f'B{i}', rank='HC') for i in range(3)]
+        cls.roster = Roster.objects.create(name='Weekly', unfulfilled_requirements={
+            'areas': [{'area_id': area.id, 'area_name': 'Sector 1', 'zone_name': 'Central',
+                       'unfulfilled': [{'rank': 'SI', 'display': 'Sub Inspector', 'count': 1}]}],
+            'reserved': {'officers': [{'rank': 'HC', 'display': 'Head Constable', 'count': 3, 'officers': [
+                {'id': officer.id, 'name': officer.name, 'belt_no': officer.belt_no, 'is_driver': False}
+                for officer in officers
+            ]}]},
+        })
+        RosterAssignment.objects.create(roster=cls.roster, area=area, policeman=officers[0])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def stored(self, archive):
+        table = PreviousRoster._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT roster_data, unfulfilled_requirements FROM {table} WHERE id = %s', [archive.id])
+            return [json.loads(text) for text in cursor.fetchone()]
+
+    def test_encoding_round_trips(self):
+        value = {'rows': [{'rank': 'HC', 'name': f'Officer {i}', 'extra': {'n': i}} for i in range(20)], 'n': None}
+        for compress in (False, True):
+            encoded = encode(value, compress=compress)
+            self.assertTrue(is_compact(encoded))
+            self.assertLess(len(json.dumps(encoded)), len(json.dumps(value)))
+            self.assertEqual(decode(encoded), value)
+        self.assertEqual(encode({'id': 1}), {'id': 1})  # Not worth encoding
+        self.assertEqual(decode({'id': 1}), {'id': 1})
+
+    def test_archives_are_stored_compact_and_read_transparently(self):
+        from .serializers import RosterSerializer
+        archive = PreviousRoster.archive(self.roster, RosterSerializer(self.roster).data)
+        roster_data, unfulfilled = self.stored(archive)
+        self.assertNotIn('unfulfilled_requirements', roster_data)
+        self.assertTrue(is_compact(unfulfilled))
+
+        archive = PreviousRoster.objects.get(id=archive.id)
+        self.assertEqual(archive.unfulfilled_requirements, self.roster.unfulfilled_requirements)
+        data = self.client.get(f'/api/previous-rosters/{archive.id}/').json()
+        self.assertEqual(data['unfulfilled_requirements'], self.roster.unfulfilled_requirements)
+        self.assertNotIn('unfulfilled_requirements', data['roster_data'])
+        self.assertEqual(data['roster_data']['name'], 'Weekly')
+
+    def test_compaction_command_rewrites_plain_archives(self):
+        from .serializers import RosterSerializer
+        archive = PreviousRoster.archive(self.roster, RosterSerializer(self.roster).data)
+        # Store it as older versions did: plain JSON, the header repeating the requirements
+        header = dict(RosterSerializer(self.roster).data)
+        header.pop('assignments')
+        PreviousRoster.objects.filter(id=archive.id).update(
+            roster_data=Value(header, output_field=models.JSONField()),
+            unfulfilled_requirements=Value(self.roster.unfulfilled_requirements, output_field=models.JSONField())
+        )
+        before = self.client.get(f'/api/previous-rosters/{archive.id}/').json()
+
+        version = get_data_version(GENERATION_INPUTS)
+        out = io.StringIO()
+        call_command('compact_archives', stdout=out)
+        self.assertIn('Rewrote 1 of 1 archives', out.getvalue())
+        self.assertNotEqual(get_data_version(GENERATION_INPUTS), version)
+        self.assertIn('saved', out.getvalue())
+        roster_data, unfulfilled = self.stored(archive)
+        self.assertNotIn('unfulfilled_requirements', roster_data)
+        self.assertTrue(is_compact(unfulfilled))
+        self.assertEqual(self.client.get(f'/api/previous-rosters/{archive.id}/').json(), before)
+
+        call_command('compact_archives', expand=True, stdout=io.StringIO())
+        self.assertFalse(any(is_compact(value) for value in self.stored(archive)))
+        self.assertEqual(self.client.get(f'/api/previous-rosters/{archive.id}/').json(), before)
@@ -3,6 +3,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
+from .metrics import metrics_view
 
 router = DefaultRouter()
 router.register(r'zones', views.ZoneViewSet)
@@ -11,12 +12,14 @@ router.register(r'policemen', views.PolicemanViewSet)
 router.register(r'deployments', views.DeploymentViewSet)
 router.register(r'rosters', views.RosterViewSet)
 router.register(r'previous-rosters', views.PreviousRosterViewSet)
+router.register(r'forced-assignments', views.ForcedAssignmentViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     
     # Roster generation and management
     path('generate-roster/', views.GenerateRosterView.as_view(), name='generate-roster'),
+    path('generate-roster/stream/', views.GenerateRosterStreamView.as_view(), name='generate-roster-stream'),
     path('confirm-roster/<int:roster_id>/', views.ConfirmRosterView.as_view(), name='confirm-roster'),
     
     # New endpoints for deleting rosters
@@ -29,4 +32,8 @@ urlpatterns = [
     # Deployment statistics
     path('corrigendum-changes/<int:roster_id>/', views.CorrigendumChangeView.as_view(), name='corrigendum-changes'),
     path('corrigendum-changes/<int:roster_id>/<int:change_id>/', views.CorrigendumChangeView.as_view(), name='delete-corrigendum-change'),
+    path('corrigendum-changes/<int:roster_id>/batch/', views.BatchCorrigendumChangeView.as_view(), name='batch-corrigendum-changes'),
+    
+    # Prometheus metrics (local scrapes only)
+    path('_metrics', metrics_view, name='metrics'),
 ]
@@ -3,33 +3,53 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.management import call_command
 import json
 import logging
 
 from .models import (
     Zone, Area, Policeman, Deployment, 
-    Roster, RosterAssignment, PreviousRoster, CorrigendumChange
+    Roster, RosterAssignment, PreviousRoster, CorrigendumChange, ForcedAssignment,
+    ArchivedAssignment
 )
 from .serializers import (
     ZoneSerializer, AreaSerializer, PolicemanSerializer,
     DeploymentSerializer, RosterSerializer, RosterAssignmentSerializer,
     PreviousRosterSerializer, RosterGenerationRequestSerializer,
-    RosterActionSerializer, RosterCreateSerializer, CorrigendumChangeSerializer
+    RosterActionSerializer, RosterCreateSerializer, CorrigendumChangeSerializer,
+    ForcedAssignmentSerializer, RosterSummarySerializer, PreviousRosterSummarySerializer
 )
+from .pagination import RosterCursorPagination, AssignmentPagination
+from .exports import export_response, roster_rows, previous_roster_rows
+from .diff import parse_source, diff_rosters
+from .search import OfficerSearchFilter, typeahead, TYPEAHEAD_LIMIT, MAX_TYPEAHEAD_LIMIT
+from .caching import VersionedCacheMixin, ConditionalGetMixin, REFERENCE, ROSTERS
+from .idempotency import (
+    IdempotentPostMixin, IDEMPOTENCY_TIMEOUT, REPLAY_HEADER, idempotency_cache_key, request_fingerprint, single_flight
+)
+from .previews import input_fingerprint, preview_cache
+from .snapshot import get_snapshot
+from .streaming import (
+    sse_event, event_stream_response, generation_events, roster_summary, ClosingEvents, EventStreamRenderer
+)
+from .management.commands.generate_roster import RosterGenerator
 
 logger = logging.getLogger(__name__)
 
-class ZoneViewSet(viewsets.ModelViewSet):
+class ZoneViewSet(VersionedCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Zone.objects.all()
     serializer_class = ZoneSerializer
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['name']
+    cached_actions = ('list', 'retrieve', 'areas')
     
     @action(detail=True, methods=['get'])
     def areas(self, request, pk=None):
@@ -39,12 +59,13 @@ class ZoneViewSet(viewsets.ModelViewSet):
         serializer = AreaSerializer(areas, many=True)
         return Response(serializer.data)
 
-class AreaViewSet(viewsets.ModelViewSet):
-    queryset = Area.objects.all()
+class AreaViewSet(VersionedCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Area.objects.select_related('zone')
     serializer_class = AreaSerializer
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['name', 'call_sign']
     filterset_fields = ['zone']
+    cached_actions = ('list', 'retrieve', 'deployments')
     
     @action(detail=True, methods=['get'])
     def deployments(self, request, pk=None):
@@ -54,18 +75,31 @@ class AreaViewSet(viewsets.ModelViewSet):
         serializer = DeploymentSerializer(deployments, many=True)
         return Response(serializer.data)
 
-class PolicemanViewSet(viewsets.ModelViewSet):
+class PolicemanViewSet(VersionedCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Policeman.objects.all()
     serializer_class = PolicemanSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
-    search_fields = ['name', 'belt_no']
+    filter_backends = [OfficerSearchFilter, DjangoFilterBackend]
+    search_fields = ['name', 'belt_no', 'rank']
     filterset_fields = ['rank', 'is_driver', 'preferred_duty', 'gender', 'has_fixed_duty']
+    cached_actions = ('list', 'retrieve', 'drivers', 'by_rank', 'field_officers', 'typeahead')
+    
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        """Compact prefix matches on name, belt number and rank: ?q=<term>&limit=<n>"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', TYPEAHEAD_LIMIT)), 1), MAX_TYPEAHEAD_LIMIT)
+        except ValueError:
+            limit = TYPEAHEAD_LIMIT
+        return Response(typeahead(request.query_params.get('q', ''), limit))
+    
+    @staticmethod
+    def drivers_queryset():
+        return Policeman.objects.filter(is_driver=True)
     
     @action(detail=False, methods=['get'])
     def drivers(self, request):
         """Get all police personnel who are drivers"""
-        drivers = Policeman.objects.filter(is_driver=True)
-        serializer = self.get_serializer(drivers, many=True)
+        serializer = self.get_serializer(self.drivers_queryset(), many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -80,45 +114,117 @@ class PolicemanViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def field_officers(self, request):
-        """Get all police personnel available for field duty"""
-        field_officers = Policeman.objects.filter(
-            preferred_duty='FIELD',
-            has_fixed_duty=False
-        )
+        """Get all police personnel available for field duty (the FIELD pool of the assignment rules)"""
+        field_officers = get_snapshot().field_officers
         serializer = self.get_serializer(field_officers, many=True)
         return Response(serializer.data)
 
-class DeploymentViewSet(viewsets.ModelViewSet):
+class DeploymentViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Deployment.objects.all()
     serializer_class = DeploymentSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['area', 'area__zone']
+    cached_actions = ('latest_by_area',)
     
-    @action(detail=False, methods=['get'])
-    def latest_by_area(self, request):
-        """Get the latest deployment for each area"""
-        # Get distinct areas with their latest deployment
+    @staticmethod
+    def latest_deployments():
+        """The latest deployment of each area that has one"""
         latest_deployments = []
         
         for area in Area.objects.all():
             deployment = area.deployments.order_by('-created_at').first()
             if deployment:
                 latest_deployments.append(deployment)
-        
-        serializer = self.get_serializer(latest_deployments, many=True)
+        return latest_deployments
+    
+    @action(detail=False, methods=['get'])
+    def latest_by_area(self, request):
+        """Get the latest deployment for each area"""
+        serializer = self.get_serializer(self.latest_deployments(), many=True)
         return Response(serializer.data)
 
-class RosterViewSet(viewsets.ModelViewSet):
+class ForcedAssignmentViewSet(viewsets.ModelViewSet):
+    """Officers pinned to an area in every generated roster"""
+    queryset = ForcedAssignment.objects.select_related('policeman', 'area', 'area__zone').order_by('area__zone__name', 'area__name')
+    serializer_class = ForcedAssignmentSerializer
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    search_fields = ['policeman__name', 'policeman__belt_no', 'area__name']
+    filterset_fields = ['area', 'area__zone', 'is_active']
+
+class RosterViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Roster.objects.all().order_by('-created_at')
     serializer_class = RosterSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    pagination_class = RosterCursorPagination  # Only used by the summary listing
+    etag_scopes = (ROSTERS, REFERENCE)  # Assignments embed officer and area names
+    summary_actions = ('list', 'pending', 'active')  # Full assignments only from the detail and assignments endpoints
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.summary_actions:
+            # Summaries only: header fields plus counters, no assignment rows
+            status_filter = self.request.query_params.get('status') if self.action == 'list' else self.action
+            if status_filter == 'active':
+                queryset = queryset.filter(is_active=True, is_pending=False)
+            elif status_filter == 'pending':
+                queryset = queryset.filter(is_pending=True)
+            return queryset.annotate(assignment_count=Count('assignments'))
+        if self.action in ('assignments', 'export'):
+            return queryset
+        return RosterSerializer.setup_eager_loading(queryset)
     
     def get_serializer_class(self):
         if self.action == 'create':
             return RosterCreateSerializer
+        if self.action in self.summary_actions:
+            return RosterSummarySerializer
         return RosterSerializer
     
+    @action(detail=True, methods=['get'])
+    def assignments(self, request, pk=None):
+        """Get the assignments of a roster, one page at a time"""
+        roster = self.get_object()
+        assignments = roster.assignments.select_related(
+            'policeman', 'area', 'area__zone'
+        ).order_by('area__zone__name', 'area__name', 'id')
+        
+        paginator = AssignmentPagination()
+        page = paginator.paginate_queryset(assignments, request, view=self)
+        serializer = RosterAssignmentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Roster counters for the dashboard, without listing any roster"""
+        active_rosters = Roster.objects.filter(is_active=True, is_pending=False)
+        return Response({
+            'active': active_rosters.count(),
+            'pending': Roster.objects.filter(is_pending=True).count(),
+            'previous': PreviousRoster.objects.count(),
+            'active_assignments': RosterAssignment.objects.filter(roster__in=active_rosters).count(),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def diff(self, request):
+        """Compare two rosters: ?a=roster:<id>|previous:<id>&b=roster:<id>|previous:<id>"""
+        try:
+            a = parse_source(request.query_params.get('a'))
+            b = parse_source(request.query_params.get('b'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            return Response(diff_rosters(a, b))
+        except (Roster.DoesNotExist, PreviousRoster.DoesNotExist) as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    @action(detail=True, methods=['get'], url_path=r'export/(?P<file_format>csv|xls)')
+    def export(self, request, pk=None, file_format='csv'):
+        """Stream the roster as CSV or a spreadsheet, grouped by zone, area and call sign"""
+        roster = self.get_object()
+        return export_response(roster_rows(roster), file_format, roster.name)
+    
     @action(detail=True, methods=['post'])
     def archive(self, request, pk=None):
         """Archive a roster to PreviousRoster"""
@@ -126,18 +232,8 @@ class RosterViewSet(viewsets.ModelViewSet):
         
         # Create a serialized version of all roster data
         serializer = self.get_serializer(roster)
-        # Convert to Python dict to ensure we're not passing any unexpected types
-        roster_data = dict(serializer.data)
-        
-        # Create a PreviousRoster entry
-        PreviousRoster.objects.create(
-            name=roster.name,
-            created_at=roster.created_at,
-            repetition_count=roster.repetition_count,
-            same_area_repetition_count=roster.same_area_repetition_count,
-            unfulfilled_requirements=roster.unfulfilled_requirements,
-            roster_data=roster_data
-        )
+        # Create a PreviousRoster entry with its archived assignments
+        PreviousRoster.archive(roster, serializer.data)
         
         # Deactivate the roster
         roster.is_active = False
@@ -147,27 +243,48 @@ class RosterViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def pending(self, request):
-        """Get all pending rosters"""
-        pending_rosters = Roster.objects.filter(is_pending=True).order_by('-created_at')
-        serializer = self.get_serializer(pending_rosters, many=True)
+        """Get summaries of all pending rosters"""
+        serializer = self.get_serializer(self.get_queryset(), many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def active(self, request):
-        """Get all active rosters"""
-        active_rosters = Roster.objects.filter(is_active=True, is_pending=False).order_by('-created_at')
-        serializer = self.get_serializer(active_rosters, many=True)
+        """Get summaries of all active rosters"""
+        serializer = self.get_serializer(self.get_queryset(), many=True)
         return Response(serializer.data)
 
-class PreviousRosterViewSet(viewsets.ReadOnlyModelViewSet):
+class PreviousRosterViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = PreviousRoster.objects.all().order_by('-created_at')
     serializer_class = PreviousRosterSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    pagination_class = RosterCursorPagination
+    etag_scopes = (ROSTERS,)  # Archives are self-contained snapshots
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # The blobs are only decoded by the detail view
+            return queryset.defer('roster_data', 'unfulfilled_requirements')
+        if self.action == 'retrieve':
+            return queryset.prefetch_related('archived_assignments')
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PreviousRosterSummarySerializer
+        return PreviousRosterSerializer
+    
+    @action(detail=True, methods=['get'], url_path=r'export/(?P<file_format>csv|xls)')
+    def export(self, request, pk=None, file_format='csv'):
+        """Stream the archived roster as CSV or a spreadsheet, grouped by zone, area and call sign"""
+        previous_roster = self.get_object()
+        return export_response(previous_roster_rows(previous_roster), file_format, previous_roster.name)
 
-class GenerateRosterView(APIView):
+class GenerateRosterView(IdempotentPostMixin, APIView):
     """API view for generating a new roster"""
     permission_classes = [AllowAny]  # Change to IsAuthenticated if you want to require login
+    idempotency_scope = 'generate-roster'
     
     def get(self, request):
         """Return information about how to use the roster generation API"""
@@ -177,7 +294,8 @@ class GenerateRosterView(APIView):
                 "method": "POST",
                 "parameters": {
                     "name": "(optional) Custom name for the roster",
-                    "save_immediately": "(optional) Boolean flag to automatically save the roster"
+                    "save_immediately": "(optional) Boolean flag to automatically save the roster",
+                    "seed": "(optional) Integer seed; a seeded preview of unchanged inputs is served from cache"
                 }
             },
             "examples": [
@@ -206,16 +324,29 @@ class GenerateRosterView(APIView):
             # Call the generate_roster management command
             name = serializer.validated_data.get('name')
             save_immediately = serializer.validated_data.get('save_immediately', False)
+            seed = serializer.validated_data.get('seed')
             
             try:
-                # Call the command with the appropriate options
-                # Management command returns roster ID as a string now
-                roster_id_str = call_command(
-                    'generate_roster',
-                    name=name,
-                    activate=save_immediately,
-                    verbosity=0,  # Suppress command output
-                )
+                # A seeded preview of unchanged inputs is the same roster, so reuse the pending
+                # one generated for an identical earlier request while it is still pending
+                preview_key = None
+                roster_id_str = None
+                if seed is not None and not save_immediately:
+                    preview_key = preview_cache.key(input_fingerprint(), seed, name=name)
+                    roster_id_str = preview_cache.get(preview_key)
+                
+                if roster_id_str is None:
+                    # Call the command with the appropriate options
+                    # Management command returns roster ID as a string now
+                    roster_id_str = call_command(
+                        'generate_roster',
+                        name=name,
+                        activate=save_immediately,
+                        seed=seed,
+                        verbosity=0,  # Suppress command output
+                    )
+                    if preview_key:
+                        preview_cache.put(preview_key, roster_id_str)
                 
                 # Debug info
                 print(f"DEBUG: roster_id_str type is {type(roster_id_str)}, value is {roster_id_str}")
@@ -227,7 +358,7 @@ class GenerateRosterView(APIView):
                     # Get the generated roster
                     try:
                         # Get the generated roster
-                        roster = Roster.objects.get(id=roster_id)
+                        roster = RosterSerializer.setup_eager_loading(Roster.objects).get(id=roster_id)
                         
                         # Check if unfulfilled_requirements contains any data that might cause serialization issues
                         if roster.unfulfilled_requirements:
@@ -311,9 +442,109 @@ class GenerateRosterView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ConfirmRosterView(APIView):
+class GenerateRosterStreamView(APIView):
+    """Generate a roster while streaming its progress as server-sent events.
+
+    Takes the generate-roster parameters as query parameters so browsers can use
+    EventSource. Each generation phase sends a 'progress' event with the officers placed
+    so far and the open slots by rank; the stream ends with 'done' (the roster summary;
+    fetch the roster itself from the rosters endpoint) or 'error'.
+
+    Streams are idempotent like generate-roster POSTs. EventSource cannot set headers, so
+    the Idempotency-Key may also be passed as the idempotency_key parameter; reconnecting
+    with a key whose generation finished replays its 'done' event instead of generating
+    again. Concurrent streams with the same key, or the same parameters when there is no
+    key, share one generation: the later ones wait for it and get its 'done' event.
+    """
+    permission_classes = [AllowAny]  # Change to IsAuthenticated if you want to require login
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+    idempotency_scope = 'generate-roster-stream'
+    KEY_PARAM = 'idempotency_key'
+    
+    def get(self, request):
+        params = request.query_params.dict()
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY') or params.get(self.KEY_PARAM)
+        params.pop(self.KEY_PARAM, None)
+        serializer = RosterGenerationRequestSerializer(data=params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        name = serializer.validated_data.get('name')
+        save_immediately = serializer.validated_data.get('save_immediately', False)
+        seed = serializer.validated_data.get('seed')
+        
+        fingerprint = request_fingerprint(request.path, params)
+        if key:
+            cache_key = idempotency_cache_key(self.idempotency_scope, key)
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self._replay(stored, fingerprint)
+            flight_key = cache_key
+        else:
+            cache_key = None
+            flight_key = f'{self.idempotency_scope}:{fingerprint}'
+        
+        # Seeded previews of unchanged inputs are served from the preview cache, as for POST
+        preview_key = None
+        if seed is not None and not save_immediately:
+            preview_key = preview_cache.key(input_fingerprint(), seed, name=name)
+            roster_id = preview_cache.get(preview_key)
+            if roster_id is not None:
+                roster = Roster.objects.get(id=roster_id)
+                return event_stream_response(iter([sse_event('done', roster_summary(roster, cached=True))]))
+        
+        call, leader = single_flight.join(flight_key)
+        if not leader:
+            return self._follow(call, fingerprint)
+        # A retry may have finished between the cache check and taking the flight
+        stored = cache.get(cache_key) if cache_key else None
+        if stored is not None:
+            single_flight.finish(flight_key, call, stored)
+            return self._replay(stored, fingerprint)
+        
+        outcome = None
+        
+        def on_done(roster):
+            nonlocal outcome
+            if preview_key:
+                preview_cache.put(preview_key, str(roster.id))
+            outcome = {'fingerprint': fingerprint, 'status': status.HTTP_200_OK, 'data': roster_summary(roster)}
+            if cache_key:
+                cache.set(cache_key, outcome, IDEMPOTENCY_TIMEOUT)
+        
+        generator = RosterGenerator(seed=seed)
+        events = generation_events(generator, name=name, pending=not save_immediately, on_done=on_done)
+        # Finish the flight however the stream ends, including a client that never read it
+        return event_stream_response(ClosingEvents(events, lambda: single_flight.finish(flight_key, call, outcome)))
+    
+    def _replay(self, outcome, fingerprint):
+        if outcome['fingerprint'] != fingerprint:
+            return Response(
+                {'error': 'Idempotency-Key was already used for a different request'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        response = event_stream_response(iter([sse_event('done', outcome['data'])]))
+        response[REPLAY_HEADER] = 'true'
+        return response
+    
+    def _follow(self, call, fingerprint):
+        def events():
+            call.done.wait()
+            outcome = call.result
+            if outcome is None:
+                yield sse_event('error', {'error': 'The roster generation this request joined did not finish'})
+            elif outcome['fingerprint'] != fingerprint:
+                yield sse_event('error', {'error': 'Idempotency-Key was already used for a different request'})
+            else:
+                yield sse_event('done', outcome['data'])
+        response = event_stream_response(events())
+        response[REPLAY_HEADER] = 'true'
+        return response
+
+class ConfirmRosterView(IdempotentPostMixin, APIView):
     """API view for confirming or discarding a generated roster"""
     permission_classes = [AllowAny]  # Change to IsAuthenticated if you want to require login
+    idempotency_scope = 'confirm-roster'
     
     def get(self, request, roster_id):
         """Return information about how to confirm or discard a roster"""
@@ -368,46 +599,22 @@ class ConfirmRosterView(APIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
                     
-                # Update the name if provided
-                if action == 'save' and name:
-                    roster.name = name
-                    roster.save()
-                    
-                # Call the confirm_roster management command
+                # Call the confirm_roster management command, which renames, archives and
+                # activates the roster in one transaction, and only once per roster
                 call_command(
                     'confirm_roster',
                     roster_id,
                     action=action,
+                    name=name if action == 'save' else None,
                     verbosity=0  # Suppress command output
                 )
                 
                 if action == 'save':
                     # Get the updated roster data
                     try:
-                        updated_roster = Roster.objects.get(id=roster_id)
+                        updated_roster = RosterSerializer.setup_eager_loading(Roster.objects).get(id=roster_id)
                         response_serializer = RosterSerializer(updated_roster)
                         
-                        # Check if a PreviousRoster with the same name and created_at already exists
-                        # If it exists, don't create a duplicate
-                        existing_previous = PreviousRoster.objects.filter(
-                            name=updated_roster.name,
-                            created_at=updated_roster.created_at
-                        ).first()
-                        
-                        if not existing_previous:
-                            # Also create a copy in PreviousRoster for reference
-                            roster_data = dict(response_serializer.data)
-                            
-                            # Create a PreviousRoster entry with the same name
-                            PreviousRoster.objects.create(
-                                name=updated_roster.name,
-                                created_at=updated_roster.created_at,
-                                repetition_count=updated_roster.repetition_count,
-                                same_area_repetition_count=updated_roster.same_area_repetition_count,
-                                unfulfilled_requirements=updated_roster.unfulfilled_requirements,
-                                roster_data=roster_data
-                            )
-                        
                         return Response({
                             'message': 'Roster saved and activated successfully',
                             'roster': response_serializer.data
@@ -701,74 +908,59 @@ class UpdatePreviousRosterView(APIView):
         previous_roster = PreviousRoster.objects.exclude(id=current_roster.id).order_by('-created_at').first()
         
         previous_assignments = {}
-        if previous_roster and previous_roster.roster_data:
-            try:
-                roster_data = previous_roster.roster_data
-                print(f"DEBUG: Processing previous roster {previous_roster.id} from {previous_roster.created_at}")
-                
-                if isinstance(roster_data, str):
-                    import json
-                    roster_data = json.loads(roster_data)
-                
-                if 'assignments' in roster_data and isinstance(roster_data['assignments'], list):
-                    for assignment in roster_data['assignments']:
-                        try:
-                            # Handle both direct ID references and nested objects
-                            area_id = assignment.get('area')
-                            if isinstance(area_id, dict):
-                                area_id = area_id.get('id')
-                            
-                            policeman_id = assignment.get('policeman')
-                            if isinstance(policeman_id, dict):
-                                policeman_id = policeman_id.get('id')
-                            
-                            if area_id and policeman_id:
-                                try:
-                                    area = Area.objects.get(id=area_id)
-                                    previous_assignments[policeman_id] = {
-                                        'zone_id': area.zone_id,
-                                        'area_id': area_id,
-                                        'policeman_id': policeman_id
-                                    }
-                                    print(f"DEBUG: Added previous assignment - Officer {policeman_id} in Area {area_id} (Zone {area.zone_id})")
-                                except Area.DoesNotExist:
-                                    print(f"DEBUG: Area {area_id} not found")
-                        except Exception as e:
-                            print(f"DEBUG: Error processing assignment: {e}")
-                            continue
-                
-                print(f"DEBUG: Found {len(previous_assignments)} previous assignments")
-            except Exception as e:
-                print(f"DEBUG: Error processing previous roster data: {e}")
-                import traceback
-                print(traceback.format_exc())
+        if previous_roster:
+            print(f"DEBUG: Processing previous roster {previous_roster.id} from {previous_roster.created_at}")
+            rows = previous_roster.archived_assignments.filter(
+                policeman__isnull=False, area__isnull=False
+            ).values_list('policeman_id', 'area_id', 'area__zone_id')
+            for policeman_id, area_id, zone_id in rows:
+                previous_assignments[policeman_id] = {
+                    'zone_id': zone_id,
+                    'area_id': area_id,
+                    'policeman_id': policeman_id
+                }
+            print(f"DEBUG: Found {len(previous_assignments)} previous assignments")
         
         return previous_assignments
     
+    def _build_lookup_maps(self, assignments_data):
+        """Build case-insensitive (area, zone) and (name, belt no) lookup maps in two queries.
+        
+        Keys that match more than one record map to None so the row can be reported as ambiguous.
+        """
+        areas_by_key = {}
+        for area in Area.objects.select_related('zone'):
+            key = (area.name.lower(), area.zone.name.lower())
+            areas_by_key[key] = None if key in areas_by_key else area
+        
+        belt_nos = {str(a.get('belt_no')) for a in assignments_data if isinstance(a, dict) and a.get('belt_no') is not None}
+        policemen_by_key = {}
+        for policeman in Policeman.objects.filter(belt_no__in=belt_nos):
+            policemen_by_key[(policeman.name.lower(), policeman.belt_no)] = policeman
+        
+        return areas_by_key, policemen_by_key
+    
     def _process_excel_assignments(self, assignments_data):
         """Process Excel assignments and return formatted assignments with proper references"""
         processed_assignments = []
         errors = []
+        areas_by_key, policemen_by_key = self._build_lookup_maps(assignments_data)
         
         for assignment in assignments_data:
             try:
                 # Get or validate Area
-                try:
-                    area = Area.objects.get(
-                        name__iexact=assignment['area_name'],
-                        zone__name__iexact=assignment['zone_name']
-                    )
-                except Area.DoesNotExist:
+                area_key = (str(assignment['area_name']).lower(), str(assignment['zone_name']).lower())
+                if area_key not in areas_by_key:
                     errors.append(f"Area '{assignment['area_name']}' in zone '{assignment['zone_name']}' not found")
                     continue
+                area = areas_by_key[area_key]
+                if area is None:
+                    errors.append(f"Area '{assignment['area_name']}' in zone '{assignment['zone_name']}' is ambiguous")
+                    continue
                 
                 # Get or validate Policeman
-                try:
-                    policeman = Policeman.objects.get(
-                        name__iexact=assignment['policeman_name'],
-                        belt_no=assignment['belt_no']
-                    )
-                except Policeman.DoesNotExist:
+                policeman = policemen_by_key.get((str(assignment['policeman_name']).lower(), str(assignment['belt_no'])))
+                if policeman is None:
                     errors.append(f"Policeman '{assignment['policeman_name']}' with belt no '{assignment['belt_no']}' not found")
                     continue
                 
@@ -816,37 +1008,32 @@ class UpdatePreviousRosterView(APIView):
             # Get previous assignments from the roster before this one
             previous_assignments = self._get_previous_assignments(roster)
             
-            # Update the roster_data with new assignments
-            roster_data = roster.roster_data or {}
-            roster_data['assignments'] = processed_assignments
-            
             # Recalculate repetition counts based on previous assignments
             zone_repetitions = 0
             area_repetitions = 0
+            area_zones = dict(Area.objects.values_list('id', 'zone_id'))
             
             for assignment in processed_assignments:
                 officer_id = assignment.get('policeman')
                 area_id = assignment.get('area')
                 
-                if officer_id and area_id:
-                    try:
-                        area = Area.objects.get(id=area_id)
-                        prev_assignment = previous_assignments.get(officer_id)
-                        if prev_assignment:
-                            if prev_assignment['zone_id'] == area.zone_id:
-                                zone_repetitions += 1
-                                print(f"DEBUG: Zone repetition found for officer {officer_id} in zone {area.zone_id}")
-                            if prev_assignment['area_id'] == area_id:
-                                area_repetitions += 1
-                                print(f"DEBUG: Area repetition found for officer {officer_id} in area {area_id}")
-                    except Area.DoesNotExist:
-                        print(f"DEBUG: Area {area_id} not found")
+                if officer_id and area_id in area_zones:
+                    zone_id = area_zones[area_id]
+                    prev_assignment = previous_assignments.get(officer_id)
+                    if prev_assignment:
+                        if prev_assignment['zone_id'] == zone_id:
+                            zone_repetitions += 1
+                            print(f"DEBUG: Zone repetition found for officer {officer_id} in zone {zone_id}")
+                        if prev_assignment['area_id'] == area_id:
+                            area_repetitions += 1
+                            print(f"DEBUG: Area repetition found for officer {officer_id} in area {area_id}")
             
             # Update the roster with new data
-            roster.roster_data = roster_data
-            roster.repetition_count = zone_repetitions
-            roster.same_area_repetition_count = area_repetitions
-            roster.save()
+            with transaction.atomic():
+                roster.replace_assignments(processed_assignments)
+                roster.repetition_count = zone_repetitions
+                roster.same_area_repetition_count = area_repetitions
+                roster.save()
             
             print(f"DEBUG: Updated roster {roster.id} with {len(processed_assignments)} assignments")
             print(f"DEBUG: Found {zone_repetitions} zone repetitions and {area_repetitions} area repetitions")
@@ -872,6 +1059,27 @@ class CorrigendumChangeView(APIView):
     """API view for managing corrigendum changes"""
     permission_classes = [AllowAny]  # Change to IsAuthenticated in production
     
+    @staticmethod
+    def change_data(change):
+        """Response representation of a corrigendum change"""
+        return {
+            'id': change.id,
+            'policeman': {
+                'id': change.policeman.id,
+                'name': change.policeman.name,
+                'belt_no': change.policeman.belt_no,
+                'rank': change.policeman.rank
+            },
+            'area': {
+                'id': change.area.id,
+                'name': change.area.name,
+                'zone_name': change.area.zone.name,
+                'call_sign': change.area.call_sign
+            },
+            'created_at': change.created_at,
+            'notes': change.notes
+        }
+    
     def get(self, request, roster_id):
         """Get all corrigendum changes for a roster"""
         try:
@@ -879,23 +1087,7 @@ class CorrigendumChangeView(APIView):
                 'policeman', 'area', 'area__zone'
             ).order_by('-created_at')
             
-            return Response([{
-                'id': change.id,
-                'policeman': {
-                    'id': change.policeman.id,
-                    'name': change.policeman.name,
-                    'belt_no': change.policeman.belt_no,
-                    'rank': change.policeman.rank
-                },
-                'area': {
-                    'id': change.area.id,
-                    'name': change.area.name,
-                    'zone_name': change.area.zone.name,
-                    'call_sign': change.area.call_sign
-                },
-                'created_at': change.created_at,
-                'notes': change.notes
-            } for change in changes])
+            return Response([self.change_data(change) for change in changes])
         except Exception as e:
             logger.error(f"Error fetching corrigendum changes: {str(e)}")
             return Response({'error': 'Failed to fetch changes'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -951,53 +1143,15 @@ class CorrigendumChangeView(APIView):
                 notes=notes
             )
 
-            # Update the roster_data with the new assignment
-            roster_data = roster.roster_data or {}
-            if not isinstance(roster_data, dict):
-                roster_data = {}
-            
-            if 'assignments' not in roster_data:
-                roster_data['assignments'] = []
-
-            # Remove any existing assignment for this policeman
-            roster_data['assignments'] = [
-                a for a in roster_data['assignments'] 
-                if isinstance(a, dict) and str(a.get('policeman')) != str(policeman.id)
-            ]
-
-            # Add the new assignment
-            new_assignment = {
-                'policeman': policeman.id,
-                'policeman_name': policeman.name,
-                'belt_no': policeman.belt_no,
-                'rank': policeman.rank,
-                'area': area.id,
-                'area_name': area.name,
-                'zone_name': area.zone.name,
-                'call_sign': area.call_sign
-            }
-            roster_data['assignments'].append(new_assignment)
-            roster.roster_data = roster_data
-            roster.save()
+            # Move the officer's archived assignment to the new area
+            ArchivedAssignment.objects.update_or_create(
+                previous_roster=roster,
+                policeman=policeman,
+                defaults=ArchivedAssignment.snapshot_fields(policeman, area)
+            )
 
             # Return the created change
-            return Response({
-                'id': change.id,
-                'policeman': {
-                    'id': policeman.id,
-                    'name': policeman.name,
-                    'belt_no': policeman.belt_no,
-                    'rank': policeman.rank
-                },
-                'area': {
-                    'id': area.id,
-                    'name': area.name,
-                    'zone_name': area.zone.name,
-                    'call_sign': area.call_sign
-                },
-                'created_at': change.created_at,
-                'notes': change.notes
-            }, status=status.HTTP_201_CREATED)
+            return Response(self.change_data(change), status=status.HTTP_201_CREATED)
         except PreviousRoster.DoesNotExist:
             return Response({'error': 'Roster not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -1014,15 +1168,8 @@ class CorrigendumChangeView(APIView):
             roster = change.roster
             policeman = change.policeman
 
-            # Remove the assignment from roster_data
-            roster_data = roster.roster_data or {}
-            if isinstance(roster_data, dict) and 'assignments' in roster_data:
-                roster_data['assignments'] = [
-                    a for a in roster_data['assignments'] 
-                    if isinstance(a, dict) and str(a.get('policeman')) != str(policeman.id)
-                ]
-                roster.roster_data = roster_data
-                roster.save()
+            # Remove the officer's archived assignment
+            roster.archived_assignments.filter(policeman=policeman).delete()
 
             change.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1030,4 +1177,82 @@ class CorrigendumChangeView(APIView):
             return Response({'error': 'Change not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             logger.error(f"Error deleting corrigendum change: {str(e)}")
-            return Response({'error': 'Failed to delete change'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'error': 'Failed to delete change'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class BatchCorrigendumChangeView(APIView):
+    """API view for applying many corrigendum changes to a previous roster at once"""
+    permission_classes = [AllowAny]  # Change to IsAuthenticated in production
+    
+    def post(self, request, roster_id):
+        """Validate and apply a list of {policeman_id, area_id, notes} changes atomically"""
+        try:
+            roster = PreviousRoster.objects.get(id=roster_id)
+        except PreviousRoster.DoesNotExist:
+            return Response({'error': 'Roster not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        changes_data = request.data.get('changes') if isinstance(request.data, dict) else None
+        if not isinstance(changes_data, list) or not changes_data:
+            return Response({
+                'error': 'changes must be a non-empty list of {policeman_id, area_id, notes}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Parse IDs first so the lookups below can run as two bulk queries
+        parsed = []
+        errors = []
+        for index, item in enumerate(changes_data):
+            try:
+                policeman_id = int(item.get('policeman_id') or item.get('officer_id'))
+                area_id = int(item.get('area_id'))
+            except (AttributeError, TypeError, ValueError):
+                errors.append(f"Change {index + 1}: policeman_id and area_id must be valid IDs")
+                continue
+            parsed.append((index, policeman_id, area_id, item.get('notes', '')))
+        
+        policemen = Policeman.objects.in_bulk({policeman_id for _, policeman_id, _, _ in parsed})
+        areas = Area.objects.select_related('zone').in_bulk({area_id for _, _, area_id, _ in parsed})
+        
+        for index, policeman_id, area_id, notes in parsed:
+            if policeman_id not in policemen:
+                errors.append(f"Change {index + 1}: policeman {policeman_id} not found")
+            if area_id not in areas:
+                errors.append(f"Change {index + 1}: area {area_id} not found")
+        
+        if errors:
+            return Response({'error': 'Invalid changes', 'details': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            changes = CorrigendumChange.objects.bulk_create([
+                CorrigendumChange(roster=roster, policeman=policemen[policeman_id], area=areas[area_id], notes=notes)
+                for _, policeman_id, area_id, notes in parsed
+            ])
+            
+            # Rewrite the archived assignments once; the last change for an officer wins
+            final_areas = {policeman_id: areas[area_id] for _, policeman_id, area_id, _ in parsed}
+            existing = {
+                row.policeman_id: row
+                for row in roster.archived_assignments.filter(policeman_id__in=final_areas)
+            }
+            to_update = []
+            to_create = []
+            for policeman_id, area in final_areas.items():
+                fields = ArchivedAssignment.snapshot_fields(policemen[policeman_id], area)
+                row = existing.get(policeman_id)
+                if row is None:
+                    to_create.append(ArchivedAssignment(previous_roster=roster, policeman=policemen[policeman_id], **fields))
+                else:
+                    for field, value in fields.items():
+                        setattr(row, field, value)
+                    row.updated_at = timezone.now()  # bulk_update skips auto_now
+                    to_update.append(row)
+            
+            ArchivedAssignment.objects.bulk_update(to_update, [
+                'policeman_name', 'belt_no', 'rank', 'area', 'zone', 'area_name', 'zone_name',
+                'call_sign', 'was_previous_zone', 'was_previous_area', 'updated_at'
+            ])
+            ArchivedAssignment.objects.bulk_create(to_create)
+            
+            # Bulk writes send no signals; saving the archive records the change for ETags
+            roster.save(update_fields=['name', 'updated_at'])
+        
+        return Response([CorrigendumChangeView.change_data(change) for change in changes],
+                        status=status.HTTP_201_CREATED)